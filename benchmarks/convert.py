@@ -0,0 +1,296 @@
+import argparse
+import gzip
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Collection
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from benchmarks.fixtures import synthetic_level_source
+
+# Numbers of entities in the synthetic levels benchmarked by default.
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+# Reference baseline compared against by default, written with --save-baseline.
+# It only records machine-independent metrics, so it's meaningful on any machine.
+BASELINE_PATH = Path(__file__).parent / "baselines.json"
+
+# Metrics recorded in baselines and compared against them.
+METRICS = ("entities_per_second", "peak_rss_bytes", "emitted_bytes")
+
+# Metrics which are the same on any machine, the only ones recorded in and compared against the reference baseline.
+# Throughput and RSS are only compared against a baseline given with --baseline, which should be recorded on the same
+# machine.
+MACHINE_INDEPENDENT_METRICS = ("emitted_bytes",)
+
+# Directory generated fixtures are kept in between runs.
+FIXTURE_DIR = Path(tempfile.gettempdir()) / "pydori-benchmarks"
+
+# Fraction by which a result may be worse than its baseline before it counts as a regression.
+DEFAULT_TOLERANCE = 0.2
+
+# Number of entities processed across repeats of a case, so small levels are timed over enough runs to be stable.
+TARGET_ENTITIES_PER_CASE = 100_000
+MAX_REPEATS = 10
+
+
+class Result(NamedTuple):
+    case: str
+    entities: int
+    # Fastest time of the repeats, in seconds.
+    seconds: float
+    peak_rss_bytes: int
+    # Size of the level data as packaged by the exporter, for cases which produce level data or a chart.
+    emitted_bytes: int | None
+
+    @property
+    def entities_per_second(self) -> float:
+        return self.entities / self.seconds
+
+
+def _parse_entities(source: bytes) -> Callable[[], object]:
+    from pydori.convert.utils import parse_entities
+
+    entities = json.loads(gzip.decompress(source))["entities"]
+    return lambda: parse_entities(entities)
+
+
+def _convert_source(source: bytes) -> Callable[[], object]:
+    from pydori.convert.bestdori import convert_sonolus_bandori_level_chart
+
+    return lambda: convert_sonolus_bandori_level_chart(source, use_cache=False)
+
+
+def _convert_level_data(source: bytes) -> Callable[[], object]:
+    from pydori.convert.bestdori import convert_sonolus_bandori_level_data
+
+    data = json.loads(gzip.decompress(source))
+    return lambda: convert_sonolus_bandori_level_data(data)
+
+
+def _emit(source: bytes) -> Callable[[], object]:
+    from pydori.convert.bestdori import convert_sonolus_bandori_level_source
+    from pydori.convert.emit import package_compact_level_data
+
+    level_data = convert_sonolus_bandori_level_source(source)
+    return lambda: package_compact_level_data(level_data)
+
+
+def _hold_and_sim_lines(source: bytes) -> Callable[[], object]:
+    from pydori.convert.bestdori import convert_sonolus_bandori_level_chart
+    from pydori.convert.chart import NO_NOTE, NOTE_ARCHETYPES
+    from pydori.level import create_sim_lines, hold
+
+    chart = convert_sonolus_bandori_level_chart(source, use_cache=False)
+
+    def run():
+        notes = [NOTE_ARCHETYPES[note.kind](beat=note.beat, lane=note.lane) for note in chart.notes]
+        entities = []
+        for i, note in enumerate(chart.notes):
+            if note.prev == NO_NOTE and note.next != NO_NOTE:
+                chain = [i]
+                while chart.notes[chain[-1]].next != NO_NOTE:
+                    chain.append(chart.notes[chain[-1]].next)
+                entities += hold(*(notes[j] for j in chain))
+            elif note.prev == NO_NOTE:
+                entities.append(notes[i])
+        return create_sim_lines(entities)
+
+    return run
+
+
+def _build_chart(source: bytes) -> Callable[[], object]:
+    from pydori.convert.bestdori import convert_sonolus_bandori_level_chart
+    from pydori.convert.builder import ChartBuilder
+    from pydori.convert.chart import NO_NOTE
+
+    chart = convert_sonolus_bandori_level_chart(source, use_cache=False)
+
+    def run():
+        builder = ChartBuilder(chart.bgm_offset)
+        for beat, bpm in chart.bpm_changes:
+            builder.bpm_change(beat, bpm)
+        for i, note in enumerate(chart.notes):
+            if note.prev == NO_NOTE and note.next != NO_NOTE:
+                chain = [i]
+                while chart.notes[chain[-1]].next != NO_NOTE:
+                    chain.append(chart.notes[chain[-1]].next)
+                notes = [chart.notes[j] for j in chain]
+                builder.hold([n.beat for n in notes], [n.lane for n in notes], [n.kind for n in notes])
+            elif note.prev == NO_NOTE:
+                builder.note(note.kind, note.beat, note.lane, note.direction)
+        return builder.build()
+
+    return run
+
+
+# Benchmarked cases, each given gzip-compressed Sonolus Bandori level data and returning the function to time.
+# Any setup the case needs, such as parsing the level data, is done before returning.
+CASES: dict[str, Callable[[bytes], Callable[[], object]]] = {
+    "parse_entities": _parse_entities,
+    "convert_source": _convert_source,
+    "convert_level_data": _convert_level_data,
+    "emit": _emit,
+    "hold_and_sim_lines": _hold_and_sim_lines,
+    "build_chart": _build_chart,
+}
+
+
+def run_case(case: str, path: Path, entities: int) -> Result:
+    """Run a case on a fixture and return its result. This should run in a fresh process to measure its peak RSS."""
+    import resource
+
+    from pydori.convert.chart import Chart, build_level_data
+    from pydori.convert.emit import package_compact_level_data
+
+    run = CASES[case](path.read_bytes())
+    repeats = max(1, min(MAX_REPEATS, TARGET_ENTITIES_PER_CASE // entities))
+    seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = run()
+        seconds = min(seconds, time.perf_counter() - start)
+    if isinstance(output, bytes):
+        emitted_bytes = len(output)
+    elif isinstance(output, Chart):
+        # Charts become level data through build_level_data, which the exporter then packages.
+        emitted_bytes = len(package_compact_level_data(build_level_data(output)))
+    else:
+        emitted_bytes = None
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return Result(case, entities, seconds, peak_rss if sys.platform == "darwin" else peak_rss * 1024, emitted_bytes)
+
+
+def run_benchmarks(cases: list[str], sizes: list[int]) -> list[Result]:
+    """Run each case on a synthetic level of each size, each in a fresh process.
+
+    Fixtures are also generated in a separate process. A process started by this one inherits its peak RSS on Linux,
+    so this process must never hold a large level itself.
+    """
+    results = []
+    for size in sizes:
+        path, entities = _in_fresh_process(synthetic_level_source, FIXTURE_DIR, size)
+        for case in cases:
+            result = _in_fresh_process(run_case, case, path, entities)
+            print(_format_result(result), flush=True)
+            results.append(result)
+    return results
+
+
+def _in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def find_regressions(
+    results: list[Result],
+    baselines: dict,
+    tolerance: float,
+    metrics: Collection[str] = METRICS,
+) -> list[str]:
+    """Return a description of each result which is worse than its baseline by more than the tolerance.
+
+    Args:
+        results: Results to check.
+        baselines: Baseline of each case and size, as saved with --save-baseline.
+        tolerance: Fraction by which a result may be worse than its baseline.
+        metrics: Metrics to compare. Metrics missing from a baseline are not compared.
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(f"{result.case}/{result.entities}")
+        if baseline is None:
+            continue
+        key = f"{result.case} with {result.entities} entities"
+        if (
+            "entities_per_second" in metrics
+            and baseline.get("entities_per_second") is not None
+            and result.entities_per_second < baseline["entities_per_second"] * (1 - tolerance)
+        ):
+            regressions.append(
+                f"{key}: {result.entities_per_second:,.0f} entities/s, "
+                f"baseline {baseline['entities_per_second']:,.0f} entities/s"
+            )
+        if (
+            "peak_rss_bytes" in metrics
+            and baseline.get("peak_rss_bytes") is not None
+            and result.peak_rss_bytes > baseline["peak_rss_bytes"] * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{key}: peak RSS {_mib(result.peak_rss_bytes)}, baseline {_mib(baseline['peak_rss_bytes'])}"
+            )
+        if (
+            "emitted_bytes" in metrics
+            and result.emitted_bytes is not None
+            and baseline.get("emitted_bytes") is not None
+            and result.emitted_bytes > baseline["emitted_bytes"] * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{key}: emitted {result.emitted_bytes:,} bytes, baseline {baseline['emitted_bytes']:,} bytes"
+            )
+    return regressions
+
+
+def _format_result(result: Result) -> str:
+    emitted = f"{result.emitted_bytes:>12,} B" if result.emitted_bytes is not None else f"{'-':>14}"
+    return (
+        f"{result.case:<20} {result.entities:>10,} entities  {result.entities_per_second:>12,.0f}/s  "
+        f"{_mib(result.peak_rss_bytes):>10}  {emitted}"
+    )
+
+
+def _mib(size: int) -> str:
+    return f"{size / 2**20:.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.convert",
+        description="Benchmark the conversion pipeline on synthetic Bandori levels, fully offline.",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of entities")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="cases to run")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="baseline file recorded on this machine, to also compare throughput and RSS (default: the reference)",
+    )
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed fraction of regression")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or BASELINE_PATH
+    metrics = METRICS if args.baseline else MACHINE_INDEPENDENT_METRICS
+
+    results = run_benchmarks(args.cases, args.sizes)
+
+    if args.save_baseline:
+        baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        for result in results:
+            values = {metric: getattr(result, metric) for metric in metrics}
+            entry = {metric: value for metric, value in values.items() if value is not None}
+            if entry:
+                baselines[f"{result.case}/{result.entities}"] = entry
+        baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {baseline_path}.")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}, run with --save-baseline to create one.")
+        return
+    regressions = find_regressions(results, json.loads(baseline_path.read_text()), args.tolerance, metrics)
+    if regressions:
+        print(f"{len(regressions)} regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
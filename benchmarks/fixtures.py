@@ -0,0 +1,114 @@
+import gzip
+import itertools
+import json
+import random
+from pathlib import Path
+
+# Version of the generated fixtures, included in their file names so fixtures kept from older versions aren't reused.
+# This should be incremented whenever the generator changes.
+FIXTURE_VERSION = 1
+
+# Lanes of Bandori notes.
+LANES = range(-3, 4)
+
+# Number of anchors per beat in generated curved slides, similar to curved slides exported by Bestdori.
+ANCHORS_PER_BEAT = 16
+
+
+def synthetic_level_data(entities: int, seed: int = 0) -> dict:
+    """Generate Sonolus Bandori level data with about the given number of entities.
+
+    The mix of entities resembles official charts: taps, flicks and directional flicks, often as chords joined by sim
+    lines, and slides with ticks, curved runs of anchors and a connector between each pair of consecutive notes, under
+    occasional BPM changes. The same arguments always give the same level data.
+
+    Args:
+        entities: Number of entities to generate. The result may have a few more, since slides are never cut short.
+        seed: Seed for the random choices.
+    """
+    rng = random.Random(seed)
+    result = [
+        {"archetype": "Initialization", "data": []},
+        {"archetype": "Stage", "data": []},
+        {"archetype": "#BPM_CHANGE", "data": [{"name": "#BEAT", "value": 0}, {"name": "#BPM", "value": 120}]},
+    ]
+    names = 0
+    beat = 1.0
+
+    def note(archetype: str, beat: float, lane: float, name: str | None = None, **values) -> dict:
+        entity = {
+            "archetype": archetype,
+            "data": [
+                {"name": "#BEAT", "value": beat},
+                {"name": "lane", "value": lane},
+                *({"name": key, "value": value} for key, value in values.items()),
+            ],
+        }
+        if name is not None:
+            entity["name"] = name
+        return entity
+
+    while len(result) < entities:
+        roll = rng.random()
+        if roll < 0.02:
+            result.append(
+                {
+                    "archetype": "#BPM_CHANGE",
+                    "data": [{"name": "#BEAT", "value": beat}, {"name": "#BPM", "value": rng.choice((90, 150, 200))}],
+                }
+            )
+        elif roll < 0.8:
+            for lane in rng.sample(LANES, rng.choice((1, 1, 2))):
+                archetype = rng.choice(("TapNote", "TapNote", "FlickNote", "DirectionalFlickNote"))
+                if archetype == "DirectionalFlickNote":
+                    result.append(note(archetype, beat, lane, direction=rng.choice((-1, 1)), size=rng.randint(1, 3)))
+                else:
+                    result.append(note(archetype, beat, lane))
+                result.append({"archetype": "SimLine", "data": []})
+            beat += rng.choice((0.25, 0.5))
+        else:
+            slide = []
+            slide_beat = beat
+            lane = rng.choice(LANES)
+            slide.append(note("SlideStartNote", slide_beat, lane, f"n{names + len(slide)}"))
+            for _ in range(rng.randint(1, 4)):
+                target = rng.choice(LANES)
+                length = rng.choice((0.5, 1, 2))
+                if rng.random() < 0.5:
+                    count = int(length * ANCHORS_PER_BEAT)
+                    for j in range(1, count):
+                        t = j / count
+                        anchor_beat = slide_beat + length * t
+                        anchor_lane = lane + (target - lane) * t * t
+                        slide.append(note("IgnoredNote", anchor_beat, anchor_lane, f"n{names + len(slide)}"))
+                slide_beat += length
+                lane = target
+                slide.append(note("SlideTickNote", slide_beat, lane, f"n{names + len(slide)}"))
+            slide[-1]["archetype"] = rng.choice(("SlideEndNote", "SlideEndFlickNote"))
+            result += slide
+            for a, b in itertools.pairwise(slide):
+                result.append(
+                    {
+                        "archetype": rng.choice(("CurvedSlideConnector", "StraightSlideConnector")),
+                        "data": [{"name": "head", "ref": a["name"]}, {"name": "tail", "ref": b["name"]}],
+                    }
+                )
+            names += len(slide)
+    return {"bgmOffset": 0, "entities": result}
+
+
+def synthetic_level_source(directory: Path, entities: int, seed: int = 0) -> tuple[Path, int]:
+    """Write gzip-compressed synthetic level data to a directory if it isn't already there.
+
+    Returns:
+        Path of the level data and its exact number of entities.
+    """
+    path = directory / f"synthetic-v{FIXTURE_VERSION}-{entities}-{seed}.json.gz"
+    # The number of entities is kept next to the level data so it's known without decoding it.
+    count_path = path.with_suffix(".count")
+    if not path.exists() or not count_path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = synthetic_level_data(entities, seed)
+        path.write_bytes(gzip.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), mtime=0))
+        count_path.write_text(str(len(data["entities"])))
+    return path, int(count_path.read_text())
@@ -1,134 +1,325 @@
 import itertools
+import logging
+from array import array
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from os import PathLike
+from typing import Any
 
-from sonolus.script.level import LevelData, BpmChange, Level
-
-from pydori.convert.utils import get_sonolus_level_item, convert_sonolus_level_item, parse_entities
-from pydori.play.connector import HoldConnector, SimLine
-from pydori.play.note import (
-    Note,
-    TapNote,
-    FlickNote,
-    DirectionalFlickNote,
-    HoldHeadNote,
-    HoldTickNote,
-    HoldAnchorNote,
-    HoldEndNote,
+from sonolus.script.level import Level, LevelData
+
+from pydori.convert.chart import (
+    NO_NOTE,
+    Chart,
+    ChartNote,
+    build_level_data,
+    load_cached_chart,
+    simplify_hold_anchors,
+    store_cached_chart,
+)
+from pydori.convert.collection import open_collection
+from pydori.convert.utils import (
+    LazyLevel,
+    LevelSource,
+    ServerSource,
+    convert_sonolus_level_item,
+    gather_conversions,
+    hash_gzip_content,
+    lazy_sonolus_level,
+    parse_json_gzip_streaming,
 )
-from pydori.play.stage import Stage
+from pydori.lib.connector import ConnectorEase
+from pydori.lib.note import NoteKind
+
+logger = logging.getLogger(__name__)
+
+# URL of the Sonolus server hosting the official Bestdori levels.
+BESTDORI_BASE_URL = "https://sonolus.bestdori.com/official/"
+
+# Version of the converter output.
+# This should be incremented whenever the converter changes in a way that affects its output, so that charts cached
+# by earlier versions are converted again.
+CONVERTER_VERSION = 4
+
+# Default maximum distance in lanes that removing redundant hold anchors may move the rendered hold by.
+# Curved slides are converted to long runs of anchors, which can mostly be replaced by straight or curved connectors.
+ANCHOR_TOLERANCE = 0.02
+
+# Eases of connectors that may replace runs of hold anchors, in order of preference.
+ANCHOR_CONNECTOR_EASES = tuple(ConnectorEase)
+
+# Kind of note each Sonolus Bandori note archetype is converted to.
+BANDORI_NOTE_KINDS = {
+    "TapNote": NoteKind.TAP,
+    "FlickNote": NoteKind.FLICK,
+    "SlideEndFlickNote": NoteKind.FLICK,
+    "DirectionalFlickNote": NoteKind.DIRECTIONAL_FLICK,
+    "SlideStartNote": NoteKind.HOLD_HEAD,
+    "SlideEndNote": NoteKind.HOLD_END,
+    "SlideTickNote": NoteKind.HOLD_TICK,
+    "IgnoredNote": NoteKind.HOLD_ANCHOR,
+}
 
+# Sonolus Bandori archetypes which don't directly correspond to a note.
+BANDORI_CONNECTOR_ARCHETYPES = {"CurvedSlideConnector", "StraightSlideConnector"}
+BANDORI_IGNORED_ARCHETYPES = {"Stage", "Initialization", "SimLine"}
 
-def convert_sonolus_bandori_level(name: str, base_url: str = "https://sonolus.bestdori.com/official/") -> Level:
+
+def convert_sonolus_bandori_level(name: str, base_url: str = BESTDORI_BASE_URL) -> Level:
     """Download and convert a Sonolus Bandori level data to pydori level data."""
-    item = get_sonolus_level_item(name, base_url)
-    return convert_sonolus_level_item(item, base_url, "Bandori", convert_sonolus_bandori_level_data)
-
-
-def convert_sonolus_bandori_level_data(data: dict) -> LevelData:
-    """Convert Sonolus Bandori level data into pydori level data."""
-    bgm_offset = data["bgmOffset"]
-    entities = parse_entities(data["entities"])
-
-    notes: list[Note] = []
-    notes_by_index: dict[int, Note] = {}
-    bpm_changes: list[BpmChange] = []
-    hold_connectors: list[HoldConnector] = []
-    sim_lines: list[SimLine] = []
-    for i, (archetype, d) in enumerate(entities):
-        match archetype:
-            case "#BPM_CHANGE":
-                bpm_changes.append(
-                    BpmChange(
-                        beat=d["#BEAT"],
-                        bpm=d["#BPM"],
-                    )
-                )
-            case "TapNote":
-                note = TapNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "FlickNote" | "SlideEndFlickNote":
-                note = FlickNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "DirectionalFlickNote":
-                note = DirectionalFlickNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    # The Bandori engine stores direction as 1/-1 and size as a positive integer 1 to 3.
-                    # In pydori, we combine these into a single signed value -3 to 3.
-                    direction=d["direction"] * d["size"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "SlideStartNote":
-                note = HoldHeadNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "SlideEndNote":
-                note = HoldEndNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "SlideTickNote":
-                note = HoldTickNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "IgnoredNote":
-                note = HoldAnchorNote(
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
-            case "CurvedSlideConnector" | "StraightSlideConnector" | "Stage" | "Initialization" | "SimLine":
-                pass
-            case _:
-                raise ValueError(f"Unknown archetype: {archetype}")
-
-    for archetype, d in entities:
-        match archetype:
-            case "CurvedSlideConnector" | "StraightSlideConnector":
-                first = notes_by_index[int(d["head"])]
-                second = notes_by_index[int(d["tail"])]
-                hold_connectors.append(HoldConnector(first_ref=first.ref(), second_ref=second.ref()))
-                second.prev_ref = first.ref()
-                first.next_ref = second.ref()
-
-    notes.sort(key=lambda note: note.beat)
-    for a, b in itertools.pairwise(notes):
-        # Resolve minor discrepancies in beat values if they are very close
-        if a.beat != b.beat and abs(a.beat - b.beat) < 0.002:
-            b.beat = a.beat
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        # Anchors don't make sense to connect to, and connecting to ticks is mostly noise, so we skip them.
-        for a, b in itertools.pairwise(n for n in group if not isinstance(n, (HoldAnchorNote, HoldTickNote))):
-            sim_lines.append(SimLine(first_ref=a.ref(), second_ref=b.ref()))
-
-    return LevelData(
+    source = ServerSource(base_url)
+    return convert_sonolus_level_item(
+        source.get_level_item(name), source, "Bandori", convert_sonolus_bandori_level_source
+    )
+
+
+def lazy_sonolus_bandori_level(name: str, base_url: str = BESTDORI_BASE_URL) -> LazyLevel:
+    """Create a Sonolus Bandori level which is only downloaded and converted once it's first used."""
+    return lazy_sonolus_level(name, ServerSource(base_url), "Bandori", convert_sonolus_bandori_level_source)
+
+
+def convert_sonolus_bandori_levels(
+    names: Sequence[str],
+    base_url: str = BESTDORI_BASE_URL,
+    max_workers: int | None = None,
+) -> list[Level]:
+    """Download and convert multiple Sonolus Bandori levels in parallel using a process pool.
+
+    Levels are returned in the same order as the given names. If any level fails to convert, the remaining levels
+    are still converted and an ExceptionGroup is raised with one exception per failed level.
+
+    Args:
+        names: Names of the levels to convert.
+        base_url: URL of the Sonolus server to download levels from.
+        max_workers: Maximum number of worker processes. Defaults to the number of CPUs.
+    """
+    return _convert_in_parallel(ServerSource, base_url, names, max_workers)
+
+
+def import_sonolus_bandori_level(name: str, collection: PathLike) -> Level:
+    """Convert a Sonolus Bandori level from a local Sonolus collection archive to pydori level data.
+
+    No network access is needed, since the level item and its resources are read from the archive.
+    """
+    source = open_collection(collection)
+    return convert_sonolus_level_item(
+        source.get_level_item(name), source, "Bandori", convert_sonolus_bandori_level_source
+    )
+
+
+def import_sonolus_bandori_levels(
+    collection: PathLike,
+    names: Sequence[str] | None = None,
+    max_workers: int | None = None,
+) -> list[Level]:
+    """Convert multiple Sonolus Bandori levels from a local Sonolus collection archive in parallel.
+
+    Levels are returned in the same order as the given names, and failures are reported in the same way as
+    convert_sonolus_bandori_levels.
+
+    Args:
+        collection: Path of the collection archive.
+        names: Names of the levels to convert. Defaults to all levels in the collection.
+        max_workers: Maximum number of worker processes. Defaults to the number of CPUs.
+    """
+    if names is None:
+        names = open_collection(collection).level_names()
+    return _convert_in_parallel(open_collection, collection, names, max_workers)
+
+
+def _convert_in_parallel(
+    open_source: Callable[[Any], LevelSource], location: Any, names: Sequence[str], max_workers: int | None
+) -> list[Level]:
+    # Workers only convert level data to charts, which are plain data. Levels hold archetype instances, so they're
+    # built here rather than being sent back from the workers.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_convert_level_chart, open_source, location, name) for name in names]
+        charts = gather_conversions(futures, names)
+    source = open_source(location)
+    return [
+        convert_sonolus_level_item(source.get_level_item(name), source, "Bandori", partial(_chart_level_data, chart))
+        for name, chart in zip(names, charts, strict=True)
+    ]
+
+
+def _convert_level_chart(open_source: Callable[[Any], LevelSource], location: Any, name: str) -> Chart:
+    source = open_source(location)
+    return convert_sonolus_bandori_level_chart(source.get_buffer(source.get_level_item(name)["data"]))
+
+
+def _chart_level_data(chart: Chart, _source: bytes | memoryview) -> LevelData:
+    # A data converter for a level whose data was already converted to the given chart.
+    return build_level_data(chart)
+
+
+def convert_sonolus_bandori_level_source(
+    source: bytes | memoryview, anchor_tolerance: float = ANCHOR_TOLERANCE
+) -> LevelData:
+    """Convert gzip-compressed Sonolus Bandori level data JSON into pydori level data.
+
+    Args:
+        source: Gzip-compressed level data JSON.
+        anchor_tolerance: Maximum distance in lanes that removing redundant hold anchors may move the rendered hold by.
+    """
+    return build_level_data(convert_sonolus_bandori_level_chart(source, anchor_tolerance))
+
+
+def convert_sonolus_bandori_level_chart(
+    source: bytes | memoryview, anchor_tolerance: float = ANCHOR_TOLERANCE, use_cache: bool = True
+) -> Chart:
+    """Convert gzip-compressed Sonolus Bandori level data JSON into a chart.
+
+    The converted chart is cached keyed by a hash of the decompressed source, the converter version and the anchor
+    tolerance, so unchanged levels skip parsing and conversion entirely. Otherwise, entities are decoded as they are
+    decompressed, so the decompressed JSON is never held in memory in full.
+
+    Args:
+        source: Gzip-compressed level data JSON.
+        anchor_tolerance: Maximum distance in lanes that removing redundant hold anchors may move the rendered hold by.
+        use_cache: Whether to read and write the chart cache, e.g. disabled to measure the conversion itself.
+    """
+    key = f"bandori-{CONVERTER_VERSION}-{anchor_tolerance}-{hash_gzip_content(source)}"
+    chart = load_cached_chart(key) if use_cache else None
+    if chart is None:
+        columns = _Columns()
+        data = parse_json_gzip_streaming(source, {"entities": columns.add_entity})
+        chart = _simplify_hold_anchors(_build_chart(data["bgmOffset"], columns), anchor_tolerance)
+        if use_cache:
+            store_cached_chart(key, chart)
+    return chart
+
+
+def convert_sonolus_bandori_level_data(data: dict, anchor_tolerance: float = ANCHOR_TOLERANCE) -> LevelData:
+    """Convert Sonolus Bandori level data into pydori level data.
+
+    Args:
+        data: Level data.
+        anchor_tolerance: Maximum distance in lanes that removing redundant hold anchors may move the rendered hold by.
+    """
+    return build_level_data(convert_sonolus_bandori_chart(data, anchor_tolerance))
+
+
+class _Columns:
+    """Note data decoded from Sonolus Bandori entities, stored column-wise in typed arrays.
+
+    Notes are indexed in the order their entities appear in the level data.
+    """
+
+    def __init__(self):
+        self.kinds = array("b")
+        self.beats = array("d")
+        self.lanes = array("d")
+        self.directions = array("b")
+        self.bpm_changes: list[tuple[float, float]] = []
+        # Note index of each named note entity, used to resolve connector references.
+        self.indexes_by_name: dict[str, int] = {}
+        # Names of the head and tail notes of each connector, resolved once all entities are decoded.
+        self.connector_names: list[tuple[str, str]] = []
+
+    def add_entity(self, entity: dict):
+        archetype = entity["archetype"]
+        kind = BANDORI_NOTE_KINDS.get(archetype)
+        if kind is not None:
+            values = {d["name"]: d.get("value") for d in entity["data"]}
+            if "name" in entity:
+                self.indexes_by_name[entity["name"]] = len(self.kinds)
+            self.kinds.append(kind)
+            self.beats.append(values["#BEAT"])
+            self.lanes.append(values["lane"])
+            # The Bandori engine stores direction as 1/-1 and size as a positive integer 1 to 3.
+            # In pydori, we combine these into a single signed value -3 to 3.
+            self.directions.append(
+                int(values["direction"] * values["size"]) if kind == NoteKind.DIRECTIONAL_FLICK else 0
+            )
+        elif archetype in BANDORI_CONNECTOR_ARCHETYPES:
+            refs = {d["name"]: d.get("ref") for d in entity["data"]}
+            self.connector_names.append((refs["head"], refs["tail"]))
+        elif archetype == "#BPM_CHANGE":
+            values = {d["name"]: d.get("value") for d in entity["data"]}
+            self.bpm_changes.append((values["#BEAT"], values["#BPM"]))
+        elif archetype not in BANDORI_IGNORED_ARCHETYPES:
+            raise ValueError(f"Unknown archetype: {archetype}")
+
+    def connectors(self) -> tuple[array, array]:
+        """Return the note indexes of the heads and tails of all connectors."""
+        try:
+            heads = array("l", [self.indexes_by_name[head] for head, _ in self.connector_names])
+            tails = array("l", [self.indexes_by_name[tail] for _, tail in self.connector_names])
+        except KeyError as e:
+            raise ValueError(f"Connector references unknown note entity: {e.args[0]}") from None
+        return heads, tails
+
+
+def convert_sonolus_bandori_chart(data: dict, anchor_tolerance: float = ANCHOR_TOLERANCE) -> Chart:
+    """Convert Sonolus Bandori level data into a pydori chart.
+
+    Args:
+        data: Level data.
+        anchor_tolerance: Maximum distance in lanes that removing redundant hold anchors may move the rendered hold by.
+            If negative, no anchors are removed.
+    """
+    columns = _Columns()
+    for entity in data["entities"]:
+        columns.add_entity(entity)
+    return _simplify_hold_anchors(_build_chart(data["bgmOffset"], columns), anchor_tolerance)
+
+
+def _simplify_hold_anchors(chart: Chart, anchor_tolerance: float) -> Chart:
+    chart, removed = simplify_hold_anchors(chart, anchor_tolerance, ANCHOR_CONNECTOR_EASES)
+    logger.debug(
+        "Removed %d entities by simplifying hold anchors within a tolerance of %g lanes", removed, anchor_tolerance
+    )
+    return chart
+
+
+def _build_chart(bgm_offset: float, columns: _Columns) -> Chart:
+    kinds = columns.kinds
+    beats = columns.beats
+    lanes = columns.lanes
+    count = len(kinds)
+
+    # A stable sort keeps notes on the same beat in entity order.
+    order = sorted(range(count), key=beats.__getitem__)
+    positions = array("l", bytes(count * array("l").itemsize))
+    for position, index in enumerate(order):
+        positions[index] = position
+
+    sorted_beats = array("d", [beats[i] for i in order])
+    sorted_lanes = array("d", [lanes[i] for i in order])
+    for i in range(1, count):
+        # Resolve minor discrepancies in beat values if they are very close.
+        # Snapping never moves a beat past the previous one, so the beats stay sorted.
+        a = sorted_beats[i - 1]
+        b = sorted_beats[i]
+        if a != b and abs(a - b) < 0.002:
+            sorted_beats[i] = a
+
+    heads, tails = columns.connectors()
+    prev = array("l", [NO_NOTE]) * count
+    next_ = array("l", [NO_NOTE]) * count
+    for head, tail in zip(heads, tails):
+        prev[positions[tail]] = positions[head]
+        next_[positions[head]] = positions[tail]
+
+    # Notes on the same beat are contiguous, so ordering by (beat, lane) groups them and orders each group by lane.
+    # Anchors don't make sense to connect to, and connecting to ticks is mostly noise, so we skip them.
+    sim_candidates = [
+        p for p in range(count) if kinds[order[p]] != NoteKind.HOLD_ANCHOR and kinds[order[p]] != NoteKind.HOLD_TICK
+    ]
+    sim_candidates.sort(key=lambda p: (sorted_beats[p], sorted_lanes[p]))
+    sim_lines = [(a, b) for a, b in itertools.pairwise(sim_candidates) if sorted_beats[a] == sorted_beats[b]]
+
+    note_kinds = {int(kind): kind for kind in NoteKind}
+    directions = columns.directions
+    return Chart(
         bgm_offset=bgm_offset,
-        entities=[
-            Stage(),
-            *bpm_changes,
-            *notes,
-            *hold_connectors,
-            *sim_lines,
+        bpm_changes=columns.bpm_changes,
+        timescale_changes=[],
+        notes=[
+            ChartNote(note_kinds[kinds[i]], sorted_beats[p], sorted_lanes[p], directions[i], prev[p], next_[p])
+            for p, i in enumerate(order)
         ],
+        hold_connectors=[(positions[head], positions[tail], ConnectorEase.LINEAR) for head, tail in zip(heads, tails)],
+        sim_lines=sim_lines,
     )
@@ -0,0 +1,162 @@
+import itertools
+from array import array
+from collections.abc import Sequence
+
+from pydori.convert.chart import NO_NOTE, Chart, ChartNote
+from pydori.lib.connector import ConnectorEase
+from pydori.lib.note import NoteKind
+
+# Kinds of notes which are never connected by sim lines.
+# Anchors don't make sense to connect to, and connecting to ticks is mostly noise.
+SIM_LINE_EXCLUDED_KINDS = frozenset({NoteKind.HOLD_TICK, NoteKind.HOLD_ANCHOR})
+
+
+class ChartBuilder:
+    """Builder of charts in Python which stores notes column-wise in typed arrays.
+
+    Notes are added in any order and referred to by the index returned when adding them. Holds are linked as they're
+    added and sim lines are created when building, in a few passes over the arrays, so no archetype instances are
+    created until the built chart is converted to level data with build_level_data.
+
+    Usage:
+        builder = ChartBuilder()
+        builder.bpm_change(0, 120)
+        builder.chord(NoteKind.TAP, 4, [-2, 2])
+        builder.hold([4, 5, 6], [0, 1, 0])
+        chart = builder.build()
+    """
+
+    def __init__(self, bgm_offset: float = 0.0):
+        self.bgm_offset = bgm_offset
+        self.bpm_changes: list[tuple[float, float]] = []
+        self.timescale_changes: list[tuple[float, float]] = []
+        self.kinds = array("b")
+        self.beats = array("d")
+        self.lanes = array("d")
+        self.directions = array("b")
+        # Index of the next note of the hold each note is part of, or NO_NOTE.
+        self.next = array("l")
+        # Ease of the connector from each note to its next note.
+        self.eases = array("b")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def bpm_change(self, beat: float, bpm: float):
+        self.bpm_changes.append((beat, bpm))
+
+    def timescale_change(self, beat: float, timescale: float):
+        self.timescale_changes.append((beat, timescale))
+
+    def note(self, kind: NoteKind, beat: float, lane: float, direction: int = 0) -> int:
+        """Add a note and return its index."""
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.beats.append(beat)
+        self.lanes.append(lane)
+        self.directions.append(direction)
+        self.next.append(NO_NOTE)
+        self.eases.append(ConnectorEase.LINEAR)
+        return index
+
+    def notes(
+        self,
+        kind: NoteKind,
+        beats: Sequence[float],
+        lanes: Sequence[float],
+        directions: Sequence[int] | None = None,
+    ) -> range:
+        """Add notes of the same kind and return their indexes.
+
+        Args:
+            kind: Kind of the notes.
+            beats: Beat of each note.
+            lanes: Lane of each note.
+            directions: Direction of each note. Defaults to 0.
+        """
+        count = len(beats)
+        if len(lanes) != count or (directions is not None and len(directions) != count):
+            raise ValueError("Each note needs a beat, a lane and, if given, a direction")
+        start = len(self.kinds)
+        self.kinds.extend(array("b", [kind]) * count)
+        self.beats.extend(array("d", beats))
+        self.lanes.extend(array("d", lanes))
+        self.directions.extend(array("b", directions) if directions is not None else array("b", [0]) * count)
+        self.next.extend(array("l", [NO_NOTE]) * count)
+        self.eases.extend(array("b", [ConnectorEase.LINEAR]) * count)
+        return range(start, start + count)
+
+    def chord(self, kind: NoteKind, beat: float, lanes: Sequence[float]) -> range:
+        """Add notes of the same kind on the same beat and return their indexes."""
+        return self.notes(kind, [beat] * len(lanes), lanes)
+
+    def hold(
+        self,
+        beats: Sequence[float],
+        lanes: Sequence[float],
+        kinds: Sequence[NoteKind] | None = None,
+        ease: ConnectorEase = ConnectorEase.LINEAR,
+    ) -> range:
+        """Add the notes of a hold, linked in order, and return their indexes.
+
+        Args:
+            beats: Beat of each note, in order.
+            lanes: Lane of each note.
+            kinds: Kind of each note. Defaults to a head, ticks and an end.
+            ease: Ease of the connectors between the notes.
+        """
+        count = len(beats)
+        if count < 2:
+            raise ValueError("A hold needs at least two notes")
+        if any(a > b for a, b in itertools.pairwise(beats)):
+            raise ValueError("The notes of a hold must be in beat order")
+        if kinds is None:
+            kinds = [NoteKind.HOLD_HEAD, *[NoteKind.HOLD_TICK] * (count - 2), NoteKind.HOLD_END]
+        elif len(kinds) != count:
+            raise ValueError("Each note needs a kind")
+        indexes = self.notes(NoteKind.HOLD_TICK, beats, lanes)
+        start = indexes.start
+        self.kinds[start : start + count] = array("b", kinds)
+        # The notes are contiguous, so each is linked to the next by a single slice assignment.
+        self.next[start : start + count - 1] = array("l", range(start + 1, start + count))
+        self.eases[start : start + count - 1] = array("b", [ease]) * (count - 1)
+        return indexes
+
+    def build(self) -> Chart:
+        """Build the chart, with notes sorted by beat and sim lines connecting notes on the same beat."""
+        count = len(self.kinds)
+        beats = self.beats
+        # A stable sort keeps notes on the same beat in the order they were added.
+        order = sorted(range(count), key=beats.__getitem__)
+        positions = array("l", bytes(count * array("l").itemsize))
+        for position, index in enumerate(order):
+            positions[index] = position
+
+        sorted_beats = array("d", [beats[i] for i in order])
+        sorted_lanes = array("d", [self.lanes[i] for i in order])
+        next_ = array("l", [NO_NOTE if self.next[i] == NO_NOTE else positions[self.next[i]] for i in order])
+        prev = array("l", [NO_NOTE]) * count
+        for p, n in enumerate(next_):
+            if n != NO_NOTE:
+                prev[n] = p
+
+        # Sorting by lane and then stably by beat orders candidates by (beat, lane) using only C-level keys, so notes
+        # on the same beat are contiguous and ordered by lane.
+        sim_candidates = [p for p in range(count) if self.kinds[order[p]] not in SIM_LINE_EXCLUDED_KINDS]
+        sim_candidates.sort(key=sorted_lanes.__getitem__)
+        sim_candidates.sort(key=sorted_beats.__getitem__)
+        sim_lines = [(a, b) for a, b in itertools.pairwise(sim_candidates) if sorted_beats[a] == sorted_beats[b]]
+
+        note_kinds = {int(kind): kind for kind in NoteKind}
+        eases = {int(ease): ease for ease in ConnectorEase}
+        return Chart(
+            bgm_offset=self.bgm_offset,
+            bpm_changes=sorted(self.bpm_changes),
+            timescale_changes=sorted(self.timescale_changes),
+            notes=[
+                ChartNote(note_kinds[self.kinds[i]], sorted_beats[p], sorted_lanes[p], self.directions[i], prev[p], n)
+                for p, (i, n) in enumerate(zip(order, next_, strict=True))
+            ],
+            hold_connectors=[(p, n, eases[self.eases[order[p]]]) for p, n in enumerate(next_) if n != NO_NOTE],
+            sim_lines=sim_lines,
+        )
@@ -0,0 +1,530 @@
+import argparse
+import atexit
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+# Directory for caching downloaded content, which can be overridden with the PYDORI_CACHE_DIR environment variable.
+CACHE_DIR = Path(os.environ.get("PYDORI_CACHE_DIR") or Path(__file__).parent.parent.parent / ".cache")
+
+# Maximum total size of the disk cache, which can be overridden with the PYDORI_CACHE_MAX_BYTES environment variable.
+CACHE_MAX_BYTES = int(os.environ.get("PYDORI_CACHE_MAX_BYTES") or 4 * 1024 * 1024 * 1024)
+
+# Entries used within this many seconds are not evicted automatically, since they may be in use by another thread
+# or process that has just downloaded them.
+EVICTION_GRACE_SECONDS = 60
+
+# Number of events, such as lookups, whose statistics are buffered in memory before being written to the index.
+# Other operations on the index write any buffered statistics first, as does exiting the process.
+INDEX_FLUSH_INTERVAL = 64
+
+# Time to live in seconds of cached content by URL pattern, checked in order. Content of URLs matching none of the
+# patterns never expires. Sonolus list and item endpoints change along with the server's catalog, while assets such as
+# BGM, covers, and level data are referenced by their hash in item details and never change.
+CACHE_TTLS: list[tuple[re.Pattern, float]] = [
+    (re.compile(r"/sonolus/[^/]+/list(\?|$)"), 10 * 60),
+    (re.compile(r"/sonolus/(?!repository/)[^/]+/[^/?]+(\?|$)"), 60 * 60),
+]
+
+# Name of the index database within the cache directory.
+INDEX_NAME = "index.sqlite3"
+
+# Subdirectories of the cache directory for files named by their content hash and for in-progress downloads.
+OBJECTS_DIR_NAME = "objects"
+DOWNLOADS_DIR_NAME = "downloads"
+
+# Subdirectory of the cache directory converted charts were stored in before they were added to the index.
+LEGACY_CHARTS_DIR_NAME = "charts"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    validated REAL NOT NULL DEFAULT 0,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Columns added to the entries table after its initial version, with their definitions.
+_ADDED_COLUMNS = {
+    "validated": "REAL NOT NULL DEFAULT 0",
+    "etag": "TEXT",
+    "last_modified": "TEXT",
+}
+
+
+def ttl_for_url(url: str) -> float | None:
+    """Return the time to live in seconds of cached content from a URL, or None if it never expires."""
+    for pattern, ttl in CACHE_TTLS:
+        if pattern.search(url):
+            return ttl
+    return None
+
+
+class CacheEntry(NamedTuple):
+    path: Path
+    validated: float
+    etag: str | None
+    last_modified: str | None
+
+    def is_fresh(self, ttl: float | None) -> bool:
+        return ttl is None or time.time() - self.validated < ttl
+
+    def validator_headers(self) -> dict[str, str]:
+        """Return headers for a conditional request which the server answers with 304 if the content is unchanged."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class MemoryCache:
+    """A thread-safe LRU cache of byte strings bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached value for the key, or None if it isn't cached."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes):
+        """Cache a value, evicting the least recently used entries if the cache would exceed its size limit.
+
+        Values larger than the size limit are not cached.
+        """
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            while self._entries and self.size + len(value) > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+            self._entries[key] = value
+            self.size += len(value)
+
+    def discard(self, key: str):
+        """Remove the entry for the key if present."""
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self.size -= len(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCache:
+    """A cache of downloaded files with an index recording what each file is.
+
+    Files are content-addressed: each is stored once under its content hash, and the index maps URLs to files, so
+    identical content served under different URLs is only stored once. The index also records the size and access
+    statistics of each entry, and is used to evict the least recently used entries once the total size exceeds the
+    size limit. It is stored in an SQLite database so it can be shared by multiple threads and processes.
+
+    The database uses write-ahead logging without syncing each transaction, and the access statistics recorded by
+    lookups are buffered and written in batches, so cache hits don't wait on the disk. A crash may lose the most
+    recent statistics, but never corrupts the index.
+
+    Files handed out to be read later can be pinned, which keeps them from being evicted by this process.
+
+    A process forked from one using the cache opens its own connection to the index, since SQLite connections can't
+    be shared across a fork.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        # Time of the last buffered access and number of buffered hits of each URL.
+        self._pending_hits: dict[str, tuple[float, int]] = {}
+        self._pending_counters: Counter[str] = Counter()
+        self._pinned: set[str] = set()
+        atexit.register(self.flush)
+        _disk_caches.add(self)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.directory / INDEX_NAME, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(_SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(entries)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE entries ADD COLUMN {column} {definition}")
+            self._connection = connection
+        return self._connection
+
+    def download_path_for(self, url: str) -> Path:
+        """Return the path to download a URL's content to before it is added to the cache."""
+        return self.directory / DOWNLOADS_DIR_NAME / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def legacy_path_for(self, url: str) -> Path:
+        """Return the path a URL's content was stored at before files were content-addressed."""
+        return self.directory / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> CacheEntry | None:
+        """Return the cache entry for a URL, or None if it isn't cached.
+
+        Lookups are recorded for hit rate statistics and to track when each entry was last used. Entries are returned
+        regardless of whether they are fresh, so stale entries can be revalidated.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT file, validated, etag, last_modified FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None and (self.directory / row[0]).exists():
+                _, hits = self._pending_hits.get(url, (0, 0))
+                self._pending_hits[url] = (time.time(), hits + 1)
+                self._increment("hits")
+                file, validated, etag, last_modified = row
+                return CacheEntry(self.directory / file, validated, etag, last_modified)
+            if row is not None:
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._increment("misses")
+            return None
+
+    def add(self, url: str, path: Path, etag: str | None = None, last_modified: str | None = None) -> Path:
+        """Move a downloaded file into the cache and record it in the index.
+
+        Other entries are then evicted if the cache is over its size limit.
+
+        Args:
+            url: URL the file was downloaded from.
+            path: Path of the downloaded file, which is moved into the cache.
+            etag: ETag response header, used to revalidate the entry.
+            last_modified: Last-Modified response header, used to revalidate the entry.
+
+        Returns:
+            The path of the cached file.
+        """
+        content_hash = hash_file(path)
+        file = f"{OBJECTS_DIR_NAME}/{content_hash}"
+        object_path = self.directory / file
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        # If the content is already cached under another URL, this replaces it with an identical file.
+        os.replace(path, object_path)
+        now = time.time()
+        with self._lock:
+            self._flush()
+            previous = self.db.execute("SELECT file FROM entries WHERE url = ?", (url,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(url, file, size, content_hash, created, last_access, validated, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, file, object_path.stat().st_size, content_hash, now, now, now, etag, last_modified),
+            )
+            if previous is not None and previous[0] != file:
+                self._delete_if_unreferenced(previous[0])
+        self.evict(grace_seconds=EVICTION_GRACE_SECONDS)
+        return object_path
+
+    def mark_validated(self, url: str):
+        """Record that the server confirmed an entry is unchanged."""
+        with self._lock:
+            self._flush()
+            self.db.execute("UPDATE entries SET validated = ? WHERE url = ?", (time.time(), url))
+            self._increment("revalidations")
+
+    def discard(self, url: str):
+        """Remove the entry for a URL if present, deleting its file unless another entry refers to it."""
+        with self._lock:
+            self._flush()
+            row = self.db.execute("SELECT file FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._delete_if_unreferenced(row[0])
+
+    def pin(self, path: Path):
+        """Keep a cached file from being evicted or deleted by this process for as long as it runs.
+
+        Files are pinned when their path is handed out to be read later, such as the BGM of a level, which would
+        otherwise be evicted once the cache filled up. Other processes only spare recently used files.
+        """
+        with self._lock:
+            self._pinned.add(path.relative_to(self.directory).as_posix())
+
+    def flush(self):
+        """Write buffered access statistics to the index."""
+        with self._lock:
+            self._flush()
+
+    def evict(self, max_bytes: int | None = None, grace_seconds: float = 0) -> list[str]:
+        """Evict least recently used entries until the cache is within the size limit.
+
+        Pinned files are not evicted.
+
+        Args:
+            max_bytes: Size limit to evict down to. Defaults to the size limit of the cache.
+            grace_seconds: Entries used within this many seconds are not evicted.
+
+        Returns:
+            The URLs of the evicted entries.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        evicted = []
+        with self._lock:
+            self._flush()
+            total = self.total_size()
+            if total <= max_bytes:
+                return evicted
+            rows = self.db.execute(
+                "SELECT url, file, size FROM entries WHERE last_access < ? ORDER BY last_access",
+                (time.time() - grace_seconds,),
+            ).fetchall()
+            for url, file, size in rows:
+                if total <= max_bytes:
+                    break
+                if file in self._pinned:
+                    continue
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                if self._delete_if_unreferenced(file):
+                    total -= size
+                self._increment("evictions")
+                evicted.append(url)
+        return evicted
+
+    def prune(self, max_bytes: int | None = None) -> tuple[list[str], list[Path]]:
+        """Evict entries down to the size limit and delete files in the cache directory which aren't in the index.
+
+        Partial downloads are kept so they can be resumed. Charts stored before they were added to the index are
+        deleted.
+
+        Returns:
+            The URLs of the evicted entries and the paths of the deleted files.
+        """
+        evicted = self.evict(max_bytes)
+        with self._lock:
+            known = {file for (file,) in self.db.execute("SELECT file FROM entries")} | self._pinned
+        removed = []
+        candidates = [*self.directory.iterdir()]
+        for subdirectory in (OBJECTS_DIR_NAME, LEGACY_CHARTS_DIR_NAME):
+            if (self.directory / subdirectory).is_dir():
+                candidates.extend((self.directory / subdirectory).iterdir())
+        for path in candidates:
+            file = path.relative_to(self.directory).as_posix()
+            if not path.is_file() or file in known or path.name.startswith(INDEX_NAME):
+                continue
+            path.unlink()
+            removed.append(path)
+        return evicted, removed
+
+    def clear(self):
+        """Delete all entries and reset statistics."""
+        with self._lock:
+            self._pending_hits.clear()
+            self._pending_counters.clear()
+            for (file,) in self.db.execute("SELECT file FROM entries").fetchall():
+                (self.directory / file).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("DELETE FROM counters")
+
+    def total_size(self) -> int:
+        """Return the total size of the cached files, counting files shared by multiple entries once."""
+        return self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT file, size FROM entries)"
+        ).fetchone()[0]
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of entries, their total size, the bytes saved by deduplication, and access counts."""
+        with self._lock:
+            self._flush()
+            counters = dict(self.db.execute("SELECT name, value FROM counters"))
+            count, entries_size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            size = self.total_size()
+        return {
+            "entries": count,
+            "size": size,
+            "deduplicated": entries_size - size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "revalidations": counters.get("revalidations", 0),
+        }
+
+    def largest(self, limit: int) -> list[tuple[str, int, int]]:
+        """Return the URL, size, and hit count of the largest entries."""
+        with self._lock:
+            self._flush()
+            return self.db.execute(
+                "SELECT url, size, hits FROM entries ORDER BY size DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def _delete_if_unreferenced(self, file: str) -> bool:
+        """Delete a cached file if no entry refers to it and it isn't pinned, and return whether it was deleted."""
+        if file in self._pinned:
+            return False
+        if self.db.execute("SELECT 1 FROM entries WHERE file = ? LIMIT 1", (file,)).fetchone() is not None:
+            return False
+        (self.directory / file).unlink(missing_ok=True)
+        return True
+
+    def _reset_after_fork(self):
+        # Called in a forked child process, whose copy of the connection and lock may be in use by the parent.
+        if self._connection is not None:
+            _inherited_connections.append(self._connection)
+        self._connection = None
+        self._lock = threading.Lock()
+        # Buffered statistics are recorded by the parent.
+        self._pending_hits = {}
+        self._pending_counters = Counter()
+
+    def _increment(self, counter: str):
+        self._pending_counters[counter] += 1
+        if self._pending_counters.total() >= INDEX_FLUSH_INTERVAL:
+            self._flush()
+
+    def _flush(self):
+        # Called with the lock held.
+        if not self._pending_hits and not self._pending_counters:
+            return
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?), hits = hits + ? WHERE url = ?",
+                [(last_access, hits, url) for url, (last_access, hits) in self._pending_hits.items()],
+            )
+            db.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                self._pending_counters.items(),
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        self._pending_hits.clear()
+        self._pending_counters.clear()
+
+
+# Disk caches of this process, which are reset in forked child processes.
+_disk_caches: weakref.WeakSet[DiskCache] = weakref.WeakSet()
+
+# Index connections inherited from the parent process, which are kept rather than closed, since closing a connection in
+# a child process may affect the parent's use of the database.
+_inherited_connections: list[sqlite3.Connection] = []
+
+
+def _reset_disk_caches_after_fork():
+    for cache in _disk_caches:
+        cache._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_disk_caches_after_fork)
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def map_file(path: Path) -> memoryview:
+    """Return a read-only memory-mapped view of a non-empty file.
+
+    Pages are loaded on demand and are backed by the file, so the OS can reclaim them under memory pressure.
+    """
+    with path.open("rb") as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional K, M, or G suffix."""
+    multipliers = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    suffix = value[-1:].upper()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m pydori.convert.cache", description="Inspect and prune the cache.")
+    parser.add_argument("--dir", type=Path, default=CACHE_DIR, help="cache directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="show cache size and hit rate")
+    stats_parser.add_argument("--top", type=int, default=10, help="number of largest entries to list")
+    prune_parser = subparsers.add_parser("prune", help="evict entries down to a size limit and remove unknown files")
+    prune_parser.add_argument("--max-bytes", type=parse_size, default=None, help="size limit, e.g. 500M or 2G")
+    subparsers.add_parser("clear", help="delete all cached entries")
+    args = parser.parse_args()
+
+    cache = DiskCache(args.dir)
+    match args.command:
+        case "stats":
+            stats = cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            hit_rate = stats["hits"] / lookups if lookups else 0
+            print(f"Entries:   {stats['entries']}")
+            print(f"Size:      {format_size(stats['size'])} (limit {format_size(cache.max_bytes)})")
+            print(f"Saved:     {format_size(stats['deduplicated'])} by deduplication")
+            print(f"Hits:      {stats['hits']}")
+            print(f"Misses:    {stats['misses']}")
+            print(f"Hit rate:  {hit_rate:.1%}")
+            print(f"Evictions: {stats['evictions']}")
+            print(f"Unchanged: {stats['revalidations']}")
+            largest = cache.largest(args.top)
+            if largest:
+                print("Largest entries:")
+                for url, size, hits in largest:
+                    print(f"  {format_size(size):>10}  {hits:>6} hits  {url}")
+        case "prune":
+            evicted, removed = cache.prune(args.max_bytes)
+            print(f"Evicted {len(evicted)} entries and removed {len(removed)} unknown files.")
+            print(f"Size: {format_size(cache.total_size())}")
+        case "clear":
+            cache.clear()
+            print("Cleared cache.")
+
+
+if __name__ == "__main__":
+    main()
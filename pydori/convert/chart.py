@@ -0,0 +1,395 @@
+import os
+import struct
+import tempfile
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+from sonolus.script.level import BpmChange, LevelData
+
+from pydori.convert.cache import map_file
+from pydori.convert.timing import TimingIndex
+from pydori.convert.utils import discard_cached_content, find_cached_content_path, store_cached_content
+from pydori.lib.connector import ConnectorEase
+from pydori.lib.note import NoteKind
+from pydori.play.connector import CurvedHoldConnector, HoldConnector, SimLine
+from pydori.play.event import TimescaleChange
+from pydori.play.note import (
+    DirectionalFlickNote,
+    FlickNote,
+    HoldAnchorNote,
+    HoldEndNote,
+    HoldHeadNote,
+    HoldTickNote,
+    TapNote,
+)
+from pydori.play.stage import Stage
+
+# Prefix of the keys converted charts are stored under in the disk cache.
+CHART_CACHE_KEY_PREFIX = "chart:"
+
+# Archetype used for each kind of note.
+NOTE_ARCHETYPES = {
+    NoteKind.TAP: TapNote,
+    NoteKind.FLICK: FlickNote,
+    NoteKind.DIRECTIONAL_FLICK: DirectionalFlickNote,
+    NoteKind.HOLD_HEAD: HoldHeadNote,
+    NoteKind.HOLD_TICK: HoldTickNote,
+    NoteKind.HOLD_ANCHOR: HoldAnchorNote,
+    NoteKind.HOLD_END: HoldEndNote,
+}
+
+# Archetypes of the entities created by build_level_data.
+LEVEL_ARCHETYPES = (
+    Stage,
+    BpmChange,
+    TimescaleChange,
+    *NOTE_ARCHETYPES.values(),
+    HoldConnector,
+    CurvedHoldConnector,
+    SimLine,
+)
+
+# Index used for references to no note.
+NO_NOTE = -1
+
+# Magic bytes at the start of a binary chart.
+CHART_MAGIC = b"PDCH"
+
+# Version of the binary chart format.
+# This should be incremented whenever the layout changes, and readers reject charts with a different version.
+CHART_FORMAT_VERSION = 1
+
+# Layouts of the binary chart header and of each record in its tables. All values are little-endian.
+# The header holds the magic, format version, bgm offset, and the number of records in each table.
+_CHART_HEADER = struct.Struct("<4sHxxd5I")
+# (beat, bpm) and (beat, timescale).
+_CHART_CHANGE = struct.Struct("<dd")
+# (beat, lane, prev, next, kind, direction), padded to 32 bytes.
+_CHART_NOTE = struct.Struct("<ddiiBb6x")
+# (first, second, ease), padded to 12 bytes.
+_CHART_CONNECTOR = struct.Struct("<iiB3x")
+# (first, second).
+_CHART_SIM_LINE = struct.Struct("<ii")
+
+# Python implementations of each connector ease, matching the easing functions used at runtime.
+CONNECTOR_EASE_FUNCTIONS: dict[ConnectorEase, Callable[[float], float]] = {
+    ConnectorEase.LINEAR: lambda x: x,
+    ConnectorEase.IN: lambda x: x * x,
+    ConnectorEase.OUT: lambda x: 1 - (1 - x) ** 2,
+    ConnectorEase.IN_OUT: lambda x: 2 * x * x if x < 0.5 else 1 - (2 - 2 * x) ** 2 / 2,
+    ConnectorEase.OUT_IN: lambda x: (1 - (1 - 2 * x) ** 2) / 2 if x < 0.5 else (2 * x - 1) ** 2 / 2 + 0.5,
+}
+
+
+class ChartNote(NamedTuple):
+    kind: NoteKind
+    beat: float
+    lane: float
+    direction: int
+    # Indexes of the previous and next notes of a hold in Chart.notes, or NO_NOTE.
+    prev: int
+    next: int
+
+
+class Chart(NamedTuple):
+    """Converted level data in a plain form that can be cached before being turned into archetype instances.
+
+    Notes are referenced by their index in the notes list.
+    """
+
+    bgm_offset: float
+    # Pairs of (beat, bpm).
+    bpm_changes: list[tuple[float, float]]
+    # Pairs of (beat, timescale).
+    timescale_changes: list[tuple[float, float]]
+    notes: list[ChartNote]
+    # Triples of (first note index, second note index, ease).
+    hold_connectors: list[tuple[int, int, ConnectorEase]]
+    # Pairs of (first note index, second note index).
+    sim_lines: list[tuple[int, int]]
+
+
+def build_level_data(chart: Chart) -> LevelData:
+    """Create the entities for a chart, including the resolved timing and hold ends of each note."""
+    timing = TimingIndex(chart.bpm_changes, chart.timescale_changes)
+    notes = []
+    for note in chart.notes:
+        target_time = timing.beat_to_time(note.beat)
+        notes.append(
+            NOTE_ARCHETYPES[note.kind](
+                beat=note.beat,
+                lane=note.lane,
+                direction=note.direction,
+                target_time=target_time,
+                target_scaled_time=timing.time_to_scaled_time(target_time),
+            )
+        )
+    heads, ends = resolve_hold_ends(chart.notes)
+    for entity, note, head, end in zip(notes, chart.notes, heads, ends, strict=True):
+        if note.prev != NO_NOTE:
+            entity.prev_ref = notes[note.prev].ref()
+        if note.next != NO_NOTE:
+            entity.next_ref = notes[note.next].ref()
+        if head != NO_NOTE:
+            entity.head_ref = notes[head].ref()
+            entity.end_ref = notes[end].ref()
+    return LevelData(
+        bgm_offset=chart.bgm_offset,
+        entities=[
+            Stage(),
+            *(BpmChange(beat=beat, bpm=bpm) for beat, bpm in chart.bpm_changes),
+            *(TimescaleChange(beat=beat, timescale=timescale) for beat, timescale in chart.timescale_changes),
+            *notes,
+            *(
+                HoldConnector(first_ref=notes[a].ref(), second_ref=notes[b].ref())
+                if ease == ConnectorEase.LINEAR
+                else CurvedHoldConnector(first_ref=notes[a].ref(), second_ref=notes[b].ref(), ease=ease)
+                for a, b, ease in chart.hold_connectors
+            ),
+            *(SimLine(first_ref=notes[a].ref(), second_ref=notes[b].ref()) for a, b in chart.sim_lines),
+        ],
+    )
+
+
+def resolve_hold_ends(notes: list[ChartNote]) -> tuple[list[int], list[int]]:
+    """Return the indexes of the first and last notes of the hold each note is part of, or NO_NOTE if none.
+
+    Each hold is walked once from its first note, so this is linear in the number of notes.
+    """
+    heads = [NO_NOTE] * len(notes)
+    ends = [NO_NOTE] * len(notes)
+    for i, note in enumerate(notes):
+        if note.prev != NO_NOTE or note.next == NO_NOTE:
+            continue
+        chain = [i]
+        # Stopping at notes that were already visited guards against malformed holds that loop.
+        while (next_ := notes[chain[-1]].next) != NO_NOTE and heads[next_] == NO_NOTE and next_ != i:
+            heads[next_] = i
+            chain.append(next_)
+        heads[i] = i
+        for j in chain:
+            ends[j] = chain[-1]
+    return heads, ends
+
+
+def simplify_hold_anchors(
+    chart: Chart,
+    tolerance: float,
+    eases: Sequence[ConnectorEase] = (ConnectorEase.LINEAR,),
+) -> tuple[Chart, int]:
+    """Remove hold anchors whose removal moves the rendered hold by at most the given tolerance.
+
+    The lane of a connector is eased between its notes, with y linear in scaled time, so an anchor can be removed if
+    it's within the tolerance of a connector with one of the given eases that would replace it. Runs of anchors are
+    replaced by a single connector if one fits the whole run, and are otherwise merged greedily, extending each
+    connector for as long as every anchor it replaces stays within the tolerance.
+    Allowing eases other than linear lets curved runs of anchors be replaced by a single curved connector.
+
+    Args:
+        chart: The chart to simplify.
+        tolerance: Maximum distance in lanes between a removed anchor and the connector replacing it.
+        eases: Eases that connectors replacing anchors may use, in order of preference.
+
+    Returns:
+        The simplified chart and the number of entities removed.
+    """
+    notes = chart.notes
+    timing = TimingIndex(chart.bpm_changes, chart.timescale_changes)
+    scaled_times = [timing.time_to_scaled_time(timing.beat_to_time(note.beat)) for note in notes]
+
+    def fit_connector(a: int, b: int, skipped: list[int]) -> ConnectorEase | None:
+        duration = scaled_times[b] - scaled_times[a]
+        if duration <= 0:
+            return None
+        progresses = [(scaled_times[i] - scaled_times[a]) / duration for i in skipped]
+        for ease in eases:
+            ease_function = CONNECTOR_EASE_FUNCTIONS[ease]
+            if all(
+                abs(notes[i].lane - (notes[a].lane + (notes[b].lane - notes[a].lane) * ease_function(progress)))
+                <= tolerance
+                for i, progress in zip(skipped, progresses, strict=True)
+            ):
+                return ease
+        return None
+
+    removed = [False] * len(notes)
+    # Ease of the connector starting at each note that replaces anchors.
+    fitted_eases: dict[int, ConnectorEase] = {}
+    heads, _ = resolve_hold_ends(notes)
+    for i, head in enumerate(heads):
+        if head != i:
+            continue
+        chain = [i]
+        while (next_ := notes[chain[-1]].next) != NO_NOTE and heads[next_] == i and next_ != i:
+            chain.append(next_)
+        start = 0
+        while start < len(chain) - 1:
+            # A run of anchors often samples a single curve, which a connector over the whole run fits but whose
+            # prefixes may not fit any ease, so the whole run is tried before extending a connector anchor by anchor.
+            run_end = start + 1
+            while run_end + 1 < len(chain) and notes[chain[run_end]].kind == NoteKind.HOLD_ANCHOR:
+                run_end += 1
+            if (
+                run_end > start + 1
+                and notes[chain[start]].kind != NoteKind.HOLD_ANCHOR
+                and (ease := fit_connector(chain[start], chain[run_end], chain[start + 1 : run_end])) is not None
+            ):
+                fitted_eases[chain[start]] = ease
+                for j in chain[start + 1 : run_end]:
+                    removed[j] = True
+                start = run_end
+                continue
+            end = start + 1
+            while end + 1 < len(chain) and notes[chain[end]].kind == NoteKind.HOLD_ANCHOR:
+                ease = fit_connector(chain[start], chain[end + 1], chain[start + 1 : end + 1])
+                if ease is None:
+                    break
+                fitted_eases[chain[start]] = ease
+                end += 1
+            for j in chain[start + 1 : end]:
+                removed[j] = True
+            start = end
+
+    if not any(removed):
+        return chart, 0
+
+    positions = []
+    position = 0
+    for is_removed in removed:
+        positions.append(NO_NOTE if is_removed else position)
+        position += not is_removed
+
+    def kept(i: int, step: str) -> int:
+        while i != NO_NOTE and removed[i]:
+            i = getattr(notes[i], step)
+        return positions[i] if i != NO_NOTE else NO_NOTE
+
+    simplified = Chart(
+        bgm_offset=chart.bgm_offset,
+        bpm_changes=chart.bpm_changes,
+        timescale_changes=chart.timescale_changes,
+        notes=[
+            note._replace(prev=kept(note.prev, "prev"), next=kept(note.next, "next"))
+            for note, is_removed in zip(notes, removed, strict=True)
+            if not is_removed
+        ],
+        hold_connectors=[
+            (positions[a], kept(b, "next"), fitted_eases.get(a, ease))
+            for a, b, ease in chart.hold_connectors
+            if not removed[a]
+        ],
+        sim_lines=[(positions[a], positions[b]) for a, b in chart.sim_lines if not removed[a] and not removed[b]],
+    )
+    removed_count = (
+        len(chart.notes)
+        - len(simplified.notes)
+        + len(chart.hold_connectors)
+        - len(simplified.hold_connectors)
+        + len(chart.sim_lines)
+        - len(simplified.sim_lines)
+    )
+    return simplified, removed_count
+
+
+def dump_chart(chart: Chart) -> bytes:
+    """Serialize a chart to the binary chart format.
+
+    The format is a fixed-size header followed by tables of fixed-width records for BPM changes, timescale changes,
+    notes, hold connectors and sim lines, in that order, so it can be read without any parsing beyond unpacking.
+    """
+    parts = [
+        _CHART_HEADER.pack(
+            CHART_MAGIC,
+            CHART_FORMAT_VERSION,
+            chart.bgm_offset,
+            len(chart.bpm_changes),
+            len(chart.timescale_changes),
+            len(chart.notes),
+            len(chart.hold_connectors),
+            len(chart.sim_lines),
+        ),
+        *(_CHART_CHANGE.pack(beat, bpm) for beat, bpm in chart.bpm_changes),
+        *(_CHART_CHANGE.pack(beat, timescale) for beat, timescale in chart.timescale_changes),
+        *(
+            _CHART_NOTE.pack(note.beat, note.lane, note.prev, note.next, note.kind, note.direction)
+            for note in chart.notes
+        ),
+        *(_CHART_CONNECTOR.pack(a, b, ease) for a, b, ease in chart.hold_connectors),
+        *(_CHART_SIM_LINE.pack(a, b) for a, b in chart.sim_lines),
+    ]
+    return b"".join(parts)
+
+
+def load_chart(data: bytes | memoryview) -> Chart:
+    """Deserialize a chart in the binary chart format."""
+    try:
+        magic, version, bgm_offset, *counts = _CHART_HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError("Truncated chart header") from e
+    if magic != CHART_MAGIC:
+        raise ValueError("Not a pydori chart")
+    if version != CHART_FORMAT_VERSION:
+        raise ValueError(f"Unsupported chart format version: {version}")
+    data = memoryview(data)
+    offset = _CHART_HEADER.size
+    tables = []
+    for record, count in zip(
+        (_CHART_CHANGE, _CHART_CHANGE, _CHART_NOTE, _CHART_CONNECTOR, _CHART_SIM_LINE), counts, strict=True
+    ):
+        end = offset + record.size * count
+        if end > len(data):
+            raise ValueError("Truncated chart")
+        tables.append(record.iter_unpack(data[offset:end]))
+        offset = end
+    bpm_changes, timescale_changes, notes, hold_connectors, sim_lines = tables
+    note_kinds = {int(kind): kind for kind in NoteKind}
+    connector_eases = {int(ease): ease for ease in ConnectorEase}
+    try:
+        return Chart(
+            bgm_offset=bgm_offset,
+            bpm_changes=list(bpm_changes),
+            timescale_changes=list(timescale_changes),
+            notes=[
+                ChartNote(note_kinds[kind], beat, lane, direction, prev, next_)
+                for beat, lane, prev, next_, kind, direction in notes
+            ],
+            hold_connectors=[(a, b, connector_eases[ease]) for a, b, ease in hold_connectors],
+            sim_lines=list(sim_lines),
+        )
+    except KeyError as e:
+        raise ValueError(f"Invalid note kind or connector ease in chart: {e.args[0]}") from None
+
+
+def read_chart(path: Path) -> Chart:
+    """Read a chart in the binary chart format from a file, which is memory-mapped rather than read into memory."""
+    return load_chart(map_file(path))
+
+
+def write_chart(path: Path, chart: Chart):
+    """Atomically write a chart in the binary chart format to a file."""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(dump_chart(chart))
+    os.replace(temp_path, path)
+
+
+def load_cached_chart(key: str) -> Chart | None:
+    """Return the cached chart for a key, or None if there isn't one.
+
+    Charts are cached in the disk cache, so they count towards its size limit and are evicted and pruned along with
+    downloaded content. Invalid cached charts are removed from the cache.
+    """
+    path = find_cached_content_path(CHART_CACHE_KEY_PREFIX + key)
+    if path is None:
+        return None
+    try:
+        return read_chart(path)
+    except (OSError, ValueError):
+        discard_cached_content(CHART_CACHE_KEY_PREFIX + key)
+        return None
+
+
+def store_cached_chart(key: str, chart: Chart):
+    """Cache a chart under a key, replacing any chart cached under it."""
+    store_cached_content(CHART_CACHE_KEY_PREFIX + key, lambda f: f.write(dump_chart(chart)))
@@ -0,0 +1,345 @@
+import base64
+import os
+import re
+import threading
+import zlib
+from http.client import HTTPConnection, HTTPException, HTTPMessage, HTTPResponse, HTTPSConnection, IncompleteRead
+from pathlib import Path
+from typing import NamedTuple
+from urllib.error import HTTPError
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+# Headers sent with every request.
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+}
+
+# Headers added to requests for text content such as JSON, which servers may compress.
+# Binary resources are requested without them, since they are typically compressed already, and a server that
+# compressed them anyway would only add work on both ends.
+TEXT_HEADERS = {"Accept-Encoding": "gzip"}
+
+# Maximum number of idle connections kept open per host.
+MAX_IDLE_CONNECTIONS_PER_HOST = 8
+
+# Maximum number of redirects followed for a single request.
+MAX_REDIRECTS = 5
+
+# Timeout in seconds for connecting and for each read.
+TIMEOUT = 60
+
+# Size of chunks read from the network.
+CHUNK_SIZE = 64 * 1024
+
+# Exceptions indicating that a reused keep-alive connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (ConnectionResetError, BrokenPipeError, ConnectionAbortedError, HTTPException)
+
+# Scheme, host and port of a server, and the URL of the proxy used to reach it, if any.
+_HostKey = tuple[str, str, int, str | None]
+
+
+class ConnectionPool:
+    """A thread-safe pool of keep-alive connections, grouped by host."""
+
+    def __init__(self, max_idle_per_host: int = MAX_IDLE_CONNECTIONS_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[_HostKey, list[HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: _HostKey) -> tuple[HTTPConnection, bool]:
+        """Return a connection for the given host and whether it was reused from the pool."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port, proxy = key
+        if proxy is None:
+            connection_type = HTTPSConnection if scheme == "https" else HTTPConnection
+            return connection_type(host, port, timeout=TIMEOUT), False
+        proxy_parts = urlsplit(proxy)
+        connection_type = HTTPSConnection if proxy_parts.scheme == "https" else HTTPConnection
+        connection = connection_type(proxy_parts.hostname, _default_port(proxy_parts), timeout=TIMEOUT)
+        if scheme == "https":
+            # HTTPS requests are tunneled through the proxy, which only sees the host.
+            connection.set_tunnel(host, port, headers=_proxy_headers(proxy))
+        return connection, False
+
+    def release(self, key: _HostKey, connection: HTTPConnection):
+        """Return a connection to the pool so it can be reused."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class Response:
+    """A response to a request made through a connection pool.
+
+    The body is transparently decompressed if the server applied gzip content encoding.
+    The connection is returned to the pool once the body has been fully read and the response is closed.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        response: HTTPResponse,
+        connection: HTTPConnection,
+        key: _HostKey,
+        pool: ConnectionPool,
+    ):
+        self.url = url
+        self._response = response
+        self._connection = connection
+        self._key = key
+        self._pool = pool
+        self._decompressor = (
+            zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if response.getheader("Content-Encoding", "").lower() == "gzip"
+            else None
+        )
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason
+
+    @property
+    def headers(self) -> HTTPMessage:
+        return self._response.headers
+
+    def read_chunk(self, size: int = CHUNK_SIZE) -> bytes:
+        """Read and return the next chunk of the (decoded) body, or an empty bytes object at the end of the body."""
+        while True:
+            raw = self._response.read(size)
+            if not raw and self._response.length:
+                # Unlike read(), read(amt) doesn't raise if the connection closes before the end of the body.
+                raise IncompleteRead(b"", self._response.length)
+            if self._decompressor is None:
+                return raw
+            if not raw:
+                return self._decompressor.flush()
+            data = self._decompressor.decompress(raw)
+            if data:
+                return data
+
+    def read(self) -> bytes:
+        """Read and return the rest of the (decoded) body."""
+        raw = self._response.read()
+        if self._decompressor is None:
+            return raw
+        return self._decompressor.decompress(raw) + self._decompressor.flush()
+
+    def close(self):
+        if self._connection is None:
+            return
+        if not self._response.isclosed() and self._response.length == 0:
+            # Responses without a body, such as 304 Not Modified, are complete but only marked as such once read.
+            self._response.read()
+        if self._response.isclosed() and not self._response.will_close and not self._response.length:
+            self._pool.release(self._key, self._connection)
+        else:
+            self._response.close()
+            self._connection.close()
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _send(pool: ConnectionPool, url: str, headers: dict[str, str]) -> Response:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported URL scheme: {url}")
+    proxy = _proxy_for(parts.scheme, parts.hostname)
+    key = (parts.scheme, parts.hostname, _default_port(parts), proxy)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    if proxy is not None and parts.scheme == "http":
+        # Plain HTTP requests are sent to the proxy with the full URL as the target.
+        target = f"http://{parts.netloc.rpartition('@')[2]}{target}"
+        headers = {**headers, **_proxy_headers(proxy)}
+    while True:
+        connection, reused = pool.acquire(key)
+        try:
+            connection.request("GET", target, headers=headers)
+            response = connection.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            connection.close()
+            if reused:
+                # The server closed the idle connection, so retry with a fresh one.
+                continue
+            raise
+        except BaseException:
+            connection.close()
+            raise
+        return Response(url, response, connection, key, pool)
+
+
+def _default_port(parts: SplitResult) -> int:
+    return parts.port or (443 if parts.scheme == "https" else 80)
+
+
+def _proxy_for(scheme: str, host: str) -> str | None:
+    """Return the URL of the proxy to reach a host through, or None to connect directly.
+
+    Proxies are configured the same way as for urllib, such as by the HTTP_PROXY, HTTPS_PROXY and NO_PROXY
+    environment variables.
+    """
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(host):
+        return None
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def _proxy_headers(proxy: str) -> dict[str, str]:
+    parts = urlsplit(proxy)
+    if parts.username is None:
+        return {}
+    credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")}
+
+
+def request(url: str, headers: dict[str, str] | None = None, pool: ConnectionPool | None = None) -> Response:
+    """Make a GET request to the given URL, following redirects.
+
+    Requests are sent through the proxy configured for the URL's scheme, if any.
+
+    Responses with an error status raise an HTTPError. Other responses (including 304 Not Modified) are returned
+    and should be closed by the caller, ideally by using the response as a context manager.
+    """
+    pool = pool or default_pool
+    headers = {**DEFAULT_HEADERS, **(headers or {})}
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _send(pool, url, headers)
+        location = response.headers.get("Location")
+        if response.status in (301, 302, 303, 307, 308) and location:
+            response.read()
+            response.close()
+            url = urljoin(url, location)
+            continue
+        if response.status >= 400:
+            response.read()
+            response.close()
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return response
+    raise HTTPError(url, 310, "Too many redirects", HTTPMessage(), None)
+
+
+def fetch(url: str, headers: dict[str, str] | None = None) -> bytes:
+    """Fetch the content at the given URL."""
+    with request(url, headers) as response:
+        return response.read()
+
+
+class DownloadResult(NamedTuple):
+    status: int
+    headers: HTTPMessage
+
+
+def download(url: str, path: Path, headers: dict[str, str] | None = None, resume: bool = True) -> DownloadResult:
+    """Download the content at the given URL to a file.
+
+    The content is streamed in chunks to a temporary file next to the destination, which is fsynced and atomically
+    renamed into place once complete, so the destination never holds a truncated download. If an earlier download
+    was interrupted, the temporary file is kept along with the ETag or Last-Modified date of the response, and the
+    download is resumed from where it stopped using an HTTP range request conditional on that validator. If the
+    content changed in the meantime, the server sends it in full and the download restarts from the beginning.
+
+    If the headers make the request conditional and the server responds with 304 Not Modified, the destination is
+    left unchanged.
+
+    Args:
+        url: URL to download.
+        path: Destination path.
+        headers: Additional request headers.
+        resume: Whether to resume an interrupted download. This should be disabled when the content may have
+            changed since the interrupted download started.
+
+    Returns:
+        The status and headers of the response.
+    """
+    partial = path.with_name(path.name + ".part")
+    validator_path = path.with_name(path.name + ".part.validator")
+    validator = validator_path.read_text("utf-8") if resume and validator_path.exists() else ""
+    if not validator:
+        # Without a validator, there's no way to tell whether the partial file is a prefix of the current content.
+        partial.unlink(missing_ok=True)
+    offset = partial.stat().st_size if partial.exists() else 0
+    request_headers = dict(headers or {})
+    if offset > 0:
+        request_headers["Range"] = f"bytes={offset}-"
+        # The range is only sent if the content is unchanged. Otherwise the server sends the full content.
+        request_headers["If-Range"] = validator
+        # Ranges apply to the encoded content, but the partial file holds decoded content.
+        request_headers["Accept-Encoding"] = "identity"
+    try:
+        response = request(url, request_headers)
+    except HTTPError as e:
+        if e.code != 416 or offset == 0:
+            raise
+        # The partial file is not a prefix of the content, so it's discarded and the download restarted.
+        partial.unlink()
+        return download(url, path, headers, resume=False)
+    with response:
+        if response.status == 304:
+            return DownloadResult(response.status, response.headers)
+        if offset > 0 and _content_range_start(response) != offset:
+            # The content changed or the server ignored the range request, so the full content is being sent.
+            offset = 0
+        if offset == 0:
+            validator = _validator(response)
+            if validator:
+                validator_path.write_text(validator, "utf-8")
+            else:
+                validator_path.unlink(missing_ok=True)
+        with partial.open("r+b" if offset > 0 else "wb") as f:
+            f.seek(offset)
+            f.truncate()
+            while chunk := response.read_chunk():
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(partial, path)
+    validator_path.unlink(missing_ok=True)
+    return DownloadResult(response.status, response.headers)
+
+
+def _validator(response: Response) -> str | None:
+    # If-Range requires a strong validator, so weak ETags can't be used.
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _content_range_start(response: Response) -> int | None:
+    if response.status != 206:
+        return None
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+# Connection pool shared by all downloads.
+default_pool = ConnectionPool()
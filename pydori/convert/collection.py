@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import struct
+import zipfile
+from functools import lru_cache
+from os import PathLike
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import unquote, urlsplit
+
+from pydori.convert.cache import map_file
+from pydori.convert.utils import MMAP_THRESHOLD_BYTES, LevelSource, get_cached_content_path, make_relative
+
+# Prefix of the members holding level items in a collection.
+LEVELS_PREFIX = "sonolus/levels/"
+
+# Names under LEVELS_PREFIX which aren't level items.
+LEVELS_NON_ITEM_NAMES = {"list", "info"}
+
+# Prefix of the members holding resources in a collection, which are named by their hash.
+REPOSITORY_PREFIX = "repository/"
+
+# Layout of the fixed-size part of a zip local file header, which precedes the data of each member.
+_LOCAL_FILE_HEADER = struct.Struct("<4s22xHH")
+_LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+
+# Size of chunks used when copying compressed members into the disk cache.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class CollectionSource(LevelSource):
+    """A source of levels read from a local Sonolus collection archive, without any network access.
+
+    The archive is a zip file holding level items under sonolus/levels/ and the resources they reference under
+    repository/, named by their hash. Members stored without compression are read directly from a memory map of the
+    archive, so level data is never copied, and large assets are copied into the disk cache without being held in
+    memory so they can be referenced by path.
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path).resolve()
+        with zipfile.ZipFile(self.path) as archive:
+            self._members = {info.filename: info for info in archive.infolist() if not info.is_dir()}
+        self._map = map_file(self.path)
+
+    def level_names(self) -> list[str]:
+        """Return the names of all levels in the collection."""
+        return sorted(
+            name[len(LEVELS_PREFIX) :]
+            for name in self._members
+            if name.startswith(LEVELS_PREFIX)
+            and "/" not in name[len(LEVELS_PREFIX) :]
+            and name[len(LEVELS_PREFIX) :] not in LEVELS_NON_ITEM_NAMES
+        )
+
+    def get_level_item(self, name: str) -> dict:
+        data = json.loads(bytes(self._read(self._members[LEVELS_PREFIX + name])))
+        return data.get("item", data)
+
+    def get_asset(self, srl: dict) -> bytes | Path:
+        info = self._member_for(srl)
+        if info.file_size >= MMAP_THRESHOLD_BYTES:
+            # Sonolus only accepts assets as bytes or a path, so large members are copied into the cache once to
+            # be referenced by path. The key identifies the content by the archive and the member's checksum, so a
+            # changed member is copied into the cache again.
+            key = f"collection:{self.path}:{info.filename}:{info.CRC:08x}:{info.file_size}"
+            return get_cached_content_path(key, lambda dst: self._copy(info, dst))
+        return bytes(self._read(info))
+
+    def get_buffer(self, srl: dict) -> bytes | memoryview:
+        return self._read(self._member_for(srl))
+
+    def _member_for(self, srl: dict) -> zipfile.ZipInfo:
+        candidates = []
+        if srl.get("url"):
+            path = make_relative(unquote(urlsplit(srl["url"]).path))
+            candidates += [path, path.removeprefix("sonolus/")]
+        if srl.get("hash"):
+            candidates.append(REPOSITORY_PREFIX + srl["hash"])
+        for candidate in candidates:
+            if candidate in self._members:
+                return self._members[candidate]
+        raise FileNotFoundError(f"Resource {srl.get('url') or srl.get('hash')!r} not found in {self.path}")
+
+    def _copy(self, info: zipfile.ZipInfo, dst: BinaryIO):
+        start = self._stored_start(info)
+        if start is None:
+            with zipfile.ZipFile(self.path) as archive, archive.open(info) as src:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            return
+        if not hasattr(os, "copy_file_range"):
+            dst.write(self._map[start : start + info.file_size])
+            return
+        try:
+            # Stored members are copied straight from the archive by the kernel, which may share the underlying
+            # blocks on filesystems supporting it rather than copying them.
+            with self.path.open("rb") as src:
+                offset = start
+                end = start + info.file_size
+                while offset < end:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), end - offset, offset)
+                    if copied == 0:
+                        raise zipfile.BadZipFile(f"Truncated member {info.filename!r} in {self.path}")
+                    offset += copied
+        except OSError:
+            # Not supported by the filesystem.
+            dst.seek(0)
+            dst.truncate()
+            dst.write(self._map[start : start + info.file_size])
+
+    def _read(self, info: zipfile.ZipInfo) -> bytes | memoryview:
+        # Stored members are contiguous in the archive, so they can be sliced out of the memory map without copying.
+        start = self._stored_start(info)
+        if start is not None:
+            return self._map[start : start + info.file_size]
+        with zipfile.ZipFile(self.path) as archive:
+            return archive.read(info)
+
+    def _stored_start(self, info: zipfile.ZipInfo) -> int | None:
+        """Return the offset of the data of a member stored without compression or encryption, or None otherwise."""
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        signature, name_length, extra_length = _LOCAL_FILE_HEADER.unpack_from(self._map, info.header_offset)
+        if signature != _LOCAL_FILE_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local file header for {info.filename!r} in {self.path}")
+        return info.header_offset + _LOCAL_FILE_HEADER.size + name_length + extra_length
+
+
+@lru_cache(maxsize=8)
+def open_collection(path: PathLike) -> CollectionSource:
+    """Return a source for the collection archive at the given path, reusing one already opened by this process."""
+    return CollectionSource(path)
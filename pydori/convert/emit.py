@@ -0,0 +1,134 @@
+import argparse
+import gzip
+import json
+import struct
+from typing import NamedTuple
+
+from sonolus.build.level import build_level_data
+from sonolus.script.level import LevelData
+
+# Layout of the 32-bit floats entity data is stored as at runtime.
+_FLOAT32 = struct.Struct("<f")
+
+# Options passed to json.dumps for compact level data, which is never read by people.
+JSON_OPTIONS = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+class EmissionReport(NamedTuple):
+    """Sizes in bytes of level data packaged by Sonolus.py and packaged compactly, before and after gzip."""
+
+    full_bytes: int
+    full_gzip_bytes: int
+    compact_bytes: int
+    compact_gzip_bytes: int
+
+    def __str__(self) -> str:
+        return (
+            f"{_format_saving(self.full_bytes, self.compact_bytes)} raw, "
+            f"{_format_saving(self.full_gzip_bytes, self.compact_gzip_bytes)} gzip"
+        )
+
+
+def compact_level_data(data: dict) -> dict:
+    """Return an equivalent but smaller version of Sonolus level data JSON, as built by build_level_data.
+
+    Sonolus.py names every entity and writes every imported field, including those with the default value of zero.
+    Fields with a value of zero are omitted, since missing fields are read as zero anyway, and only entities that are
+    referenced are named, with their index among them in base 36 to keep names short in large levels. Values are also
+    written with the fewest digits that give the same 32-bit float, which is all the precision they have at runtime.
+
+    Args:
+        data: Level data JSON, as returned by sonolus.build.level.build_level_data.
+    """
+    referenced = {entry["ref"] for entity in data["entities"] for entry in entity["data"] if "ref" in entry}
+    names = {}
+    for entity in data["entities"]:
+        if entity.get("name") in referenced:
+            names[entity["name"]] = _base36(len(names))
+
+    def compact_entity(entity: dict) -> dict:
+        result = {"archetype": entity["archetype"], "data": []}
+        for entry in entity["data"]:
+            if "ref" in entry:
+                result["data"].append({"name": entry["name"], "ref": names[entry["ref"]]})
+            elif entry["value"]:
+                result["data"].append({"name": entry["name"], "value": _shorten(entry["value"])})
+        if entity.get("name") in names:
+            result["name"] = names[entity["name"]]
+        return result
+
+    return {"bgmOffset": _shorten(data["bgmOffset"]), "entities": [compact_entity(e) for e in data["entities"]]}
+
+
+def package_compact_level_data(level_data: LevelData) -> bytes:
+    """Package level data compactly as gzip-compressed JSON, ready to be served as a level's data.
+
+    This is a drop-in replacement for sonolus.build.level.package_level_data producing smaller output.
+    """
+    data = compact_level_data(build_level_data(level_data))
+    return gzip.compress(json.dumps(data, **JSON_OPTIONS).encode("utf-8"), mtime=0)
+
+
+def measure_emission(level_data: LevelData) -> EmissionReport:
+    """Return the sizes of level data packaged by Sonolus.py and packaged compactly."""
+    data = build_level_data(level_data)
+    # Sonolus.py packages level data with json.dumps(value, separators=(",", ":")) and gzip.
+    full = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    compact = json.dumps(compact_level_data(data), **JSON_OPTIONS).encode("utf-8")
+    return EmissionReport(
+        full_bytes=len(full),
+        full_gzip_bytes=len(gzip.compress(full, mtime=0)),
+        compact_bytes=len(compact),
+        compact_gzip_bytes=len(gzip.compress(compact, mtime=0)),
+    )
+
+
+def _shorten(value: float) -> float:
+    if float(value).is_integer():
+        return int(value)
+    try:
+        (single,) = _FLOAT32.unpack(_FLOAT32.pack(value))
+    except OverflowError:
+        return value
+    for precision in range(1, 10):
+        shortened = float(f"{value:.{precision}g}")
+        if _FLOAT32.unpack(_FLOAT32.pack(shortened))[0] == single:
+            return shortened
+    return value
+
+
+def _base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        n, digit = divmod(n, 36)
+        result = digits[digit] + result
+        if n == 0:
+            return result
+
+
+def _format_saving(before: int, after: int) -> str:
+    saving = 1 - after / before if before else 0
+    return f"{before} -> {after} bytes ({saving:.1%} smaller)"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m pydori.convert.emit", description="Report the size of compactly packaged Bandori level data."
+    )
+    parser.add_argument("names", nargs="+", help="names of the levels to report on")
+    parser.add_argument("--collection", type=str, default=None, help="collection archive to read levels from")
+    args = parser.parse_args()
+
+    from pydori.convert.bestdori import BESTDORI_BASE_URL, convert_sonolus_bandori_level_source
+    from pydori.convert.collection import open_collection
+    from pydori.convert.utils import ServerSource
+
+    source = open_collection(args.collection) if args.collection else ServerSource(BESTDORI_BASE_URL)
+    for name in args.names:
+        level_data = convert_sonolus_bandori_level_source(source.get_buffer(source.get_level_item(name)["data"]))
+        print(f"{name}: {measure_emission(level_data)}")
+
+
+if __name__ == "__main__":
+    main()
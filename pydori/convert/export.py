@@ -0,0 +1,293 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Mapping
+from os import PathLike
+from pathlib import Path
+
+from sonolus.build.project import BLANK_AUDIO, BLANK_PNG
+from sonolus.script.level import Level
+from sonolus.script.metadata import Tag
+
+from pydori.convert.emit import package_compact_level_data
+from pydori.convert.utils import PREFIX
+
+# Version of the layout written by the exporter, recorded in the manifest.
+EXPORT_FORMAT_VERSION = 1
+
+# Name of the manifest listing every exported file.
+MANIFEST_NAME = "manifest.json"
+
+# Directory holding resources, which are named by their SHA-1 hash as Sonolus expects, so they never change once
+# written and can be cached indefinitely.
+REPOSITORY_DIR = "sonolus/repository"
+
+# Keys of the resources referenced by a level item.
+LEVEL_RESOURCE_KEYS = ("cover", "bgm", "preview", "data")
+
+# Level items reference these resources, which all use the engine's defaults.
+DEFAULT_USE_RESOURCES = {
+    "useSkin": {"useDefault": True},
+    "useBackground": {"useDefault": True},
+    "useEffect": {"useDefault": True},
+    "useParticle": {"useDefault": True},
+}
+
+
+class StaticRepository:
+    """Writer of a static Sonolus server directory that can be served as plain files by a CDN or web server.
+
+    Items and lists are written at the paths a Sonolus client requests (e.g. sonolus/levels/<name>), each with a
+    pre-compressed .gz variant for servers that support serving them (e.g. nginx gzip_static). Resources such as
+    level data and assets are written to the repository named by their hash, so they're immutable and existing ones
+    are never rewritten when exporting again. A manifest lists every file with its hash and size, and the fingerprint
+    of the source of each file written with one, so unchanged files can be reused by later exports.
+    """
+
+    def __init__(self, directory: PathLike):
+        self.directory = Path(directory)
+        # Hash and size of each written file by path relative to the directory.
+        self.files: dict[str, dict] = {}
+        # Fingerprint of the source of each file written with one by path relative to the directory.
+        self.fingerprints: dict[str, str] = {}
+        try:
+            self.previous = json.loads((self.directory / MANIFEST_NAME).read_bytes())
+        except (OSError, ValueError):
+            self.previous = {}
+
+    def add_resource(self, content: bytes | PathLike | str) -> dict:
+        """Add a resource to the repository and return a Sonolus resource locator for it.
+
+        Args:
+            content: Content of the resource, or the path of a file holding it.
+        """
+        if isinstance(content, bytes):
+            digest = hashlib.sha1(content).hexdigest()
+            size = len(content)
+        else:
+            with open(content, "rb") as f:
+                digest = hashlib.file_digest(f, "sha1").hexdigest()
+            size = os.path.getsize(content)
+        relative_path = f"{REPOSITORY_DIR}/{digest}"
+        path = self.directory / relative_path
+        if not path.exists():
+            if isinstance(content, bytes):
+                _write_atomic(path, content)
+            else:
+                _copy_atomic(Path(content), path)
+        self.files[relative_path] = {"hash": digest, "size": size}
+        return {"hash": digest, "url": f"/{relative_path}"}
+
+    def reuse_level(self, relative_path: str, fingerprint: str | None) -> dict | None:
+        """Return a previously exported level details file if it was written with the same fingerprint.
+
+        The resources the level references are kept in the manifest. If the file or any of its resources is missing,
+        None is returned so the level is exported again.
+        """
+        if fingerprint is None or self.previous.get("fingerprints", {}).get(relative_path) != fingerprint:
+            return None
+        try:
+            details = json.loads((self.directory / relative_path).read_bytes())
+        except (OSError, ValueError):
+            return None
+        resources = {}
+        for key in LEVEL_RESOURCE_KEYS:
+            srl = details["item"].get(key)
+            if srl is None:
+                continue
+            resource_path = f"{REPOSITORY_DIR}/{srl['hash']}"
+            if resource_path not in self.previous["files"] or not (self.directory / resource_path).exists():
+                return None
+            resources[resource_path] = self.previous["files"][resource_path]
+        self.files.update(resources)
+        return details
+
+    def write_json(self, relative_path: str, data: dict | list, fingerprint: str | None = None):
+        """Write a JSON file and a gzip-compressed variant of it.
+
+        Args:
+            relative_path: Path of the file relative to the directory.
+            data: Content of the file.
+            fingerprint: Fingerprint of the source of the content, recorded in the manifest for reuse_level.
+        """
+        content = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _write_atomic(self.directory / relative_path, content)
+        # A fixed mtime keeps the compressed variant identical for identical content.
+        _write_atomic(self.directory / f"{relative_path}.gz", gzip.compress(content, mtime=0))
+        self.files[relative_path] = {"hash": hashlib.sha1(content).hexdigest(), "size": len(content)}
+        if fingerprint is not None:
+            self.fingerprints[relative_path] = fingerprint
+
+    def write_manifest(self, levels: list[str], playlists: list[str]):
+        """Write the manifest listing every exported item and file."""
+        manifest = {
+            "version": EXPORT_FORMAT_VERSION,
+            "levels": levels,
+            "playlists": playlists,
+            "files": dict(sorted(self.files.items())),
+            "fingerprints": dict(sorted(self.fingerprints.items())),
+        }
+        _write_atomic(self.directory / MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"))
+
+
+def export_repository(
+    path: PathLike,
+    levels: Iterable[Level],
+    engine_item: dict,
+    playlists: Iterable[dict] = (),
+    fingerprints: Mapping[str, str] | None = None,
+    title: str = "pydori",
+) -> list[str]:
+    """Export levels and playlists as a static Sonolus server directory.
+
+    Level data is packaged compactly and gzip-compressed once during export, so serving it costs no CPU per request.
+    Levels with a fingerprint matching the one they were last exported to the directory with are reused without
+    accessing their data or assets, so lazy levels that haven't changed are never converted.
+
+    Args:
+        path: Directory to export to. Existing resources in it are reused.
+        levels: Levels to export.
+        engine_item: Sonolus engine item the levels use, as built for the engine.
+        playlists: Raw playlist items from a Sonolus server, as passed to write_playlist_items. Levels are
+            referenced by their name on the server and must be among the exported levels.
+        fingerprints: Fingerprints of the sources of levels by level name, which should change whenever the exported
+            level would.
+        title: Title of the server.
+
+    Returns:
+        Names of the levels which were exported rather than reused.
+    """
+    repository = StaticRepository(path)
+    level_items = {}
+    exported = []
+    for level in levels:
+        details_path = f"sonolus/levels/{level.name}"
+        fingerprint = (fingerprints or {}).get(level.name)
+        details = repository.reuse_level(details_path, fingerprint)
+        if details is None:
+            details = {
+                "item": _level_item(repository, level, engine_item),
+                "description": _localize_text(level.description) if level.description is not None else "",
+                "actions": [],
+                "hasCommunity": False,
+                "leaderboards": [],
+                "sections": [],
+            }
+            exported.append(level.name)
+        else:
+            # The engine isn't part of the fingerprint, so it's updated even for reused levels.
+            details["item"]["engine"] = engine_item
+        repository.write_json(details_path, details, fingerprint)
+        level_items[level.name] = details["item"]
+
+    playlist_items = []
+    for playlist in playlists:
+        item = {
+            "name": f"{PREFIX}-{playlist['name']}",
+            "version": playlist["version"],
+            "title": playlist["title"],
+            "subtitle": playlist["subtitle"],
+            "author": playlist["author"],
+            "tags": [Tag(title=tag["title"], icon=tag.get("icon")).as_dict() for tag in playlist["tags"]],
+            "levels": [level_items[f"{PREFIX}-{level_item['name']}"] for level_item in playlist["levels"]],
+        }
+        repository.write_json(
+            f"sonolus/playlists/{item['name']}",
+            {"item": item, "description": "", "actions": [], "hasCommunity": False, "leaderboards": [], "sections": []},
+        )
+        playlist_items.append(item)
+
+    repository.write_json("sonolus/levels/list", {"pageCount": 1, "items": list(level_items.values())})
+    repository.write_json("sonolus/playlists/list", {"pageCount": 1, "items": playlist_items})
+    repository.write_json(
+        "sonolus/info",
+        {
+            "title": title,
+            "buttons": [{"type": "level"}, {"type": "playlist"}],
+            "configuration": {"options": []},
+        },
+    )
+    repository.write_manifest(list(level_items), [item["name"] for item in playlist_items])
+    return exported
+
+
+def _level_item(repository: StaticRepository, level: Level, engine_item: dict) -> dict:
+    # Items are built the same way as by sonolus.build.project.add_level_to_collection, localized as the Sonolus.py
+    # dev server does when serving them.
+    for key in ("use_skin", "use_background", "use_effect", "use_particle"):
+        if getattr(level, key) is not None:
+            raise ValueError(
+                f"Level {level.name!r} sets {key}, but only levels using the engine's defaults can be exported"
+            )
+    data = package_compact_level_data(level.data)
+    item = {
+        "name": level.name,
+        "version": level.version,
+        "rating": level.rating,
+        "title": _localize_text(level.title),
+        "artists": _localize_text(level.artists),
+        "author": _localize_text(level.author),
+        "tags": [{**tag.as_dict(), "title": _localize_text(tag.title)} for tag in level.tags or []],
+        "engine": engine_item,
+        **DEFAULT_USE_RESOURCES,
+        # Sonolus requires a cover and BGM, so levels without them use the same blank defaults as Sonolus.py.
+        "cover": repository.add_resource(BLANK_PNG if level.cover is None else level.cover),
+        "bgm": repository.add_resource(BLANK_AUDIO if level.bgm is None else level.bgm),
+        "data": repository.add_resource(data),
+    }
+    if level.description is not None:
+        item["description"] = _localize_text(level.description)
+    if level.preview is not None:
+        item["preview"] = repository.add_resource(level.preview)
+    return item
+
+
+def _localize_text(text: str | dict[str, str]) -> str:
+    # Static files can't be localized per request, so English is used if available, as by the Sonolus.py dev server.
+    if isinstance(text, str):
+        return text
+    if "en" in text:
+        return text["en"]
+    return text[min(text)] if text else ""
+
+
+def _write_atomic(path: Path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def _copy_atomic(source: Path, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as dst, source.open("rb") as src:
+        shutil.copyfileobj(src, dst)
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m pydori.convert.export", description="Export levels as a static Sonolus server directory."
+    )
+    parser.add_argument("path", type=Path, help="directory to export to")
+    parser.add_argument("--engine-item", type=Path, required=True, help="JSON file with the built engine item")
+    parser.add_argument("--manifest", type=Path, default=None, help="level manifest, defaults to that of pydori")
+    args = parser.parse_args()
+
+    from pydori.convert.manifest import MANIFEST_PATH, export_manifest
+
+    engine_item = json.loads(args.engine_item.read_text(encoding="utf-8"))
+    rebuilt = export_manifest(args.path, engine_item, args.manifest or MANIFEST_PATH)
+    print(f"Exported {len(rebuilt)} changed levels.")
+    for name in rebuilt:
+        print(f"  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import argparse
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache, partial
+from importlib.metadata import version
+from os import PathLike
+from pathlib import Path
+from typing import Any
+
+from sonolus.script.level import Level
+from sonolus.script.metadata import Tag
+
+from pydori.convert.bestdori import (
+    ANCHOR_TOLERANCE,
+    BESTDORI_BASE_URL,
+    CONVERTER_VERSION,
+    convert_sonolus_bandori_level_chart,
+    convert_sonolus_bandori_level_source,
+)
+from pydori.convert.chart import LEVEL_ARCHETYPES, Chart, build_level_data
+from pydori.convert.collection import open_collection
+from pydori.convert.export import LEVEL_RESOURCE_KEYS, MANIFEST_NAME, export_repository
+from pydori.convert.utils import (
+    MAX_FETCH_WORKERS,
+    PREFIX,
+    LazyLevel,
+    LevelSource,
+    ServerSource,
+    convert_sonolus_level_item,
+    gather_conversions,
+    lazy_sonolus_level,
+)
+
+# Default manifest listing the levels of the engine.
+MANIFEST_PATH = Path(__file__).parent.parent / "levels.json"
+
+# Manifest listing generated worst-case levels for profiling the engine.
+STRESS_MANIFEST_PATH = Path(__file__).parent.parent / "stress_levels.json"
+
+# Attributes of a level which are loaded with its metadata.
+LEVEL_METADATA_KEYS = ("rating", "title", "artists", "author", "description", "tags")
+
+# Tag added to converted Bandori levels unless an entry specifies its own.
+DEFAULT_TAG = "Bandori"
+
+
+class ManifestEntry(ABC):
+    """An entry of a level manifest, describing where a level comes from and how it's converted.
+
+    Each entry has a fingerprint, which changes whenever its source, its options or the code converting it changes,
+    and stays the same otherwise, so unchanged levels don't need to be converted again.
+    """
+
+    def __init__(self, entry: dict, base_dir: Path):
+        """Create a manifest entry.
+
+        Args:
+            entry: Raw entry from the manifest.
+            base_dir: Directory relative paths in the entry are resolved against.
+        """
+        self.entry = entry
+        self.base_dir = base_dir
+        self.options = entry.get("options", {})
+
+    @property
+    @abstractmethod
+    def level_name(self) -> str:
+        """Name of the level, which is known without loading it."""
+
+    def fingerprint(self) -> str:
+        """Return the fingerprint of the entry."""
+        content = json.dumps(
+            {"entry": self.entry, "code": code_fingerprint(), "source": self.source_fingerprint()}, sort_keys=True
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @abstractmethod
+    def source_fingerprint(self) -> Any:
+        """Return JSON-serializable data identifying the source of the level and the version of its converter."""
+
+    def load_chart(self) -> Chart | None:
+        """Convert the level data to a chart, or return None if the level isn't converted from a chart.
+
+        When loading levels in parallel, this is the part run by worker processes, since charts are plain data.
+        """
+        return None
+
+    @abstractmethod
+    def load(self, chart: Chart | None = None) -> Level:
+        """Load and convert the level.
+
+        Args:
+            chart: Chart returned by load_chart, which is used as the level data rather than converting it again.
+        """
+
+    def lazy(self) -> Level:
+        """Return the level, only loading and converting it once it's first used."""
+        load = cache(self.load)
+        return LazyLevel(
+            name=self.level_name,
+            load_metadata=lambda: {key: getattr(load(), key) for key in LEVEL_METADATA_KEYS},
+            load_resources=lambda: {key: getattr(load(), key) for key in LEVEL_RESOURCE_KEYS},
+        )
+
+    def _path(self, key: str) -> Path | None:
+        return self.base_dir / self.entry[key] if self.entry.get(key) else None
+
+
+class _SonolusItemEntry(ManifestEntry):
+    @property
+    def level_name(self) -> str:
+        return f"{PREFIX}-{self.entry['name']}"
+
+    @abstractmethod
+    def source(self) -> LevelSource:
+        """Return the source the level item is read from."""
+
+    def source_fingerprint(self) -> Any:
+        # The item holds the hashes of the level's resources, so it changes whenever any of them does.
+        return {"converter": CONVERTER_VERSION, "item": self.source().get_level_item(self.entry["name"])}
+
+    def load_chart(self) -> Chart:
+        source = self.source()
+        return convert_sonolus_bandori_level_chart(
+            source.get_buffer(source.get_level_item(self.entry["name"])["data"]),
+            self.options.get("anchor_tolerance", ANCHOR_TOLERANCE),
+        )
+
+    def load(self, chart: Chart | None = None) -> Level:
+        source = self.source()
+        converter = self._converter() if chart is None else lambda _: build_level_data(chart)
+        return convert_sonolus_level_item(
+            source.get_level_item(self.entry["name"]), source, self.entry.get("tag", DEFAULT_TAG), converter
+        )
+
+    def lazy(self) -> Level:
+        return lazy_sonolus_level(
+            self.entry["name"], self.source(), self.entry.get("tag", DEFAULT_TAG), self._converter()
+        )
+
+    def _converter(self):
+        return partial(
+            convert_sonolus_bandori_level_source,
+            anchor_tolerance=self.options.get("anchor_tolerance", ANCHOR_TOLERANCE),
+        )
+
+
+class ServerEntry(_SonolusItemEntry):
+    """A Bandori level downloaded from a Sonolus server.
+
+    Keys:
+        name: Name of the level on the server.
+        url: Base URL of the server. Defaults to Bestdori.
+        tag: Tag to add to the level.
+        options: Converter options, currently only anchor_tolerance.
+    """
+
+    def source(self) -> LevelSource:
+        return ServerSource(self.entry.get("url", BESTDORI_BASE_URL))
+
+
+class CollectionEntry(_SonolusItemEntry):
+    """A Bandori level imported from a local Sonolus collection archive.
+
+    Keys:
+        name: Name of the level in the collection.
+        path: Path of the collection archive.
+        tag: Tag to add to the level.
+        options: Converter options, currently only anchor_tolerance.
+    """
+
+    def source(self) -> LevelSource:
+        return open_collection(self._path("path"))
+
+
+class FileEntry(ManifestEntry):
+    """A Bandori level converted from a local level data file, with its metadata given by the entry.
+
+    Keys:
+        name: Name of the level, without the pydori prefix.
+        data: Path of the Sonolus Bandori level data JSON, which may be gzip-compressed.
+        cover, bgm, preview: Paths of the level's assets.
+        title, artists, author, rating, description: Metadata of the level.
+        tag: Tag to add to the level.
+        options: Converter options, currently only anchor_tolerance.
+    """
+
+    @property
+    def level_name(self) -> str:
+        return f"{PREFIX}-{self.entry['name']}"
+
+    def source_fingerprint(self) -> Any:
+        files = {}
+        for key in ("data", "cover", "bgm", "preview"):
+            path = self._path(key)
+            if path is not None:
+                with path.open("rb") as f:
+                    files[key] = hashlib.file_digest(f, "sha256").hexdigest()
+        return {"converter": CONVERTER_VERSION, "files": files}
+
+    def load_chart(self) -> Chart:
+        return convert_sonolus_bandori_level_chart(self._data(), self.options.get("anchor_tolerance", ANCHOR_TOLERANCE))
+
+    def load(self, chart: Chart | None = None) -> Level:
+        return Level(name=self.level_name, **self._metadata(), **self._resources(chart))
+
+    def lazy(self) -> Level:
+        # The metadata is given by the entry, so only the resources need to be loaded lazily.
+        return LazyLevel(name=self.level_name, load_metadata=self._metadata, load_resources=self._resources)
+
+    def _metadata(self) -> dict:
+        tag = self.entry.get("tag", DEFAULT_TAG)
+        return {
+            "rating": self.entry.get("rating", 0),
+            "title": self.entry.get("title", self.entry["name"]),
+            "artists": self.entry.get("artists", ""),
+            "author": self.entry.get("author", ""),
+            "description": self.entry.get("description"),
+            "tags": [Tag(title=tag)] if tag else [],
+        }
+
+    def _resources(self, chart: Chart | None = None) -> dict:
+        return {
+            "cover": self._path("cover"),
+            "bgm": self._path("bgm"),
+            "preview": self._path("preview"),
+            "data": build_level_data(chart if chart is not None else self.load_chart()),
+        }
+
+    def _data(self) -> bytes:
+        data = self._path("data").read_bytes()
+        if not data.startswith(b"\x1f\x8b"):
+            data = gzip.compress(data)
+        return data
+
+
+class GeneratorEntry(ManifestEntry):
+    """A level created by a Python function.
+
+    Keys:
+        name: Name of the level, used as is.
+        generator: Function creating the level, as "module:function".
+        options: Keyword arguments passed to the function.
+    """
+
+    @property
+    def level_name(self) -> str:
+        return self.entry["name"]
+
+    def source_fingerprint(self) -> Any:
+        # The generator can't be inspected for changes in behavior, so any change to its module counts as one.
+        module_name, _ = self.entry["generator"].split(":")
+        origin = importlib.util.find_spec(module_name).origin
+        with open(origin, "rb") as f:
+            return {"module": hashlib.file_digest(f, "sha256").hexdigest()}
+
+    def load(self, chart: Chart | None = None) -> Level:
+        module_name, function_name = self.entry["generator"].split(":")
+        level = getattr(importlib.import_module(module_name), function_name)(**self.options)
+        level.name = self.level_name
+        return level
+
+
+@cache
+def code_fingerprint() -> str:
+    """Return a hash of the code converting and emitting levels, which is part of the fingerprint of every entry.
+
+    This covers the source of the converter modules and of the modules defining the archetypes levels are built with,
+    the fields of those archetypes, and the version of Sonolus.py, which turns archetype instances into level data.
+    """
+    package_dir = Path(__file__).parent.parent
+    paths = set(Path(__file__).parent.glob("*.py"))
+    for archetype in LEVEL_ARCHETYPES:
+        paths.update(Path(inspect.getfile(cls)) for cls in archetype.__mro__ if cls.__module__.startswith("pydori."))
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.relative_to(package_dir).as_posix().encode("utf-8"))
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    layout = {"archetypes": [archetype.schema() for archetype in LEVEL_ARCHETYPES], "sonolus": version("sonolus.py")}
+    digest.update(json.dumps(layout, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Entry class for each type of manifest entry.
+ENTRY_TYPES: dict[str, type[ManifestEntry]] = {
+    "server": ServerEntry,
+    "collection": CollectionEntry,
+    "file": FileEntry,
+    "generator": GeneratorEntry,
+}
+
+
+def read_manifest(path: PathLike = MANIFEST_PATH) -> list[ManifestEntry]:
+    """Read the entries of a level manifest.
+
+    Raises:
+        ValueError: If an entry has an unknown type, or two entries have the same level name.
+    """
+    path = Path(path)
+    entries = []
+    for raw_entry in json.loads(path.read_text(encoding="utf-8"))["levels"]:
+        if raw_entry.get("type") not in ENTRY_TYPES:
+            raise ValueError(f"Unknown level manifest entry type {raw_entry.get('type')!r} in {path}")
+        entries.append(ENTRY_TYPES[raw_entry["type"]](raw_entry, path.parent))
+    names = [entry.level_name for entry in entries]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate levels {', '.join(duplicates)} in {path}")
+    return entries
+
+
+def load_manifest_levels(
+    path: PathLike = MANIFEST_PATH,
+    parallel: bool = False,
+    max_workers: int | None = None,
+    names: Collection[str] | None = None,
+) -> list[Level]:
+    """Load the levels of a level manifest.
+
+    Args:
+        path: Path of the manifest.
+        parallel: Whether to convert all levels up front in parallel using a process pool, rather than lazily.
+        max_workers: Maximum number of worker processes. Defaults to the number of CPUs.
+        names: Names of the levels to load. Defaults to all levels of the manifest.
+    """
+    entries = read_manifest(path)
+    if names is not None:
+        entries = [entry for entry in entries if entry.level_name in names]
+    if not parallel:
+        return [entry.lazy() for entry in entries]
+    # Workers only convert level data to charts, which are plain data. Levels hold archetype instances, so they're
+    # built here rather than being sent back from the workers.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(entry.load_chart) for entry in entries]
+        charts = gather_conversions(futures, [entry.level_name for entry in entries])
+    return [entry.load(chart) for entry, chart in zip(entries, charts, strict=True)]
+
+
+def fingerprint_entries(entries: Sequence[ManifestEntry]) -> dict[str, str]:
+    """Return the fingerprint of each entry by level name.
+
+    Fingerprints may need level items to be fetched, so they're computed concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        return dict(zip((entry.level_name for entry in entries), executor.map(ManifestEntry.fingerprint, entries)))
+
+
+def export_manifest(out: PathLike, engine_item: dict, path: PathLike = MANIFEST_PATH) -> list[str]:
+    """Export the levels of a level manifest as a static Sonolus server directory, rebuilding only changed levels.
+
+    Levels whose fingerprint matches the one they were last exported to the directory with are reused without being
+    converted.
+
+    Args:
+        out: Directory to export to.
+        engine_item: Sonolus engine item the levels use.
+        path: Path of the manifest.
+
+    Returns:
+        Names of the levels which were rebuilt.
+    """
+    entries = read_manifest(path)
+    return export_repository(
+        out, [entry.lazy() for entry in entries], engine_item, fingerprints=fingerprint_entries(entries)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m pydori.convert.manifest", description="List levels which changed since they were last exported."
+    )
+    parser.add_argument("out", type=Path, help="directory exported to")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST_PATH, help="level manifest")
+    args = parser.parse_args()
+
+    try:
+        previous = json.loads((args.out / MANIFEST_NAME).read_bytes()).get("fingerprints", {})
+    except (OSError, ValueError):
+        previous = {}
+    for name, fingerprint in fingerprint_entries(read_manifest(args.manifest)).items():
+        changed = previous.get(f"sonolus/levels/{name}") != fingerprint
+        print(f"{'changed' if changed else 'unchanged':>9}  {name}")
+
+
+if __name__ == "__main__":
+    main()
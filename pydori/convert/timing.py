@@ -0,0 +1,60 @@
+from bisect import bisect_right
+from collections.abc import Iterable
+
+# BPM used if a level has no BPM changes.
+DEFAULT_BPM = 60
+
+
+class TimingIndex:
+    """Resolves beats to times and times to scaled times using cumulative tables of BPM and timescale changes.
+
+    This follows the same rules as beat_to_time and time_to_scaled_time at runtime, but each lookup is a binary search
+    over the changes rather than a scan, so resolving the timing of every note in a level is O(notes × log changes).
+    """
+
+    def __init__(
+        self,
+        bpm_changes: Iterable[tuple[float, float]],
+        timescale_changes: Iterable[tuple[float, float]] = (),
+    ):
+        """Create a timing index.
+
+        Args:
+            bpm_changes: Pairs of (beat, bpm).
+            timescale_changes: Pairs of (beat, timescale).
+        """
+        bpm_changes = sorted(bpm_changes, key=lambda change: change[0]) or [(0, DEFAULT_BPM)]
+        self._bpm_beats = [beat for beat, _ in bpm_changes]
+        self._seconds_per_beat = [60 / bpm for _, bpm in bpm_changes]
+        # Time at the start of each BPM change. The first BPM applies from beat 0 even if it changes later.
+        self._bpm_times = [self._bpm_beats[0] * self._seconds_per_beat[0]]
+        for i in range(1, len(bpm_changes)):
+            self._bpm_times.append(
+                self._bpm_times[-1] + (self._bpm_beats[i] - self._bpm_beats[i - 1]) * self._seconds_per_beat[i - 1]
+            )
+
+        timescale_changes = sorted(timescale_changes, key=lambda change: change[0])
+        self._timescale_times = [self.beat_to_time(beat) for beat, _ in timescale_changes]
+        self._timescales = [timescale for _, timescale in timescale_changes]
+        # Scaled time at the start of each timescale change. The timescale is 1 before the first change.
+        self._scaled_times = []
+        scaled_time = 0.0
+        previous_time = 0.0
+        previous_timescale = 1.0
+        for time, timescale in zip(self._timescale_times, self._timescales, strict=True):
+            scaled_time += (time - previous_time) * previous_timescale
+            self._scaled_times.append(scaled_time)
+            previous_time = time
+            previous_timescale = timescale
+
+    def beat_to_time(self, beat: float) -> float:
+        """Return the time in seconds of a beat."""
+        i = max(bisect_right(self._bpm_beats, beat) - 1, 0)
+        return self._bpm_times[i] + (beat - self._bpm_beats[i]) * self._seconds_per_beat[i]
+
+    def time_to_scaled_time(self, time: float) -> float:
+        """Return the scaled time of a time in seconds."""
+        i = bisect_right(self._timescale_times, time) - 1
+        if i < 0:
+            return time
+        return self._scaled_times[i] + (time - self._timescale_times[i]) * self._timescales[i]
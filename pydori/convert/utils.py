@@ -1,53 +1,208 @@
 import gzip
 import hashlib
+import io
 import json
-from collections.abc import Callable
-from functools import lru_cache
+import re
+import threading
+import warnings
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import cache
 from os import PathLike
 from pathlib import Path
-from typing import NamedTuple
+from typing import Any, BinaryIO, NamedTuple, TextIO
 from urllib.parse import urljoin
-from urllib.request import Request, urlopen
 
 from sonolus.script.level import Level, LevelData
 from sonolus.script.metadata import Tag
 
+from pydori.convert.cache import CACHE_DIR, DiskCache, MemoryCache, map_file, ttl_for_url
+from pydori.convert.client import TEXT_HEADERS, download
 
 # Prefix added to item names
 PREFIX = "pydori"
 
-# Directory for caching downloaded content
-CACHE_DIR = Path(__file__).parent.parent.parent / ".cache"
+# Maximum number of concurrent downloads.
+# Downloads are latency bound, so this only needs to be large enough to cover the assets of a level.
+MAX_FETCH_WORKERS = 4
 
+# Maximum number of concurrent downloads when fetching the pages of a list.
+MAX_PAGE_FETCH_WORKERS = 8
 
-@lru_cache
-def get_bytes(url: str) -> bytes:
-    """Fetch bytes from URL with caching.
+# Maximum total size of downloaded content held in memory.
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
-    Downloads content from the given URL and caches it locally to avoid repeated network requests.
-    Uses a hash of the URL as the cache key.
+# Content at least this large is memory-mapped from the disk cache instead of being held in memory.
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+# Number of characters decompressed at a time when streaming JSON.
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
+_memory_cache = MemoryCache(MEMORY_CACHE_MAX_BYTES)
+
+_disk_cache = DiskCache(CACHE_DIR)
+
+# Locks preventing concurrent downloads of the same URL from writing to the same temporary file, by URL.
+# Each lock is dropped once no thread holds or waits for it, so this only holds locks of downloads in progress.
+_download_locks: dict[str, threading.Lock] = {}
+# Number of threads holding or waiting for each lock in _download_locks.
+_download_lock_users: dict[str, int] = {}
+_download_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _download_lock(key: str):
+    """Hold the lock for downloading the content of a URL or key, creating it if needed and dropping it after use."""
+    with _download_locks_lock:
+        lock = _download_locks.setdefault(key, threading.Lock())
+        _download_lock_users[key] = _download_lock_users.get(key, 0) + 1
+    try:
+        with lock:
+            yield
+    finally:
+        with _download_locks_lock:
+            _download_lock_users[key] -= 1
+            if not _download_lock_users[key]:
+                del _download_lock_users[key]
+                del _download_locks[key]
+
+
+def get_cached_path(url: str, text: bool = False) -> Path:
+    """Download content from URL into the disk cache if needed and return the path of the cached file.
+
+    Downloads share a pool of keep-alive connections and are written atomically, so an interrupted download is
+    never mistaken for a cached file. Cached files are content-addressed, so URLs with identical content share a
+    file. The least recently used entries are evicted once the cache exceeds its size limit.
+
+    Cached content of mutable endpoints expires according to the TTL policy in CACHE_TTLS, after which it is
+    revalidated with a conditional request and only downloaded again if the server reports that it changed.
+
+    Text content may be compressed in transit if text is set, but is always cached decompressed.
     """
-    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
-    if (CACHE_DIR / url_hash).exists():
-        return (CACHE_DIR / url_hash).read_bytes()
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "*/*",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive",
-    }
-    request = Request(url, headers=headers)
-    with urlopen(request) as response:
-        data = response.read()
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    (CACHE_DIR / url_hash).write_bytes(data)
+    ttl = ttl_for_url(url)
+    entry = _disk_cache.lookup(url)
+    if entry is not None and entry.is_fresh(ttl):
+        return entry.path
+    with _download_lock(url):
+        # Another thread may have cached the content while this one waited for the lock.
+        entry = _disk_cache.lookup(url)
+        if entry is not None and entry.is_fresh(ttl):
+            return entry.path
+        legacy_path = _disk_cache.legacy_path_for(url)
+        if entry is None and legacy_path.exists():
+            # Adopt a file cached before the index existed.
+            entry_path = _disk_cache.add(url, legacy_path)
+            if ttl is None:
+                return entry_path
+        download_path = _disk_cache.download_path_for(url)
+        download_path.parent.mkdir(parents=True, exist_ok=True)
+        headers = dict(TEXT_HEADERS) if text else {}
+        if entry is not None:
+            result = download(url, download_path, {**headers, **entry.validator_headers()}, resume=False)
+        else:
+            result = download(url, download_path, headers)
+        if result.status == 304:
+            _disk_cache.mark_validated(url)
+            return entry.path
+        return _disk_cache.add(url, download_path, result.headers.get("ETag"), result.headers.get("Last-Modified"))
+
+
+def get_cached_content_path(key: str, write_content: Callable[[BinaryIO], None]) -> Path:
+    """Copy content that isn't downloaded into the disk cache if needed and return the path of the cached file.
+
+    The key identifies the content in place of a URL and should change whenever the content may have changed. The
+    cached file is pinned, so it's not evicted while this process runs.
+
+    Args:
+        key: Key identifying the content.
+        write_content: Function writing the content to a binary file, ideally without holding it in memory in full.
+    """
+    path = find_cached_content_path(key)
+    if path is None:
+        with _download_lock(key):
+            # Another thread may have cached the content while this one waited for the lock.
+            path = find_cached_content_path(key) or _write_cached_content(key, write_content)
+    _disk_cache.pin(path)
+    return path
+
+
+def find_cached_content_path(key: str) -> Path | None:
+    """Return the path of the file cached under a key by get_cached_content_path, or None if there isn't one."""
+    entry = _disk_cache.lookup(key)
+    return entry.path if entry is not None else None
+
+
+def store_cached_content(key: str, write_content: Callable[[BinaryIO], None]) -> Path:
+    """Copy content into the disk cache under a key, replacing any content cached under it, and return its path.
+
+    Unlike get_cached_content_path, the file isn't pinned, so it's evicted like any other cached file once the cache
+    exceeds its size limit. This suits content that is read in full as soon as it's loaded.
+    """
+    with _download_lock(key):
+        return _write_cached_content(key, write_content)
+
+
+def _write_cached_content(key: str, write_content: Callable[[BinaryIO], None]) -> Path:
+    path = _disk_cache.download_path_for(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as dst:
+        write_content(dst)
+    return _disk_cache.add(key, path)
+
+
+def discard_cached_content(key: str):
+    """Remove the content cached under a key, such as content found to be invalid."""
+    _disk_cache.discard(key)
+
+
+def get_buffer(url: str, text: bool = False) -> bytes | memoryview:
+    """Fetch content from URL with caching.
+
+    Small content is kept in a size-bounded in-memory LRU cache keyed by content, so identical content from
+    different URLs shares a single buffer. Content of at least MMAP_THRESHOLD_BYTES is returned as a memory-mapped
+    view of the disk cache file so it doesn't count against resident memory.
+
+    Set text for text content such as JSON, which is then requested with compression.
+    """
+    path = get_cached_path(url, text)
+    if path.stat().st_size >= MMAP_THRESHOLD_BYTES:
+        return map_file(path)
+    return _read_into_memory_cache(path)
+
+
+def get_bytes(url: str, text: bool = False) -> bytes:
+    """Fetch bytes from URL with caching, requesting compression if text is set."""
+    data = get_buffer(url, text)
+    return data if isinstance(data, bytes) else data.tobytes()
+
+
+def get_asset(url: str) -> bytes | Path:
+    """Fetch an asset from URL with caching, returning large assets as the path of their disk cache file.
+
+    Returning a path lets large assets such as BGM be read from disk when needed rather than being held in memory
+    for the lifetime of the level. The file is pinned, so it's not evicted while this process runs.
+    """
+    path = get_cached_path(url)
+    if path.stat().st_size >= MMAP_THRESHOLD_BYTES:
+        _disk_cache.pin(path)
+        return path
+    return _read_into_memory_cache(path)
+
+
+def _read_into_memory_cache(path: Path) -> bytes:
+    # Cached files are named by their content hash, so the name identifies the content.
+    data = _memory_cache.get(path.name)
+    if data is None:
+        data = path.read_bytes()
+        _memory_cache.put(path.name, data)
     return data
 
 
 def get_str(url: str) -> str:
     """Fetch URL content as a UTF-8 string."""
-    return get_bytes(url).decode("utf-8")
+    return get_bytes(url, text=True).decode("utf-8")
 
 
 def get_json(url: str) -> dict | list:
@@ -57,10 +212,126 @@ def get_json(url: str) -> dict | list:
 
 def get_json_gzip(url: str) -> dict | list:
     """Fetch and parse gzip-compressed JSON from URL."""
-    data = get_bytes(url)
+    return parse_json_gzip(get_buffer(url))
+
+
+def parse_json_gzip(data: bytes | memoryview) -> dict | list:
+    """Parse gzip-compressed JSON."""
     return json.loads(gzip.decompress(data).decode("utf-8"))
 
 
+def hash_gzip_content(data: bytes | memoryview) -> str:
+    """Return the SHA-256 hex digest of the decompressed content of gzip-compressed data.
+
+    The data is decompressed in chunks, so the decompressed content is never held in memory in full. Unlike a hash of
+    the compressed data, this doesn't depend on how the content was compressed.
+    """
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def parse_json_gzip_streaming(data: bytes | memoryview, item_handlers: dict[str, Callable[[Any], None]]) -> dict:
+    """Parse a gzip-compressed JSON object incrementally, streaming the items of selected arrays to handlers.
+
+    Items of arrays that are values of a key in item_handlers are passed to the handler one at a time as they are
+    parsed rather than being collected, so neither the decompressed text nor the full array is ever held in memory.
+
+    Args:
+        data: Gzip-compressed JSON object.
+        item_handlers: Handler called with each item of the array under the corresponding top-level key.
+
+    Returns:
+        The other members of the object.
+    """
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as raw, io.TextIOWrapper(raw, encoding="utf-8") as text:
+        stream = _JsonStream(text)
+        result = {}
+        stream.expect("{")
+        if stream.skip("}"):
+            return result
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            handler = item_handlers.get(key)
+            if handler is not None and stream.skip("["):
+                if not stream.skip("]"):
+                    handler(stream.value())
+                    while stream.skip(","):
+                        handler(stream.value())
+                    stream.expect("]")
+            else:
+                result[key] = stream.value()
+            if not stream.skip(","):
+                break
+        stream.expect("}")
+        stream.expect_end()
+        return result
+
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_NUMBER_CHARS = re.compile(r"[0-9eE.+-]*")
+
+
+class _JsonStream:
+    """A buffered reader of JSON values from a text stream."""
+
+    def __init__(self, text: TextIO):
+        self._text = text
+        self._buffer = ""
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        # Reading at least as much as is buffered keeps parsing linear even for values much larger than a chunk.
+        chunk = self._text.read(max(JSON_STREAM_CHUNK_SIZE, len(self._buffer) - self._pos))
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = _JSON_WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def skip(self, char: str) -> bool:
+        """Consume the given character if it is next, ignoring whitespace, and return whether it was."""
+        if self._peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, char: str):
+        """Consume the given character, which must be next ignoring whitespace."""
+        if not self.skip(char):
+            raise ValueError(f"Expected {char!r} in JSON at position {self._pos}")
+
+    def expect_end(self):
+        """Check that nothing but whitespace remains."""
+        if self._peek():
+            raise ValueError(f"Extra data in JSON at position {self._pos}")
+
+    def value(self) -> Any:
+        """Parse and return the next JSON value."""
+        self._peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if _JSON_NUMBER_CHARS.match(self._buffer, end).end() == len(self._buffer) and self._fill():
+                # A number at the end of the buffer may continue in the next chunk.
+                continue
+            self._pos = end
+            return value
+
+
 def make_relative(path: str) -> str:
     """Convert absolute path to relative by removing leading slash."""
     if path and path[0] == "/":
@@ -98,29 +369,29 @@ def get_sonolus_level_item(name: str, base_url: str) -> dict:
 
 def get_level_items(base_url: str) -> list[dict]:
     """Fetch all level items from a Sonolus server."""
-    levels_url = urljoin(base_url, "sonolus/levels/list?localization=en")
-    page = 0
-    results = []
-    while True:
-        data = _ensure_dict(get_json(levels_url + f"&page={page}"))
-        results.extend(data["items"])
-        page += 1
-        if page >= data["pageCount"]:
-            break
-    return results
+    return get_list_items(urljoin(base_url, "sonolus/levels/list?localization=en"))
 
 
 def get_playlist_items(base_url: str) -> list[dict]:
     """Fetch all playlist items from a Sonolus server."""
-    playlist_url = urljoin(base_url, "sonolus/playlists/list?localization=en")
-    page = 0
-    results = []
-    while True:
-        data = _ensure_dict(get_json(playlist_url + f"&page={page}"))
-        results.extend(data["items"])
-        page += 1
-        if page >= data["pageCount"]:
-            break
+    return get_list_items(urljoin(base_url, "sonolus/playlists/list?localization=en"))
+
+
+def get_list_items(list_url: str) -> list[dict]:
+    """Fetch the items of all pages of a Sonolus list endpoint.
+
+    The page count is only known once the first page has been fetched, after which the remaining pages are fetched
+    concurrently. Items are returned in page order.
+    """
+    first_page = _ensure_dict(get_json(list_url + "&page=0"))
+    with ThreadPoolExecutor(max_workers=MAX_PAGE_FETCH_WORKERS) as executor:
+        pages = executor.map(
+            lambda page: _ensure_dict(get_json(list_url + f"&page={page}")),
+            range(1, first_page["pageCount"]),
+        )
+        results = [*first_page["items"]]
+        for page in pages:
+            results.extend(page["items"])
     return results
 
 
@@ -148,37 +419,223 @@ def write_playlist_items(path: PathLike, tag: str | None, items: list[dict]):
         (pl_path / "item.json").write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
 
 
+def gather_conversions(futures: Sequence[Future], names: Sequence[str]) -> list:
+    """Wait for the futures converting each named level and return their results in order.
+
+    Every future is waited for even if some fail, and an ExceptionGroup is then raised with one exception per failed
+    level, noting its name.
+    """
+    results = []
+    errors = []
+    for name, future in zip(names, futures, strict=True):
+        error = future.exception()
+        if error is None:
+            results.append(future.result())
+        else:
+            error.add_note(f"While converting level {name!r}")
+            errors.append(error)
+    if errors:
+        raise ExceptionGroup(f"Failed to convert {len(errors)} of {len(names)} levels", errors)
+    return results
+
+
+class LevelSource(ABC):
+    """A source of Sonolus level items and the resources they reference."""
+
+    @abstractmethod
+    def get_level_item(self, name: str) -> dict:
+        """Return the level item with the given name."""
+
+    @abstractmethod
+    def get_asset(self, srl: dict) -> bytes | Path:
+        """Return the content of an asset, or the path of a file holding it for large assets.
+
+        Sonolus only accepts assets as bytes or as the path of a file, so large assets are returned as a path.
+        """
+
+    @abstractmethod
+    def get_buffer(self, srl: dict) -> bytes | memoryview:
+        """Return the content of a resource, such as level data, as a buffer."""
+
+
+class ServerSource(LevelSource):
+    """A source of levels downloaded from a Sonolus server, with caching."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def get_level_item(self, name: str) -> dict:
+        return get_sonolus_level_item(name, self.base_url)
+
+    def get_asset(self, srl: dict) -> bytes | Path:
+        return get_asset(urljoin(self.base_url, srl["url"].replace(" ", "%20")))
+
+    def get_buffer(self, srl: dict) -> bytes | memoryview:
+        return get_buffer(urljoin(self.base_url, make_relative(srl["url"].replace(" ", "%20"))))
+
+
 def convert_sonolus_level_item(
-    item: dict, base_url: str, tag: str | None, data_converter: Callable[[dict], LevelData]
+    item: dict,
+    source: LevelSource | str,
+    tag: str | None,
+    data_converter: Callable[[bytes | memoryview], LevelData] | Callable[[dict], LevelData],
 ) -> Level:
-    """Download and convert a Sonolus item to a LevelData object.
+    """Fetch the resources of a Sonolus item and convert it to a Level.
+
+    Level data is passed to the converter as it's stored, gzip-compressed, so converters can decompress it
+    incrementally or skip parsing it when their output is cached.
 
     Args:
-        item: Raw level item from Sonolus server.
-        base_url: URL of the Sonolus server for downloading assets.
+        item: Raw level item from a Sonolus server or collection.
+        source: Source to fetch the resources of the item from. Passing the base URL of a Sonolus server instead is
+            deprecated, and makes the converter receive the parsed level data as before.
         tag: Optional tag to add to the level.
-        data_converter: Function to convert level data.
+        data_converter: Function to convert level data, given the gzip-compressed level data JSON.
 
     Returns:
-        Converted level data.
+        Converted level.
     """
-    tags = [Tag(title=tag["title"], icon=tag.get("icon")) for tag in item["tags"]]
-    if tag:
-        tags.append(Tag(title=tag))
+    if isinstance(source, str):
+        warnings.warn(
+            "Passing a base URL to convert_sonolus_level_item is deprecated, pass a ServerSource and a data converter "
+            "taking gzip-compressed level data instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        source = ServerSource(source)
+        data_converter = _parsed_data_converter(data_converter)
     return Level(
         name=f"{PREFIX}-{item['name']}",
-        rating=item["rating"],
-        title=item["title"],
-        artists=item["artists"],
-        author=item["author"],
-        description=item.get("description"),
-        tags=tags,
-        cover=get_bytes(urljoin(base_url, item["cover"]["url"].replace(" ", "%20"))),
-        bgm=get_bytes(urljoin(base_url, item["bgm"]["url"].replace(" ", "%20"))),
-        preview=get_bytes(urljoin(base_url, item["preview"]["url"].replace(" ", "%20")))
-        if item.get("preview")
-        else None,
-        data=data_converter(
-            _ensure_dict(get_json_gzip(urljoin(base_url, make_relative(item["data"]["url"].replace(" ", "%20")))))
-        ),
+        **_level_item_metadata(item, tag),
+        **_fetch_level_item_resources(item, source, data_converter),
+    )
+
+
+def _parsed_data_converter(data_converter: Callable[[dict], LevelData]) -> Callable[[bytes | memoryview], LevelData]:
+    # Adapts a data converter taking parsed level data, as accepted before converters were given the stored data.
+    return lambda data: data_converter(_ensure_dict(parse_json_gzip(data)))
+
+
+def lazy_sonolus_level(
+    name: str, source: LevelSource, tag: str | None, data_converter: Callable[[bytes | memoryview], LevelData]
+) -> "LazyLevel":
+    """Create a level from a Sonolus level item which is only fetched and converted once it's first used.
+
+    Args:
+        name: Name of the level item.
+        source: Source to fetch the level item and its resources from.
+        tag: Optional tag to add to the level.
+        data_converter: Function to convert level data, given the gzip-compressed level data JSON.
+    """
+    item = cache(lambda: source.get_level_item(name))
+    return LazyLevel(
+        name=f"{PREFIX}-{name}",
+        load_metadata=lambda: _level_item_metadata(item(), tag),
+        load_resources=lambda: _fetch_level_item_resources(item(), source, data_converter),
     )
+
+
+def _level_item_metadata(item: dict, tag: str | None) -> dict:
+    tags = [Tag(title=tag["title"], icon=tag.get("icon")) for tag in item["tags"]]
+    if tag:
+        tags.append(Tag(title=tag))
+    return {
+        "rating": item["rating"],
+        "title": item["title"],
+        "artists": item["artists"],
+        "author": item["author"],
+        "description": item.get("description"),
+        "tags": tags,
+    }
+
+
+def _fetch_level_item_resources(
+    item: dict, source: LevelSource, data_converter: Callable[[bytes | memoryview], LevelData]
+) -> dict:
+    # The resources of a level are independent, so we fetch them together.
+    # When downloading, this pays for one round trip rather than four.
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        cover = executor.submit(source.get_asset, item["cover"])
+        bgm = executor.submit(source.get_asset, item["bgm"])
+        preview = executor.submit(source.get_asset, item["preview"]) if item.get("preview") else None
+        data = executor.submit(source.get_buffer, item["data"])
+    return {
+        "cover": cover.result(),
+        "bgm": bgm.result(),
+        "preview": preview.result() if preview else None,
+        "data": data_converter(data.result()),
+    }
+
+
+class _LazyAttribute:
+    """An attribute of a lazy level which is loaded along with the other attributes of its group when first accessed.
+
+    Assigning the attribute overrides the loaded value, like for any other level.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+
+    def __get__(self, instance: "LazyLevel | None", owner: type | None = None) -> Any:
+        if instance is None:
+            return self
+        if self.name in instance.__dict__:
+            return instance.__dict__[self.name]
+        return instance._load(self.group)[self.name]
+
+    def __set__(self, instance: "LazyLevel", value: Any):
+        instance.__dict__[self.name] = value
+
+
+class LazyLevel(Level):
+    """A level which is only loaded once its attributes are first accessed.
+
+    Metadata and resources are loaded separately, so listing levels only loads their metadata, while level data and
+    assets are converted when the level itself is first requested. Each is loaded at most once, even when accessed
+    from multiple threads, and kept for later accesses. Loaded values are normalized as Level normalizes them, e.g.
+    titles are localized.
+    """
+
+    rating = _LazyAttribute("metadata")
+    title = _LazyAttribute("metadata")
+    artists = _LazyAttribute("metadata")
+    author = _LazyAttribute("metadata")
+    description = _LazyAttribute("metadata")
+    tags = _LazyAttribute("metadata")
+    cover = _LazyAttribute("resources")
+    bgm = _LazyAttribute("resources")
+    preview = _LazyAttribute("resources")
+    data = _LazyAttribute("resources")
+
+    def __init__(self, name: str, load_metadata: Callable[[], dict], load_resources: Callable[[], dict]):
+        """Create a lazy level.
+
+        Args:
+            name: Name of the level, which is known without loading anything.
+            load_metadata: Function returning the rating, title, artists, author, description and tags of the level.
+            load_resources: Function returning the cover, bgm, preview and data of the level.
+        """
+        self._loaders = {"metadata": load_metadata, "resources": load_resources}
+        self._locks = {group: threading.Lock() for group in self._loaders}
+        self._loaded = {}
+        super().__init__(name=name, data=None)
+        # The defaults set by Level.__init__ would override the lazy attributes, so they're removed.
+        for attribute, value in vars(LazyLevel).items():
+            if isinstance(value, _LazyAttribute):
+                del self.__dict__[attribute]
+
+    def _load(self, group: str) -> dict:
+        if group not in self._loaded:
+            with self._locks[group]:
+                if group not in self._loaded:
+                    # Loaded values are normalized by Level, and attributes that weren't loaded get its defaults.
+                    level = Level(name=self.name, **{"data": None, **self._loaders[group]()})
+                    self._loaded[group] = {
+                        name: getattr(level, name)
+                        for name, attribute in vars(LazyLevel).items()
+                        if isinstance(attribute, _LazyAttribute) and attribute.group == group
+                    }
+        return self._loaded[group]
@@ -1,22 +1,36 @@
+import os
+import random
+from collections.abc import Collection
 from itertools import pairwise
 
 from sonolus.script.archetype import PlayArchetype
 from sonolus.script.level import Level, LevelData
 
-from pydori.convert.bestdori import convert_sonolus_bandori_level
+from pydori.convert.builder import ChartBuilder
+from pydori.convert.chart import Chart, build_level_data
+from pydori.convert.manifest import MANIFEST_PATH, STRESS_MANIFEST_PATH, load_manifest_levels
+from pydori.convert.timing import TimingIndex
+from pydori.lib.connector import ConnectorEase
+from pydori.lib.layout import END_LANE, LANE_COUNT, START_LANE
+from pydori.lib.note import NoteKind
 from pydori.play.connector import HoldConnector, SimLine
 from pydori.play.event import BpmChange, TimescaleChange
 from pydori.play.note import (
-    Note,
-    TapNote,
     FlickNote,
-    HoldHeadNote,
-    HoldTickNote,
     HoldAnchorNote,
     HoldEndNote,
+    HoldHeadNote,
+    HoldTickNote,
+    Note,
+    TapNote,
 )
 from pydori.play.stage import Stage
 
+# Environment variable selecting the levels loaded by load_levels, as a comma-separated list of level names.
+# The Sonolus.py dev server converts every level of the project when it starts, so selecting only the levels being
+# worked on keeps startup fast.
+LEVELS_ENV_VAR = "PYDORI_LEVELS"
+
 
 def demo_level():
     entities = [
@@ -114,6 +128,7 @@ def demo_level():
             ),
         ),
     ]
+    resolve_timing(entities)
 
     return Level(
         name="pydori_level",
@@ -133,17 +148,34 @@ def hold(
     *notes: Note,
 ) -> list[PlayArchetype]:
     """Update the notes to reference each other and create connectors, then return notes and connectors in a list."""
+    ordered = sorted(notes, key=lambda n: n.beat)
     connectors = []
-    for a, b in pairwise(sorted(notes, key=lambda n: n.beat)):
+    for a, b in pairwise(ordered):
         connectors.append(HoldConnector(first_ref=a.ref(), second_ref=b.ref()))
         b.prev_ref = a.ref()
         a.next_ref = b.ref()
+    for note in ordered:
+        note.head_ref = ordered[0].ref()
+        note.end_ref = ordered[-1].ref()
     return [
         *notes,
         *connectors,
     ]
 
 
+def resolve_timing(entities: list[PlayArchetype | list[PlayArchetype]]):
+    """Set the resolved timing of the notes among the given entities, including those in holds."""
+    flat = [e for entity in entities for e in (entity if isinstance(entity, list) else [entity])]
+    timing = TimingIndex(
+        bpm_changes=[(e.beat, e.bpm) for e in flat if isinstance(e, BpmChange)],
+        timescale_changes=[(e.beat, e.timescale) for e in flat if isinstance(e, TimescaleChange)],
+    )
+    for note in flat:
+        if isinstance(note, Note):
+            note.target_time = timing.beat_to_time(note.beat)
+            note.target_scaled_time = timing.time_to_scaled_time(note.target_time)
+
+
 def create_sim_lines(entities: list[PlayArchetype]) -> list[PlayArchetype]:
     """Create sim lines for the given entities."""
     if not entities:
@@ -160,10 +192,109 @@ def create_sim_lines(entities: list[PlayArchetype]) -> list[PlayArchetype]:
     return sim_lines
 
 
-def load_levels():
-    return [
-        demo_level(),
-        convert_sonolus_bandori_level("bestdori-official-206-special"),
-        convert_sonolus_bandori_level("bestdori-official-295-special"),
-        convert_sonolus_bandori_level("bestdori-official-387-special"),
-    ]
+def stress_chart(
+    chords: int = 500,
+    chord_size: int = 7,
+    holds: int = 7,
+    hold_ticks: int = 1000,
+    flicks: int = 5000,
+    flicks_per_beat: int = 16,
+    anchor_chains: int = 8,
+    chain_anchors: int = 1000,
+    bpm_changes: int = 1000,
+    timescale_changes: int = 1000,
+    seed: int = 0,
+) -> Chart:
+    """Create a chart of worst cases for the engine, to profile and compare its runtime performance.
+
+    The chart has a section for each kind of stress, one after another: chords, simultaneous long holds with many
+    ticks, a dense stream of directional flicks, and holds made of long chains of curved anchors. BPM and timescale
+    changes are spread across the whole chart so they overlap every section. The same arguments always give the same
+    chart.
+
+    Args:
+        chords: Number of chords, two per beat.
+        chord_size: Number of notes in each chord, spread across all lanes.
+        holds: Number of simultaneous holds.
+        hold_ticks: Number of ticks in each hold, eight per beat.
+        flicks: Number of directional flicks.
+        flicks_per_beat: Number of directional flicks per beat.
+        anchor_chains: Number of simultaneous holds made of anchors.
+        chain_anchors: Number of anchors in each of those holds, eight per beat.
+        bpm_changes: Number of BPM changes. There is always at least one, at beat 0, so the chart has a tempo.
+        timescale_changes: Number of timescale changes.
+        seed: Seed for the random lanes, directions, eases, BPMs and timescales.
+    """
+    rng = random.Random(seed)
+    lanes = range(START_LANE, END_LANE + 1)
+    builder = ChartBuilder()
+    beat = 1.0
+
+    for i in range(chords):
+        builder.chord(NoteKind.TAP, beat + i / 2, [lanes[(i + j) % LANE_COUNT] for j in range(chord_size)])
+    beat += chords / 2 + 1
+
+    for _ in range(holds):
+        tick_beats = [beat + j / 8 for j in range(hold_ticks + 2)]
+        builder.hold(tick_beats, [rng.uniform(START_LANE, END_LANE) for _ in tick_beats])
+    beat += (hold_ticks + 1) / 8 + 1
+
+    builder.notes(
+        NoteKind.DIRECTIONAL_FLICK,
+        [beat + i / flicks_per_beat for i in range(flicks)],
+        [lanes[i % LANE_COUNT] for i in range(flicks)],
+        [rng.choice((-3, -2, -1, 1, 2, 3)) for _ in range(flicks)],
+    )
+    beat += flicks / flicks_per_beat + 1
+
+    for _ in range(anchor_chains):
+        count = chain_anchors + 2
+        builder.hold(
+            [beat + j / 8 for j in range(count)],
+            [rng.uniform(START_LANE, END_LANE) for _ in range(count)],
+            [NoteKind.HOLD_HEAD, *[NoteKind.HOLD_ANCHOR] * chain_anchors, NoteKind.HOLD_END],
+            rng.choice(list(ConnectorEase)),
+        )
+    beat += (chain_anchors + 1) / 8 + 1
+
+    for i in range(max(bpm_changes, 1)):
+        builder.bpm_change(beat * i / max(bpm_changes, 1), rng.uniform(60, 240))
+    for i in range(timescale_changes):
+        builder.timescale_change(beat * i / max(timescale_changes, 1), rng.uniform(0.25, 2))
+    return builder.build()
+
+
+def stress_level(**kwargs) -> Level:
+    """Create a level with a stress chart, taking the same arguments as stress_chart."""
+    return Level(
+        name="pydori_stress",
+        title="pydori Stress",
+        bgm=None,
+        data=build_level_data(stress_chart(**kwargs)),
+    )
+
+
+def load_levels(parallel: bool = False, stress: bool = False, names: Collection[str] | None = None):
+    """Load the levels listed in the level manifest.
+
+    By default, levels are lazy, so they're only downloaded and converted once they're first used and loading stays
+    fast regardless of how many there are. The Sonolus.py dev server still uses every level when it starts, so the
+    levels can be limited to those being worked on with the PYDORI_LEVELS environment variable.
+
+    Args:
+        parallel: Whether to instead convert all levels up front in parallel using a process pool.
+        stress: Whether to also load the stress levels listed in the stress level manifest, for profiling.
+        names: Names of the levels to load. Defaults to those listed in LEVELS_ENV_VAR, or all levels if it's unset.
+
+    Raises:
+        ValueError: If a selected level isn't in the manifests.
+    """
+    if names is None and os.environ.get(LEVELS_ENV_VAR):
+        names = {name.strip() for name in os.environ[LEVELS_ENV_VAR].split(",") if name.strip()}
+    levels = load_manifest_levels(MANIFEST_PATH, parallel=parallel, names=names)
+    if stress:
+        levels += load_manifest_levels(STRESS_MANIFEST_PATH, parallel=parallel, names=names)
+    missing = set(names or ()) - {level.name for level in levels}
+    if missing:
+        raise ValueError(f"Unknown levels {', '.join(sorted(missing))}")
+    return levels
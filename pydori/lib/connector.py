@@ -1,5 +1,11 @@
+from enum import IntEnum
+from math import ceil
+
+from sonolus.script.easing import ease_in_quad, ease_out_quad, ease_in_out_quad, ease_out_in_quad
+from sonolus.script.interval import lerp, unlerp
+
 from pydori.lib.layer import get_z, LAYER_CONNECTOR, LAYER_SIM_LINE
-from pydori.lib.layout import layout_hold_connector, layout_sim_line, note_y_to_alpha
+from pydori.lib.layout import Layout, layout_hold_connector, layout_sim_line, note_y_to_alpha
 from pydori.lib.options import Options
 from pydori.lib.skin import Skin
 
@@ -15,6 +21,73 @@ def draw_hold_connector(
     sprite.draw(layout, z=get_z(LAYER_CONNECTOR, lane=min(lane_a, lane_b), y=min(y_a, y_b)), a=Options.connector_alpha)
 
 
+class ConnectorEase(IntEnum):
+    """Easing of the lane of a hold connector from its first note to its second note."""
+
+    LINEAR = 0
+    IN = 1
+    OUT = 2
+    IN_OUT = 3
+    OUT_IN = 4
+
+
+# Number of quads a curved hold connector is drawn with when it spans the full height of the lane.
+CURVED_CONNECTOR_SEGMENTS = 16
+
+
+def ease_connector(ease: ConnectorEase, progress: float) -> float:
+    match ease:
+        case ConnectorEase.IN:
+            return ease_in_quad(progress)
+        case ConnectorEase.OUT:
+            return ease_out_quad(progress)
+        case ConnectorEase.IN_OUT:
+            return ease_in_out_quad(progress)
+        case ConnectorEase.OUT_IN:
+            return ease_out_in_quad(progress)
+        case _:
+            return progress
+
+
+def get_curved_connector_lane(
+    lane_a: float,
+    lane_b: float,
+    y_a: float,
+    y_b: float,
+    ease: ConnectorEase,
+    y: float,
+) -> float:
+    """Return the lane of a curved hold connector at the given y-coordinate."""
+    return lerp(lane_a, lane_b, ease_connector(ease, unlerp(y_a, y_b, y)))
+
+
+def draw_curved_hold_connector(
+    lane_a: float,
+    lane_b: float,
+    y_a: float,
+    y_b: float,
+    ease: ConnectorEase,
+):
+    # Only the visible part of the connector is drawn, with a number of segments proportional to its height.
+    y_min = max(min(y_a, y_b), 0)
+    y_max = min(max(y_a, y_b), Layout.note_y_max)
+    if y_min >= y_max:
+        return
+    segments = ceil(CURVED_CONNECTOR_SEGMENTS * (y_max - y_min) / Layout.note_y_max)
+    sprite = Skin.hold_connector
+    z = get_z(LAYER_CONNECTOR, lane=min(lane_a, lane_b), y=min(y_a, y_b))
+    for i in range(segments):
+        y_start = lerp(y_min, y_max, i / segments)
+        y_end = lerp(y_min, y_max, (i + 1) / segments)
+        layout = layout_hold_connector(
+            get_curved_connector_lane(lane_a, lane_b, y_a, y_b, ease, y_start),
+            get_curved_connector_lane(lane_a, lane_b, y_a, y_b, ease, y_end),
+            y_start,
+            y_end,
+        )
+        sprite.draw(layout, z=z, a=Options.connector_alpha)
+
+
 def draw_sim_line(
     lane_a: float,
     lane_b: float,
@@ -2,7 +2,12 @@ from sonolus.script.archetype import PlayArchetype, EntityRef, imported
 from sonolus.script.interval import remap
 from sonolus.script.runtime import time
 
-from pydori.lib.connector import draw_hold_connector, draw_sim_line
+from pydori.lib.connector import (
+    draw_curved_hold_connector,
+    draw_hold_connector,
+    draw_sim_line,
+    get_curved_connector_lane,
+)
 from pydori.play.note import Note
 
 
@@ -30,11 +35,18 @@ class HoldConnector(PlayArchetype):
             # so it has the information to calculate which lane the hold is currently crossing the judgment line at.
             # The hold lane is stored in the note head so the hold manager can use it draw the hold particle and
             # note head at the correct lane.
-            self.head.hold_lane = remap(self.first.y, self.second.y, self.first.lane, self.second.lane, 0)
+            self.head.hold_lane = self.get_lane(0)
 
     def update_parallel(self):
         if self.despawn:
             return
+        self.draw()
+
+    def get_lane(self, y: float) -> float:
+        """Return the lane of the connector at the given y-coordinate."""
+        return remap(self.first.y, self.second.y, self.first.lane, self.second.lane, y)
+
+    def draw(self):
         draw_hold_connector(
             self.first.lane,
             self.second.lane,
@@ -55,6 +67,26 @@ class HoldConnector(PlayArchetype):
         return self.first.head
 
 
+class CurvedHoldConnector(HoldConnector):
+    """A connector for hold notes whose lane is eased between its notes, replacing a chain of hold anchors."""
+
+    name = "CurvedHoldConnector"
+
+    ease: int = imported()
+
+    def get_lane(self, y: float) -> float:
+        return get_curved_connector_lane(self.first.lane, self.second.lane, self.first.y, self.second.y, self.ease, y)
+
+    def draw(self):
+        draw_curved_hold_connector(
+            self.first.lane,
+            self.second.lane,
+            self.first.y,
+            self.second.y,
+            self.ease,
+        )
+
+
 class SimLine(PlayArchetype):
     """A line connecting two simultaneous notes."""
 
@@ -4,7 +4,7 @@ from pydori.lib.buckets import Buckets
 from pydori.lib.effect import Effects
 from pydori.lib.particle import Particles
 from pydori.lib.skin import Skin
-from pydori.play.connector import HoldConnector, SimLine
+from pydori.play.connector import CurvedHoldConnector, HoldConnector, SimLine
 from pydori.play.event import BpmChange, TimescaleChange
 from pydori.play.note import ALL_NOTE_TYPES, HoldManager
 from pydori.play.stage import Stage
@@ -15,6 +15,7 @@ play_mode = PlayMode(
         *ALL_NOTE_TYPES,
         HoldManager,
         HoldConnector,
+        CurvedHoldConnector,
         SimLine,
         BpmChange,
         TimescaleChange,
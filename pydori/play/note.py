@@ -58,14 +58,18 @@ class Note(PlayArchetype):
     direction: int = imported()
     prev_ref: EntityRef[Note] = imported()
     next_ref: EntityRef[Note] = imported()
+    # The first and last notes of the hold this note is part of, provided by the level data so preprocess doesn't
+    # need to walk the hold. Levels that don't provide them fall back to walking the hold.
+    head_ref: EntityRef[Note] = imported()
+    end_ref: EntityRef[Note] = imported()
+    # Resolved by the level data so preprocess doesn't need to resolve them.
+    # Levels that don't provide them fall back to resolving them in preprocess.
+    target_time: float = imported()
+    target_scaled_time: float = imported()
 
     judgment_window: JudgmentWindow = entity_data()
-    target_time: float = entity_data()
-    target_scaled_time: float = entity_data()
     start_scaled_time: float = entity_data()
     input_interval: Interval = entity_data()
-    head_ref: EntityRef[Note] = entity_data()
-    end_ref: EntityRef[Note] = entity_data()
 
     best_judgment_time: float = entity_memory()
 
@@ -81,8 +85,10 @@ class Note(PlayArchetype):
             self.direction = -self.direction
 
         self.judgment_window = note_judgment_window
-        self.target_time = beat_to_time(self.beat)
-        self.target_scaled_time = time_to_scaled_time(self.target_time)
+        # Only beat 0 is at time 0, so a zero time on any other beat means the level data didn't provide it.
+        if self.target_time == 0 and self.beat != 0:
+            self.target_time = beat_to_time(self.beat)
+            self.target_scaled_time = time_to_scaled_time(self.target_time)
         self.start_scaled_time = self.target_scaled_time - preempt_time()
         self.input_interval = self.judgment_window.good + self.target_time + input_offset()
         self.result.bucket = get_note_bucket(self.kind)
@@ -90,13 +96,15 @@ class Note(PlayArchetype):
 
         self.best_judgment_time = DEFAULT_BEST_JUDGMENT_TIME
 
-        self.head_ref = self.ref()
-        while self.head.has_prev:
-            self.head_ref = self.head.prev_ref
+        if self.head_ref.index <= 0:
+            self.head_ref = self.ref()
+            while self.head.has_prev:
+                self.head_ref = self.head.prev_ref
 
-        self.end_ref = self.ref()
-        while self.end.has_next:
-            self.end_ref = self.end.next_ref
+        if self.end_ref.index <= 0:
+            self.end_ref = self.ref()
+            while self.end.has_next:
+                self.end_ref = self.end.next_ref
 
         if Options.auto_sfx_enabled:
             schedule_note_sfx(self.kind, Judgment.PERFECT, self.target_time)
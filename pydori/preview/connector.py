@@ -1,9 +1,18 @@
+from math import ceil
+
 from sonolus.script.archetype import EntityRef, imported, PreviewArchetype
+from sonolus.script.interval import lerp, unlerp
 
+from pydori.lib.connector import CURVED_CONNECTOR_SEGMENTS, ease_connector
 from pydori.lib.layer import get_z, LAYER_CONNECTOR, LAYER_SIM_LINE
 from pydori.lib.options import Options
 from pydori.lib.skin import Skin
-from pydori.preview.layout import time_to_preview_col, layout_preview_connector, layout_preview_sim_line
+from pydori.preview.layout import (
+    PREVIEW_COLUMN_SECS,
+    time_to_preview_col,
+    layout_preview_connector,
+    layout_preview_sim_line,
+)
 from pydori.preview.note import PreviewNote
 
 
@@ -40,6 +49,59 @@ class PreviewHoldConnector(PreviewArchetype):
         return self.second_ref.get()
 
 
+class PreviewCurvedHoldConnector(PreviewArchetype):
+    """A connector for hold notes whose lane is eased between its notes, replacing a chain of hold anchors."""
+
+    name = "CurvedHoldConnector"
+
+    first_ref: EntityRef[PreviewNote] = imported()
+    second_ref: EntityRef[PreviewNote] = imported()
+    ease: int = imported()
+
+    def render(self):
+        first_col = time_to_preview_col(self.first.target_time)
+        second_col = time_to_preview_col(self.second.target_time)
+        z = get_z(
+            LAYER_CONNECTOR,
+            lane=min(self.first.lane, self.second.lane),
+            y=min(self.first.target_time, self.second.target_time),
+        )
+        for col in range(first_col, second_col + 1):
+            # Each column is drawn with a number of segments proportional to the part of the connector it contains.
+            start_time = max(self.first.target_time, col * PREVIEW_COLUMN_SECS)
+            end_time = min(self.second.target_time, (col + 1) * PREVIEW_COLUMN_SECS)
+            if start_time >= end_time:
+                continue
+            segments = ceil(CURVED_CONNECTOR_SEGMENTS * (end_time - start_time) / PREVIEW_COLUMN_SECS)
+            for i in range(segments):
+                segment_start_time = lerp(start_time, end_time, i / segments)
+                segment_end_time = lerp(start_time, end_time, (i + 1) / segments)
+                Skin.hold_connector.draw(
+                    layout_preview_connector(
+                        self.get_lane(segment_start_time),
+                        self.get_lane(segment_end_time),
+                        segment_start_time,
+                        segment_end_time,
+                        col,
+                    ),
+                    z=z,
+                    a=Options.connector_alpha,
+                )
+
+    def get_lane(self, time: float) -> float:
+        """Return the lane of the connector at the given time."""
+        progress = unlerp(self.first.target_time, self.second.target_time, time)
+        return lerp(self.first.lane, self.second.lane, ease_connector(self.ease, progress))
+
+    @property
+    def first(self):
+        return self.first_ref.get()
+
+    @property
+    def second(self):
+        return self.second_ref.get()
+
+
 class PreviewSimLine(PreviewArchetype):
     """A line connecting two simultaneous notes."""
 
@@ -1,7 +1,7 @@
 from pydori.lib.skin import Skin
 from sonolus.script.engine import PreviewMode
 
-from pydori.preview.connector import PreviewHoldConnector, PreviewSimLine
+from pydori.preview.connector import PreviewCurvedHoldConnector, PreviewHoldConnector, PreviewSimLine
 from pydori.preview.event import PreviewBpmChange, PreviewTimescaleChange
 from pydori.preview.note import ALL_PREVIEW_NOTE_TYPES
 from pydori.preview.stage import PreviewStage
@@ -11,6 +11,7 @@ preview_mode = PreviewMode(
         PreviewStage,
         *ALL_PREVIEW_NOTE_TYPES,
         PreviewHoldConnector,
+        PreviewCurvedHoldConnector,
         PreviewSimLine,
         PreviewBpmChange,
         PreviewTimescaleChange,
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import cast
 
-from sonolus.script.archetype import PreviewArchetype, imported, StandardImport, entity_data
+from sonolus.script.archetype import PreviewArchetype, imported, StandardImport
 from sonolus.script.timing import beat_to_time
 
 from pydori.lib.layer import get_z, LAYER_NOTE, LAYER_ARROW
@@ -22,15 +22,17 @@ class PreviewNote(PreviewArchetype):
     lane: float = imported()
     beat: StandardImport.BEAT = imported()
     direction: int = imported()
-
-    target_time: float = entity_data()
+    # Resolved by the level data so preprocess doesn't need to resolve it.
+    # Levels that don't provide it fall back to resolving it in preprocess.
+    target_time: float = imported()
 
     def preprocess(self):
         if Options.mirror:
             self.lane = -self.lane
             self.direction = -self.direction
 
-        self.target_time = beat_to_time(self.beat)
+        if self.target_time == 0 and self.beat != 0:
+            self.target_time = beat_to_time(self.beat)
 
         PreviewData.last_time = max(PreviewData.last_time, self.target_time)
         PreviewData.last_beat = max(PreviewData.last_beat, self.beat)
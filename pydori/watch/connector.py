@@ -2,7 +2,12 @@ from sonolus.script.archetype import WatchArchetype, EntityRef, imported
 from sonolus.script.interval import remap
 from sonolus.script.runtime import time
 
-from pydori.lib.connector import draw_sim_line, draw_hold_connector
+from pydori.lib.connector import (
+    draw_curved_hold_connector,
+    draw_hold_connector,
+    draw_sim_line,
+    get_curved_connector_lane,
+)
 from pydori.watch.note import WatchNote
 
 
@@ -24,9 +29,16 @@ class WatchHoldConnector(WatchArchetype):
 
     def update_sequential(self):
         if self.first.target_time <= time() < self.second.target_time and self.head.has_active_touch:
-            self.head.hold_lane = remap(self.first.y, self.second.y, self.first.lane, self.second.lane, 0)
+            self.head.hold_lane = self.get_lane(0)
 
     def update_parallel(self):
+        self.draw()
+
+    def get_lane(self, y: float) -> float:
+        """Return the lane of the connector at the given y-coordinate."""
+        return remap(self.first.y, self.second.y, self.first.lane, self.second.lane, y)
+
+    def draw(self):
         draw_hold_connector(
             self.first.lane,
             self.second.lane,
@@ -47,6 +59,26 @@ class WatchHoldConnector(WatchArchetype):
         return self.first.head
 
 
+class WatchCurvedHoldConnector(WatchHoldConnector):
+    """A connector for hold notes whose lane is eased between its notes, replacing a chain of hold anchors."""
+
+    name = "CurvedHoldConnector"
+
+    ease: int = imported()
+
+    def get_lane(self, y: float) -> float:
+        return get_curved_connector_lane(self.first.lane, self.second.lane, self.first.y, self.second.y, self.ease, y)
+
+    def draw(self):
+        draw_curved_hold_connector(
+            self.first.lane,
+            self.second.lane,
+            self.first.y,
+            self.second.y,
+            self.ease,
+        )
+
+
 class WatchSimLine(WatchArchetype):
     """A line connecting two simultaneous notes."""
 
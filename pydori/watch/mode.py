@@ -2,7 +2,7 @@ from pydori.lib.buckets import Buckets
 from pydori.lib.effect import Effects
 from pydori.lib.particle import Particles
 from pydori.lib.skin import Skin
-from pydori.watch.connector import WatchHoldConnector, WatchSimLine
+from pydori.watch.connector import WatchCurvedHoldConnector, WatchHoldConnector, WatchSimLine
 from pydori.watch.event import WatchBpmChange, WatchTimescaleChange
 from pydori.watch.note import ALL_WATCH_NOTE_TYPES, WatchHoldManager
 from pydori.watch.stage import WatchStage, WatchScheduledLaneEffect
@@ -16,6 +16,7 @@ watch_mode = WatchMode(
         *ALL_WATCH_NOTE_TYPES,
         WatchHoldManager,
         WatchHoldConnector,
+        WatchCurvedHoldConnector,
         WatchSimLine,
         WatchBpmChange,
         WatchTimescaleChange,
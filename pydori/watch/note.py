@@ -41,13 +41,17 @@ class WatchNote(WatchArchetype):
     direction: int = imported()
     prev_ref: EntityRef[WatchNote] = imported()
     next_ref: EntityRef[WatchNote] = imported()
+    # The first and last notes of the hold this note is part of, provided by the level data so preprocess doesn't
+    # need to walk the hold. Levels that don't provide them fall back to walking the hold.
+    head_ref: EntityRef[WatchNote] = imported()
+    end_ref: EntityRef[WatchNote] = imported()
+    # Resolved by the level data so preprocess doesn't need to resolve them.
+    # Levels that don't provide them fall back to resolving them in preprocess.
+    target_time: float = imported()
+    target_scaled_time: float = imported()
 
-    target_time: float = entity_data()
-    target_scaled_time: float = entity_data()
     start_scaled_time: float = entity_data()
     end_scaled_time: float = entity_data()
-    head_ref: EntityRef[WatchNote] = entity_data()
-    end_ref: EntityRef[WatchNote] = entity_data()
 
     _hold_lane: float = shared_memory()
 
@@ -60,21 +64,24 @@ class WatchNote(WatchArchetype):
             self.lane = -self.lane
             self.direction = -self.direction
 
-        self.target_time = beat_to_time(self.beat)
-        self.target_scaled_time = time_to_scaled_time(self.target_time)
+        if self.target_time == 0 and self.beat != 0:
+            self.target_time = beat_to_time(self.beat)
+            self.target_scaled_time = time_to_scaled_time(self.target_time)
         self.start_scaled_time = self.target_scaled_time - preempt_time()
         self.end_scaled_time = time_to_scaled_time(self.end_time)
         self.result.bucket = get_note_bucket(self.kind)
 
         self.result.target_time = self.target_time
 
-        self.head_ref = self.ref()
-        while self.head.has_prev:
-            self.head_ref = self.head.prev_ref
+        if self.head_ref.index <= 0:
+            self.head_ref = self.ref()
+            while self.head.has_prev:
+                self.head_ref = self.head.prev_ref
 
-        self.end_ref = self.ref()
-        while self.end.has_next:
-            self.end_ref = self.end.next_ref
+        if self.end_ref.index <= 0:
+            self.end_ref = self.ref()
+            while self.end.has_next:
+                self.end_ref = self.end.next_ref
 
         if is_replay():
             if self.judgment != Judgment.MISS:
@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import http.server
+import json
+import re
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from pydori.convert import client, utils
+from pydori.convert.cache import DiskCache, MemoryCache
+
+
+class StaticServer:
+    """A local HTTP server serving files from memory, which records the requests it receives.
+
+    Responses carry an ETag, and conditional requests for unchanged files are answered with 304 Not Modified.
+    Range requests for a suffix of a file are answered with 206 Partial Content, unless their If-Range header doesn't
+    match the ETag of the file. Other bodies are gzip-compressed for requests accepting it. Requests sent to the server
+    as a proxy have the full URL as their path.
+    """
+
+    def __init__(self):
+        # Content of each file by path, including the query string.
+        self.files: dict[str, bytes] = {}
+        # Method, path and headers of each request received, in order.
+        self.requests: list[tuple[str, str, dict[str, str]]] = []
+        # Client address of each request received, which identifies the connection it was sent on.
+        self.clients: list[tuple[str, int]] = []
+        # Seconds each response is delayed by.
+        self.delay = 0.0
+        # Largest number of requests handled at the same time.
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def etag(self, path: str) -> str:
+        return f'"{hashlib.sha1(self.files[path]).hexdigest()}"'
+
+    def paths(self) -> list[str]:
+        """Return the path of each request received, in order."""
+        return [path for _, path, _ in self.requests]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _make_handler(server: StaticServer) -> type[http.server.BaseHTTPRequestHandler]:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with server._lock:
+                server.requests.append(("GET", self.path, dict(self.headers)))
+                server.clients.append(self.client_address[:2])
+                server._in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server._in_flight)
+            try:
+                time.sleep(server.delay)
+                self._respond()
+            finally:
+                with server._lock:
+                    server._in_flight -= 1
+
+        def _respond(self):
+            content = server.files.get(self.path)
+            if content is None:
+                self._send(404, b"Not found")
+                return
+            etag = server.etag(self.path)
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", {"ETag": etag})
+                return
+            headers = {"ETag": etag}
+            match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if match and self.headers.get("If-Range", etag) == etag:
+                start = int(match.group(1))
+                headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+                self._send(206, content[start:], headers)
+                return
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                content = gzip.compress(content)
+                headers["Content-Encoding"] = "gzip"
+            self._send(200, content, headers)
+
+        def _send(self, status: int, body: bytes, headers: dict[str, str] | None = None):
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if status != 304:
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def server():
+    server = StaticServer()
+    server.start()
+    yield server
+    server.stop()
+    client.default_pool.close()
+
+
+@pytest.fixture(autouse=True)
+def no_proxy(monkeypatch):
+    """Connect directly regardless of the proxies configured in the environment."""
+    for name in ("http_proxy", "https_proxy", "all_proxy", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(tmp_path, monkeypatch) -> DiskCache:
+    """Replace the caches used by the converter with empty ones in a temporary directory."""
+    cache = DiskCache(tmp_path / "cache")
+    # Worker processes that don't inherit the patched caches use the same directory.
+    monkeypatch.setenv("PYDORI_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(utils, "_disk_cache", cache)
+    monkeypatch.setattr(utils, "_memory_cache", MemoryCache(utils.MEMORY_CACHE_MAX_BYTES))
+    return cache
+
+
+@pytest.fixture
+def bandori_level_data() -> dict:
+    """Sonolus Bandori level data with a tap, a chord joined by a sim line, a directional flick and a slide."""
+
+    def note(archetype: str, beat: float, lane: float, name: str | None = None, **values) -> dict:
+        entity = {
+            "archetype": archetype,
+            "data": [
+                {"name": "#BEAT", "value": beat},
+                {"name": "lane", "value": lane},
+                *({"name": key, "value": value} for key, value in values.items()),
+            ],
+        }
+        if name is not None:
+            entity["name"] = name
+        return entity
+
+    return {
+        "bgmOffset": 0,
+        "entities": [
+            {"archetype": "Initialization", "data": []},
+            {"archetype": "Stage", "data": []},
+            {"archetype": "#BPM_CHANGE", "data": [{"name": "#BEAT", "value": 0}, {"name": "#BPM", "value": 120}]},
+            note("TapNote", 1, 0),
+            note("TapNote", 2, -2),
+            note("FlickNote", 2, 2),
+            {"archetype": "SimLine", "data": []},
+            note("DirectionalFlickNote", 3, 1, direction=-1, size=2),
+            note("SlideStartNote", 4, -3, "a"),
+            note("SlideTickNote", 5, 0, "b"),
+            note("SlideEndNote", 6, 3, "c"),
+            {
+                "archetype": "StraightSlideConnector",
+                "data": [{"name": "head", "ref": "a"}, {"name": "tail", "ref": "b"}],
+            },
+            {
+                "archetype": "StraightSlideConnector",
+                "data": [{"name": "head", "ref": "b"}, {"name": "tail", "ref": "c"}],
+            },
+        ],
+    }
+
+
+@pytest.fixture
+def bandori_level_source(bandori_level_data) -> bytes:
+    """The Bandori level data as gzip-compressed JSON, as served by a Sonolus server."""
+    return gzip.compress(json.dumps(bandori_level_data).encode("utf-8"))
+
+
+def level_item(name: str, resources: dict[str, bytes]) -> tuple[dict, dict[str, bytes]]:
+    """Return a Sonolus level item referencing the given resources, and the resources by their repository path."""
+    srls = {}
+    files = {}
+    for key, content in resources.items():
+        digest = hashlib.sha1(content).hexdigest()
+        srls[key] = {"hash": digest, "url": f"/sonolus/repository/{digest}"}
+        files[f"sonolus/repository/{digest}"] = content
+    item = {
+        "name": name,
+        "version": 1,
+        "rating": 25,
+        "title": name.title(),
+        "artists": "Artists",
+        "author": "Author",
+        "tags": [{"title": "Expert"}],
+        **srls,
+    }
+    return item, files
+
+
+@pytest.fixture
+def make_collection(tmp_path):
+    """Return a function writing a Sonolus collection archive with levels given by their name and resources."""
+
+    def make(levels: dict[str, dict[str, bytes]], name: str = "collection.scp") -> Path:
+        path = tmp_path / name
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+            for level_name, resources in levels.items():
+                item, files = level_item(level_name, resources)
+                archive.writestr(f"sonolus/levels/{level_name}", json.dumps({"item": item}))
+                for file_name, content in files.items():
+                    if file_name not in archive.namelist():
+                        archive.writestr(file_name, content)
+        return path
+
+    return make
@@ -0,0 +1,128 @@
+import gzip
+import json
+import logging
+from pathlib import Path
+
+import pytest
+from sonolus.build.level import build_level_data
+
+from pydori.convert.bestdori import (
+    convert_sonolus_bandori_chart,
+    convert_sonolus_bandori_level_chart,
+    convert_sonolus_bandori_level_data,
+    import_sonolus_bandori_level,
+    import_sonolus_bandori_levels,
+)
+
+# Entities expected from converting Sonolus Bandori level data, recorded from the converter before it decoded notes
+# into columns. The synthetic cases also record their input, generated by benchmarks/fixtures.py.
+CONVERSIONS = json.loads((Path(__file__).parent / "data" / "bandori_conversions.json").read_text("utf-8"))
+
+# Fields that were added to the level data after the expected entities were recorded.
+UNRECORDED_FIELDS = {"target_time", "target_scaled_time", "head_ref", "end_ref"}
+
+
+def recorded_entities(data: dict) -> list[dict]:
+    """Convert level data without removing hold anchors and return its entities in the recorded form.
+
+    References are replaced by the index of the referenced entity, and zero values and unrecorded fields are omitted.
+    """
+    entities = build_level_data(convert_sonolus_bandori_level_data(data, anchor_tolerance=-1))["entities"]
+    indexes = {entity["name"]: i for i, entity in enumerate(entities)}
+    return [
+        {
+            "archetype": entity["archetype"],
+            "data": {
+                d["name"]: d["value"] if "value" in d else {"ref": indexes[d["ref"]]}
+                for d in entity["data"]
+                if d["name"] not in UNRECORDED_FIELDS and d.get("value") != 0
+            },
+        }
+        for entity in entities
+    ]
+
+
+@pytest.fixture
+def collection(make_collection, bandori_level_source):
+    resources = {"cover": b"cover", "bgm": b"bgm", "data": bandori_level_source}
+    return make_collection({"a": resources, "b": resources})
+
+
+def test_import_levels_in_parallel(collection):
+    levels = import_sonolus_bandori_levels(collection, max_workers=2)
+
+    assert [level.name for level in levels] == ["pydori-a", "pydori-b"]
+    for level in levels:
+        expected = import_sonolus_bandori_level(level.name.removeprefix("pydori-"), collection)
+        assert build_level_data(level.data) == build_level_data(expected.data)
+        assert level.bgm == b"bgm"
+
+
+def test_import_levels_in_parallel_reports_each_failure(make_collection, bandori_level_source):
+    invalid = gzip.compress(b'{"bgmOffset": 0, "entities": [{"archetype": "Unknown", "data": []}]}')
+    collection = make_collection(
+        {
+            "a": {"cover": b"cover", "bgm": b"bgm", "data": bandori_level_source},
+            "b": {"cover": b"cover", "bgm": b"bgm", "data": invalid},
+        }
+    )
+
+    with pytest.raises(ExceptionGroup) as info:
+        import_sonolus_bandori_levels(collection, max_workers=2)
+
+    (error,) = info.value.exceptions
+    assert isinstance(error, ValueError)
+    assert "While converting level 'b'" in error.__notes__
+
+
+def test_cached_charts_are_keyed_by_decompressed_content(bandori_level_data, disk_cache):
+    content = json.dumps(bandori_level_data).encode("utf-8")
+
+    first = convert_sonolus_bandori_level_chart(gzip.compress(content, compresslevel=9, mtime=0))
+    second = convert_sonolus_bandori_level_chart(gzip.compress(content, compresslevel=1, mtime=1))
+
+    assert first == second
+    assert disk_cache.stats()["entries"] == 1
+
+
+def test_removed_hold_anchors_are_logged(bandori_level_data, caplog):
+    def note(archetype: str, name: str, beat: float, lane: float) -> dict:
+        return {
+            "archetype": archetype,
+            "name": name,
+            "data": [{"name": "#BEAT", "value": beat}, {"name": "lane", "value": lane}],
+        }
+
+    def connector(head: str, tail: str) -> dict:
+        return {
+            "archetype": "StraightSlideConnector",
+            "data": [{"name": "head", "ref": head}, {"name": "tail", "ref": tail}],
+        }
+
+    # The anchor lies on the straight line between the start and end of the slide, so it and a connector are removed.
+    bandori_level_data["entities"] += [
+        note("SlideStartNote", "d", 8, 0),
+        note("IgnoredNote", "e", 9, 1),
+        note("SlideEndNote", "f", 10, 2),
+        connector("d", "e"),
+        connector("e", "f"),
+    ]
+    caplog.set_level(logging.DEBUG, logger="pydori.convert.bestdori")
+
+    convert_sonolus_bandori_chart(bandori_level_data)
+
+    assert "Removed 2 entities by simplifying hold anchors within a tolerance of 0.02 lanes" in caplog.messages
+
+
+def test_conversion_matches_recorded_entities(bandori_level_data):
+    assert recorded_entities(bandori_level_data) == CONVERSIONS["fixture"]["expected"]
+
+
+@pytest.mark.parametrize("case", [name for name, case in CONVERSIONS.items() if "input" in case])
+def test_synthetic_conversions_match_recorded_entities(case):
+    actual = recorded_entities(CONVERSIONS[case]["input"])
+    expected = CONVERSIONS[case]["expected"]
+
+    assert len(actual) == len(expected)
+    for i, (actual_entity, expected_entity) in enumerate(zip(actual, expected, strict=True)):
+        assert actual_entity == expected_entity, f"entity {i}"
@@ -0,0 +1,60 @@
+from sonolus.build.level import build_level_data
+from sonolus.script.level import LevelData
+
+from pydori.convert import chart
+from pydori.convert.builder import ChartBuilder
+from pydori.level import create_sim_lines, hold, resolve_timing
+from pydori.lib.note import NoteKind
+from pydori.play.event import BpmChange, TimescaleChange
+from pydori.play.note import FlickNote, HoldAnchorNote, HoldEndNote, HoldHeadNote, HoldTickNote, TapNote
+from pydori.play.stage import Stage
+
+
+def comparable_entities(level_data: LevelData) -> list:
+    """Return the entities of level data in a canonical order, with each reference replaced by the data it refers to.
+
+    Entity names depend on the order of the entities, so this compares level data with the same entities in any order.
+    """
+    entities = build_level_data(level_data)["entities"]
+    by_name = {entity["name"]: entity for entity in entities}
+
+    def values(entity: dict) -> tuple:
+        return entity["archetype"], tuple(sorted((d["name"], d["value"]) for d in entity["data"] if "value" in d))
+
+    def comparable(entity: dict) -> tuple:
+        refs = tuple(sorted((d["name"], values(by_name[d["ref"]])) for d in entity["data"] if "ref" in d))
+        return *values(entity), refs
+
+    return sorted((comparable(entity) for entity in entities), key=repr)
+
+
+def test_builder_matches_level_helpers():
+    # Notes are added out of beat order, and holds overlap other notes.
+    builder = ChartBuilder()
+    builder.bpm_change(4, 180)
+    builder.bpm_change(0, 120)
+    builder.timescale_change(3, 0.5)
+    builder.hold([2, 3, 4], [-3, -1, 1], [NoteKind.HOLD_HEAD, NoteKind.HOLD_ANCHOR, NoteKind.HOLD_END])
+    builder.chord(NoteKind.TAP, 3, [2, -2])
+    builder.note(NoteKind.FLICK, 1, 0)
+    builder.hold([1, 1.5, 3], [3, 3, 3])
+    builder.chord(NoteKind.TAP, 1, [-1])
+
+    entities = [
+        Stage(),
+        BpmChange(beat=4, bpm=180),
+        BpmChange(beat=0, bpm=120),
+        TimescaleChange(beat=3, timescale=0.5),
+        *hold(HoldEndNote(beat=4, lane=1), HoldHeadNote(beat=2, lane=-3), HoldAnchorNote(beat=3, lane=-1)),
+        TapNote(beat=3, lane=2),
+        TapNote(beat=3, lane=-2),
+        FlickNote(beat=1, lane=0),
+        *hold(HoldHeadNote(beat=1, lane=3), HoldTickNote(beat=1.5, lane=3), HoldEndNote(beat=3, lane=3)),
+        TapNote(beat=1, lane=-1),
+    ]
+    resolve_timing(entities)
+    expected = LevelData(bgm_offset=0, entities=[*entities, *create_sim_lines(entities)])
+    built = builder.build()
+
+    assert [note.beat for note in built.notes] == sorted(note.beat for note in built.notes)
+    assert comparable_entities(chart.build_level_data(built)) == comparable_entities(expected)
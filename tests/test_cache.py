@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from pydori.convert import utils
+from pydori.convert.cache import LEGACY_CHARTS_DIR_NAME, MemoryCache, ttl_for_url
+from pydori.convert.utils import MMAP_THRESHOLD_BYTES, get_asset, get_cached_content_path, get_cached_path, get_json
+
+
+def expire(disk_cache, url: str):
+    disk_cache.db.execute("UPDATE entries SET validated = 0 WHERE url = ?", (url,))
+
+
+def test_ttl_for_url():
+    assert ttl_for_url("https://example.com/sonolus/levels/list?localization=en") == 10 * 60
+    assert ttl_for_url("https://example.com/sonolus/levels/name?localization=en") == 60 * 60
+    assert ttl_for_url("https://example.com/sonolus/repository/abc") is None
+
+
+def test_fresh_entry_is_not_revalidated(server):
+    server.files["/sonolus/levels/test"] = b'{"version": 1}'
+    url = server.url + "sonolus/levels/test"
+
+    get_cached_path(url)
+    get_cached_path(url)
+
+    assert server.paths() == ["/sonolus/levels/test"]
+
+
+def test_concurrent_requests_for_a_url_download_it_once(server):
+    server.files["/sonolus/levels/test"] = b'{"version": 1}'
+    url = server.url + "sonolus/levels/test"
+    server.delay = 0.2
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(get_cached_path, [url] * 4))
+
+    assert len(set(paths)) == 1
+    assert server.paths() == ["/sonolus/levels/test"]
+    assert utils._download_locks == {}
+
+
+def test_concurrent_requests_for_content_write_it_once():
+    writes = []
+
+    def write_content(dst):
+        writes.append(dst.name)
+        time.sleep(0.2)
+        dst.write(b"content")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(lambda _: get_cached_content_path("key", write_content), range(4)))
+
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == b"content"
+    assert len(writes) == 1
+    assert utils._download_locks == {}
+
+
+def test_unchanged_entry_is_revalidated(server, disk_cache):
+    server.files["/sonolus/levels/test"] = b'{"version": 1}'
+    url = server.url + "sonolus/levels/test"
+    path = get_cached_path(url)
+    expire(disk_cache, url)
+
+    assert get_cached_path(url) == path
+
+    _, _, headers = server.requests[-1]
+    assert headers["If-None-Match"] == server.etag("/sonolus/levels/test")
+    assert path.read_bytes() == b'{"version": 1}'
+    assert disk_cache.lookup(url).is_fresh(ttl_for_url(url))
+    assert disk_cache.stats()["revalidations"] == 1
+
+
+def test_changed_entry_is_downloaded_again(server, disk_cache):
+    server.files["/sonolus/levels/test"] = b'{"version": 1}'
+    url = server.url + "sonolus/levels/test"
+    assert get_json(url) == {"version": 1}
+    expire(disk_cache, url)
+    server.files["/sonolus/levels/test"] = b'{"version": 2}'
+
+    assert get_cached_path(url).read_bytes() == b'{"version": 2}'
+    assert len(server.requests) == 2
+    assert disk_cache.stats()["revalidations"] == 0
+
+
+def test_entries_with_the_same_content_share_a_file(server, disk_cache):
+    server.files["/a"] = b"content"
+    server.files["/b"] = b"content"
+
+    assert get_cached_path(server.url + "a") == get_cached_path(server.url + "b")
+    assert disk_cache.stats()["deduplicated"] == len(b"content")
+
+
+def test_least_recently_used_entries_are_evicted(server, disk_cache):
+    for name in "abc":
+        server.files[f"/{name}"] = name.encode() * 10
+        get_cached_path(server.url + name)
+    get_cached_path(server.url + "a")
+
+    evicted = disk_cache.evict(max_bytes=20)
+
+    assert evicted == [server.url + "b"]
+    assert disk_cache.lookup(server.url + "b") is None
+    assert disk_cache.lookup(server.url + "a") is not None
+
+
+def test_index_uses_write_ahead_logging(disk_cache):
+    assert disk_cache.db.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_hits_are_written_in_batches(server, disk_cache):
+    server.files["/a"] = b"content"
+    url = server.url + "a"
+    get_cached_path(url)
+    disk_cache.flush()
+
+    for _ in range(3):
+        get_cached_path(url)
+
+    assert disk_cache.db.execute("SELECT hits FROM entries WHERE url = ?", (url,)).fetchone() == (0,)
+    disk_cache.flush()
+    assert disk_cache.db.execute("SELECT hits FROM entries WHERE url = ?", (url,)).fetchone() == (3,)
+    assert disk_cache.stats()["hits"] == 3
+
+
+def test_assets_returned_as_paths_are_not_evicted(server, disk_cache):
+    server.files["/large"] = bytes(MMAP_THRESHOLD_BYTES)
+    server.files["/small"] = b"small"
+    path = get_asset(server.url + "large")
+    get_cached_path(server.url + "small")
+
+    evicted = disk_cache.evict(max_bytes=0)
+
+    assert evicted == [server.url + "small"]
+    assert path.read_bytes() == bytes(MMAP_THRESHOLD_BYTES)
+    assert disk_cache.lookup(server.url + "large") is not None
+
+
+def lookup_in_child(url: str) -> tuple[bool, bool]:
+    """Return whether the disk cache of a forked child inherited a connection, and whether it finds a URL."""
+    inherited = utils._disk_cache._connection is not None
+    return inherited, utils._disk_cache.lookup(url) is not None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_forked_processes_open_their_own_index_connection(disk_cache, tmp_path):
+    (tmp_path / "content").write_bytes(b"content")
+    disk_cache.add("key", tmp_path / "content")
+    disk_cache.lookup("key")
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+        inherited, found = executor.submit(lookup_in_child, "key").result()
+
+    assert not inherited
+    assert found
+    assert disk_cache.lookup("key") is not None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")
+    cache.put("c", b"cccc")
+
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("b") is None
+    assert cache.size == 8
+
+
+def test_prune_deletes_legacy_charts(disk_cache):
+    legacy_charts = disk_cache.directory / LEGACY_CHARTS_DIR_NAME
+    legacy_charts.mkdir(parents=True)
+    (legacy_charts / "bandori-3-0.02-abc").write_bytes(b"chart")
+
+    _, removed = disk_cache.prune()
+
+    assert removed == [legacy_charts / "bandori-3-0.02-abc"]
@@ -0,0 +1,298 @@
+import struct
+
+import pytest
+
+from pydori.convert.bestdori import ANCHOR_CONNECTOR_EASES
+from pydori.convert.builder import ChartBuilder
+from pydori.convert.chart import (
+    CHART_CACHE_KEY_PREFIX,
+    CHART_FORMAT_VERSION,
+    LEVEL_ARCHETYPES,
+    NO_NOTE,
+    Chart,
+    ChartNote,
+    build_level_data,
+    dump_chart,
+    load_cached_chart,
+    load_chart,
+    read_chart,
+    resolve_hold_ends,
+    simplify_hold_anchors,
+    store_cached_chart,
+    write_chart,
+)
+from pydori.convert.timing import TimingIndex
+from pydori.level import stress_chart
+from pydori.lib.connector import ConnectorEase, ease_connector, get_curved_connector_lane
+from pydori.lib.note import NoteKind
+
+
+def anchor_hold(builder: ChartBuilder, beats: list[float], lanes: list[float]) -> range:
+    """Add a hold made of a head, anchors and an end."""
+    kinds = [NoteKind.HOLD_HEAD, *[NoteKind.HOLD_ANCHOR] * (len(beats) - 2), NoteKind.HOLD_END]
+    return builder.hold(beats, lanes, kinds)
+
+
+def removed_anchor_offsets(original: Chart, simplified: Chart) -> list[float]:
+    """Return the distance in lanes from each note removed by simplification to the connector which replaced it.
+
+    Notes are matched between the charts by their beat and lane, and the connector is evaluated the way it's drawn,
+    with y linear in scaled time.
+    """
+    timing = TimingIndex(original.bpm_changes, original.timescale_changes)
+    indexes = {(note.beat, note.lane): i for i, note in enumerate(original.notes)}
+    offsets = []
+    for a, b, ease in simplified.hold_connectors:
+        first, second = simplified.notes[a], simplified.notes[b]
+        y_a, y_b = (timing.time_to_scaled_time(timing.beat_to_time(note.beat)) for note in (first, second))
+        i = original.notes[indexes[first.beat, first.lane]].next
+        while i != indexes[second.beat, second.lane]:
+            note = original.notes[i]
+            assert note.kind == NoteKind.HOLD_ANCHOR
+            y = timing.time_to_scaled_time(timing.beat_to_time(note.beat))
+            offsets.append(abs(get_curved_connector_lane(first.lane, second.lane, y_a, y_b, ease, y) - note.lane))
+            i = note.next
+    return offsets
+
+
+@pytest.fixture
+def chart() -> Chart:
+    return Chart(
+        bgm_offset=0.25,
+        bpm_changes=[(0.0, 120.0), (4.0, 180.5)],
+        timescale_changes=[(2.0, 0.5)],
+        notes=[
+            ChartNote(NoteKind.TAP, 1.0, 0.0, 0, NO_NOTE, NO_NOTE),
+            ChartNote(NoteKind.DIRECTIONAL_FLICK, 1.0, 2.0, -3, NO_NOTE, NO_NOTE),
+            ChartNote(NoteKind.HOLD_HEAD, 2.0, -3.0, 0, NO_NOTE, 3),
+            ChartNote(NoteKind.HOLD_ANCHOR, 2.5, -1.5, 0, 2, 4),
+            ChartNote(NoteKind.HOLD_END, 3.0, 1.0, 0, 3, NO_NOTE),
+        ],
+        hold_connectors=[(2, 3, ConnectorEase.LINEAR), (3, 4, ConnectorEase.IN_OUT)],
+        sim_lines=[(0, 1)],
+    )
+
+
+def test_round_trip(chart):
+    loaded = load_chart(dump_chart(chart))
+
+    assert loaded == chart
+    assert all(isinstance(note.kind, NoteKind) for note in loaded.notes)
+    assert all(isinstance(ease, ConnectorEase) for _, _, ease in loaded.hold_connectors)
+
+
+def test_level_archetypes_include_every_built_entity(chart):
+    entities = build_level_data(chart).entities
+
+    assert {type(entity) for entity in entities} <= set(LEVEL_ARCHETYPES)
+
+
+def test_round_trip_of_generated_chart():
+    chart = stress_chart(chords=20, holds=2, hold_ticks=20, flicks=50, anchor_chains=2, chain_anchors=20)
+
+    assert load_chart(dump_chart(chart)) == chart
+
+
+def test_generated_chart_starts_with_a_bpm_change():
+    for bpm_changes in (0, 1, 10):
+        chart = stress_chart(chords=1, holds=0, flicks=0, anchor_chains=0, bpm_changes=bpm_changes)
+
+        assert len(chart.bpm_changes) == max(bpm_changes, 1)
+        assert chart.bpm_changes[0][0] == 0
+
+
+def test_round_trip_of_empty_chart():
+    chart = Chart(0.0, [], [], [], [], [])
+
+    assert load_chart(dump_chart(chart)) == chart
+
+
+def test_file_round_trip(chart, tmp_path):
+    write_chart(tmp_path / "chart", chart)
+
+    assert read_chart(tmp_path / "chart") == chart
+    assert [path.name for path in tmp_path.iterdir()] == ["chart"]
+
+
+def test_cached_chart(chart):
+    assert load_cached_chart("key") is None
+
+    store_cached_chart("key", chart)
+
+    assert load_cached_chart("key") == chart
+
+
+def test_rejects_other_data(chart):
+    with pytest.raises(ValueError, match="Not a pydori chart"):
+        load_chart(b"\x1f\x8b" + dump_chart(chart)[2:])
+
+
+def test_rejects_other_versions(chart):
+    data = bytearray(dump_chart(chart))
+    struct.pack_into("<H", data, 4, CHART_FORMAT_VERSION + 1)
+
+    with pytest.raises(ValueError, match="Unsupported chart format version"):
+        load_chart(bytes(data))
+
+
+def test_rejects_truncated_chart(chart):
+    data = dump_chart(chart)
+
+    with pytest.raises(ValueError, match="Truncated chart header"):
+        load_chart(data[:10])
+    with pytest.raises(ValueError, match="Truncated chart"):
+        load_chart(data[:-1])
+
+
+def test_rejects_invalid_note_kind(chart):
+    chart = chart._replace(notes=[chart.notes[0]._replace(kind=100)])
+
+    with pytest.raises(ValueError, match="Invalid note kind"):
+        load_chart(dump_chart(chart))
+
+
+def test_invalid_cached_chart_is_ignored(chart, disk_cache):
+    store_cached_chart("key", chart)
+    disk_cache.lookup(CHART_CACHE_KEY_PREFIX + "key").path.write_bytes(b"invalid")
+
+    assert load_cached_chart("key") is None
+    assert disk_cache.lookup(CHART_CACHE_KEY_PREFIX + "key") is None
+    store_cached_chart("key", chart)
+    assert load_cached_chart("key") == chart
+
+
+def test_cached_charts_are_part_of_the_disk_cache(chart, disk_cache):
+    store_cached_chart("a", chart)
+    store_cached_chart("b", chart._replace(bgm_offset=1))
+
+    assert disk_cache.stats()["entries"] == 2
+    assert disk_cache.stats()["size"] == 2 * len(dump_chart(chart))
+    assert disk_cache.evict(max_bytes=len(dump_chart(chart))) == [CHART_CACHE_KEY_PREFIX + "a"]
+    assert load_cached_chart("a") is None
+    disk_cache.clear()
+    assert load_cached_chart("b") is None
+
+
+def test_removed_anchors_are_within_tolerance_of_their_connector():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    builder.bpm_change(3, 200)
+    builder.timescale_change(2, 0.5)
+    beats = [i / 4 for i in range(25)]
+    anchor_hold(builder, beats, [-2 + beat * 0.5 + 0.005 * (-1) ** i for i, beat in enumerate(beats)])
+    chart = builder.build()
+
+    simplified, removed = simplify_hold_anchors(chart, 0.02)
+
+    offsets = removed_anchor_offsets(chart, simplified)
+    assert removed > 0
+    assert len(offsets) == len(chart.notes) - len(simplified.notes)
+    assert max(offsets) <= 0.02
+
+
+def test_anchors_outside_the_tolerance_are_kept():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    anchor_hold(builder, [0, 1, 2, 3, 4], [0, 0.5, 0, 0.5, 0])
+    chart = builder.build()
+
+    assert simplify_hold_anchors(chart, 0.02) == (chart, 0)
+
+
+def test_hold_links_match_connectors_after_simplifying():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    anchor_hold(builder, [0, 1, 2, 3, 4], [-3, -2, -1, 0, 1])
+    anchor_hold(builder, [0.5, 1.5, 2.5, 3.5], [3, 1, 2, 2])
+    builder.hold([1, 2, 3], [0, 0, 0])
+    builder.chord(NoteKind.TAP, 2, [-3, 3])
+    chart = builder.build()
+
+    simplified, removed = simplify_hold_anchors(chart, 0.02)
+
+    notes = simplified.notes
+    links = {(i, note.next) for i, note in enumerate(notes) if note.next != NO_NOTE}
+    # The anchors of the first hold are removed along with one connector each.
+    assert removed == 6
+    assert len(notes) == len(chart.notes) - 3
+    assert {(a, b) for a, b, _ in simplified.hold_connectors} == links
+    assert all(notes[b].prev == a for a, b in links)
+    assert all(note.prev == NO_NOTE for i, note in enumerate(notes) if i not in {b for _, b in links})
+    heads, ends = resolve_hold_ends(notes)
+    assert {notes[head].kind for head in heads if head != NO_NOTE} == {NoteKind.HOLD_HEAD}
+    assert {notes[end].kind for end in ends if end != NO_NOTE} == {NoteKind.HOLD_END}
+    assert [(notes[a].lane, notes[b].lane) for a, b in simplified.sim_lines] == [(-3, 3)]
+
+
+def test_resolve_hold_ends_of_interleaved_holds():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    builder.hold([0, 2, 4], [-2, -2, -2])
+    builder.hold([1, 3], [2, 2])
+    builder.note(NoteKind.TAP, 2.5, 0)
+    # A hold with a single anchor between its head and end.
+    anchor_hold(builder, [5, 6, 7], [0, 1, 0])
+    notes = builder.build().notes
+
+    heads, ends = resolve_hold_ends(notes)
+
+    # Notes are sorted by beat, so the first two holds alternate and the tap lies between them.
+    assert [note.beat for note in notes] == [0, 1, 2, 2.5, 3, 4, 5, 6, 7]
+    assert heads == [0, 1, 0, NO_NOTE, 1, 0, 6, 6, 6]
+    assert ends == [5, 4, 5, NO_NOTE, 4, 5, 8, 8, 8]
+
+
+def test_negative_tolerance_leaves_the_chart_unchanged():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    anchor_hold(builder, [0, 1, 2, 3], [0, 1, 2, 3])
+    chart = builder.build()
+
+    assert simplify_hold_anchors(chart, -1) == (chart, 0)
+
+
+@pytest.mark.parametrize("ease", [ConnectorEase.IN, ConnectorEase.OUT, ConnectorEase.IN_OUT, ConnectorEase.OUT_IN])
+def test_curved_anchor_run_becomes_one_eased_connector(ease):
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    beats = [i / 8 for i in range(33)]
+    anchor_hold(builder, beats, [-3 + 6 * ease_connector(ease, beat / 4) for beat in beats])
+    chart = builder.build()
+
+    simplified, removed = simplify_hold_anchors(chart, 0.02, ANCHOR_CONNECTOR_EASES)
+
+    assert [note.kind for note in simplified.notes] == [NoteKind.HOLD_HEAD, NoteKind.HOLD_END]
+    assert simplified.hold_connectors == [(0, 1, ease)]
+    assert removed == 2 * 31
+
+
+def test_curved_connector_passes_within_tolerance_of_removed_anchors():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    builder.bpm_change(2, 90)
+    # The anchors follow the curve in scaled time, as the connector replacing them is drawn, with some noise.
+    timing = TimingIndex([(0, 120), (2, 90)], [])
+    beats = [i / 8 for i in range(33)]
+    progresses = [timing.beat_to_time(beat) / timing.beat_to_time(4) for beat in beats]
+    lanes = [2 - 4 * ease_connector(ConnectorEase.OUT, p) + 0.005 * (-1) ** i for i, p in enumerate(progresses)]
+    anchor_hold(builder, beats, lanes)
+    chart = builder.build()
+
+    simplified, _ = simplify_hold_anchors(chart, 0.02, ANCHOR_CONNECTOR_EASES)
+
+    offsets = removed_anchor_offsets(chart, simplified)
+    assert simplified.hold_connectors == [(0, 1, ConnectorEase.OUT)]
+    assert len(offsets) == len(chart.notes) - len(simplified.notes)
+    assert max(offsets) <= 0.02
+
+
+def test_anchor_run_no_ease_fits_stays_linear():
+    builder = ChartBuilder()
+    builder.bpm_change(0, 120)
+    anchor_hold(builder, [0, 0.5, 1, 1.5, 2], [0, 1, -1, 1, 0])
+    chart = builder.build()
+
+    simplified, removed = simplify_hold_anchors(chart, 0.02, ANCHOR_CONNECTOR_EASES)
+
+    assert removed == 0
+    assert [ease for _, _, ease in simplified.hold_connectors] == [ConnectorEase.LINEAR] * 4
@@ -0,0 +1,97 @@
+import gzip
+
+from pydori.convert.client import download, fetch
+from pydori.convert.utils import get_bytes, get_cached_path, get_json
+
+
+def test_only_text_is_requested_compressed(server):
+    server.files["/data.json"] = b'{"a": 1}'
+    server.files["/bgm.mp3"] = b"bgm"
+
+    assert get_json(server.url + "data.json") == {"a": 1}
+    assert get_bytes(server.url + "bgm.mp3") == b"bgm"
+
+    (_, _, text_headers), (_, _, binary_headers) = server.requests
+    assert text_headers["Accept-Encoding"] == "gzip"
+    assert "gzip" not in binary_headers.get("Accept-Encoding", "")
+
+
+def test_compressed_content_is_decompressed(server):
+    server.files["/level.gz"] = gzip.compress(b"level")
+
+    assert fetch(server.url + "level.gz", {"Accept-Encoding": "gzip"}) == gzip.compress(b"level")
+
+
+def test_connection_is_reused_across_revalidations(server, disk_cache):
+    server.files["/sonolus/levels/test"] = b'{"version": 1}'
+    url = server.url + "sonolus/levels/test"
+
+    for _ in range(4):
+        get_cached_path(url)
+        disk_cache.db.execute("UPDATE entries SET validated = 0 WHERE url = ?", (url,))
+
+    assert disk_cache.stats()["revalidations"] == 3
+    assert len(set(server.clients)) == 1
+
+
+def test_requests_are_sent_through_the_configured_proxy(server, monkeypatch):
+    server.files["http://example.invalid/a"] = b"proxied"
+    monkeypatch.setenv("http_proxy", "http://user:pass@" + server.url.removeprefix("http://"))
+
+    assert fetch("http://example.invalid/a") == b"proxied"
+
+    _, path, headers = server.requests[-1]
+    assert path == "http://example.invalid/a"
+    assert headers["Proxy-Authorization"] == "Basic dXNlcjpwYXNz"
+
+
+def test_hosts_excluded_from_proxying_are_reached_directly(server, monkeypatch):
+    server.files["/a"] = b"direct"
+    monkeypatch.setenv("http_proxy", "http://127.0.0.1:9")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+
+    assert fetch(server.url + "a") == b"direct"
+
+
+def interrupt_download(path, content: bytes, validator: str | None):
+    path.with_name(path.name + ".part").write_bytes(content)
+    if validator is not None:
+        path.with_name(path.name + ".part.validator").write_text(validator, "utf-8")
+
+
+def test_interrupted_download_is_resumed(server, tmp_path):
+    server.files["/a"] = b"0123456789"
+    path = tmp_path / "a"
+    interrupt_download(path, b"01234", server.etag("/a"))
+
+    result = download(server.url + "a", path)
+
+    assert result.status == 206
+    assert path.read_bytes() == b"0123456789"
+    _, _, headers = server.requests[-1]
+    assert headers["Range"] == "bytes=5-"
+    assert headers["If-Range"] == server.etag("/a")
+    assert not path.with_name("a.part.validator").exists()
+
+
+def test_download_restarts_if_content_changed(server, tmp_path):
+    server.files["/a"] = b"0123456789"
+    path = tmp_path / "a"
+    interrupt_download(path, b"abcde", '"outdated"')
+
+    result = download(server.url + "a", path)
+
+    assert result.status == 200
+    assert path.read_bytes() == b"0123456789"
+
+
+def test_download_without_validator_is_not_resumed(server, tmp_path):
+    server.files["/a"] = b"0123456789"
+    path = tmp_path / "a"
+    interrupt_download(path, b"abcde", None)
+
+    download(server.url + "a", path)
+
+    assert path.read_bytes() == b"0123456789"
+    _, _, headers = server.requests[-1]
+    assert "Range" not in headers
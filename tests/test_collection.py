@@ -0,0 +1,54 @@
+import json
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from pydori.convert.collection import CollectionSource
+from pydori.convert.utils import MMAP_THRESHOLD_BYTES, LevelSource
+
+
+def large_content() -> bytes:
+    return os.urandom(1024) * (MMAP_THRESHOLD_BYTES // 1024)
+
+
+def test_level_source_is_abstract():
+    with pytest.raises(TypeError):
+        LevelSource()
+
+
+def test_level_items_and_resources_are_read(make_collection):
+    path = make_collection({"a": {"cover": b"cover", "data": b"data"}})
+    source = CollectionSource(path)
+
+    item = source.get_level_item("a")
+
+    assert source.level_names() == ["a"]
+    assert source.get_asset(item["cover"]) == b"cover"
+    assert bytes(source.get_buffer(item["data"])) == b"data"
+
+
+def test_large_stored_assets_are_returned_as_paths(make_collection):
+    content = large_content()
+    path = make_collection({"a": {"bgm": content}})
+    source = CollectionSource(path)
+
+    bgm = source.get_asset(source.get_level_item("a")["bgm"])
+
+    assert isinstance(bgm, Path)
+    assert bgm.read_bytes() == content
+
+
+def test_large_compressed_assets_are_returned_as_paths(tmp_path):
+    content = large_content()
+    path = tmp_path / "collection.scp"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("sonolus/levels/a", json.dumps({"item": {"bgm": {"hash": "bgm", "url": "/repository/bgm"}}}))
+        archive.writestr("repository/bgm", content)
+    source = CollectionSource(path)
+
+    bgm = source.get_asset(source.get_level_item("a")["bgm"])
+
+    assert isinstance(bgm, Path)
+    assert bgm.read_bytes() == content
@@ -0,0 +1,51 @@
+import gzip
+import json
+import struct
+
+from sonolus.build.level import build_level_data as build_level_data_json
+
+from pydori.convert.chart import build_level_data
+from pydori.convert.emit import compact_level_data, measure_emission, package_compact_level_data
+from pydori.level import stress_chart
+
+
+def read_entities(data: dict) -> list[tuple[str, dict[str, float]]]:
+    """Return the archetype and field values of each entity as read at runtime, with references as entity indexes."""
+    indexes = {entity["name"]: i for i, entity in enumerate(data["entities"]) if "name" in entity}
+    return [
+        (
+            entity["archetype"],
+            {
+                entry["name"]: indexes[entry["ref"]]
+                if "ref" in entry
+                else struct.unpack("<f", struct.pack("<f", entry["value"]))[0]
+                for entry in entity["data"]
+                if "ref" in entry or entry["value"]
+            },
+        )
+        for entity in data["entities"]
+    ]
+
+
+def test_compact_level_data_is_read_the_same():
+    level_data = build_level_data(stress_chart(chords=20, holds=4, hold_ticks=20, flicks=20, anchor_chains=2))
+    data = build_level_data_json(level_data)
+
+    compact = compact_level_data(data)
+
+    assert read_entities(compact) == read_entities(data)
+    referenced = {entry["ref"] for entity in compact["entities"] for entry in entity["data"] if "ref" in entry}
+    assert [entity["name"] for entity in compact["entities"] if "name" in entity] == sorted(
+        referenced, key=lambda name: int(name, 36)
+    )
+
+
+def test_package_compact_level_data():
+    level_data = build_level_data(stress_chart(chords=5, holds=1, hold_ticks=5, flicks=5, anchor_chains=0))
+
+    packaged = package_compact_level_data(level_data)
+
+    assert json.loads(gzip.decompress(packaged)) == compact_level_data(build_level_data_json(level_data))
+    report = measure_emission(level_data)
+    assert report.compact_gzip_bytes == len(packaged)
+    assert report.compact_bytes < report.full_bytes
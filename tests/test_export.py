@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+from sonolus.build.level import build_level_data
+from sonolus.build.project import BLANK_AUDIO, BLANK_PNG
+from sonolus.script.level import Level
+from sonolus.script.metadata import Tag
+
+from pydori.convert.bestdori import convert_sonolus_bandori_level_data
+from pydori.convert.emit import compact_level_data
+from pydori.convert.export import export_repository
+
+ENGINE_ITEM = {"name": "pydori"}
+
+
+@pytest.fixture
+def level(bandori_level_data) -> Level:
+    return Level(
+        name="test",
+        title="Test",
+        rating=25,
+        artists="Artists",
+        tags=[Tag(title="Expert")],
+        cover=b"cover",
+        data=convert_sonolus_bandori_level_data(bandori_level_data),
+    )
+
+
+def read_resource(out, srl: dict) -> bytes:
+    content = (out / srl["url"].removeprefix("/")).read_bytes()
+    assert hashlib.sha1(content).hexdigest() == srl["hash"]
+    return content
+
+
+def test_exported_level_can_be_read_back(tmp_path, level):
+    out = tmp_path / "out"
+
+    assert export_repository(out, [level], ENGINE_ITEM) == ["test"]
+
+    details = json.loads((out / "sonolus/levels/test").read_bytes())
+    item = details["item"]
+    assert item["name"] == "test"
+    assert item["version"] == level.version
+    assert item["title"] == "Test"
+    assert item["artists"] == "Artists"
+    assert item["author"] == "Unknown"
+    assert item["tags"] == [{"title": "Expert"}]
+    assert item["engine"] == ENGINE_ITEM
+    assert read_resource(out, item["cover"]) == b"cover"
+    assert read_resource(out, item["bgm"]) == BLANK_AUDIO
+    assert "preview" not in item
+    data = json.loads(gzip.decompress(read_resource(out, item["data"])))
+    assert data == json.loads(json.dumps(compact_level_data(build_level_data(level.data))))
+    assert json.loads((out / "sonolus/levels/list").read_bytes())["items"] == [item]
+    assert gzip.decompress((out / "sonolus/levels/test.gz").read_bytes()) == (out / "sonolus/levels/test").read_bytes()
+
+
+def test_missing_cover_uses_blank_image(tmp_path, level):
+    level.cover = None
+
+    export_repository(tmp_path, [level], ENGINE_ITEM)
+
+    item = json.loads((tmp_path / "sonolus/levels/test").read_bytes())["item"]
+    assert read_resource(tmp_path, item["cover"]) == BLANK_PNG
+
+
+def test_levels_overriding_engine_resources_are_rejected(tmp_path, level):
+    level.use_skin = "custom"
+
+    with pytest.raises(ValueError, match="use_skin"):
+        export_repository(tmp_path, [level], ENGINE_ITEM)
+
+
+def test_levels_with_unchanged_fingerprints_are_reused(tmp_path, level):
+    export_repository(tmp_path, [level], ENGINE_ITEM, fingerprints={"test": "a"})
+
+    assert export_repository(tmp_path, [level], ENGINE_ITEM, fingerprints={"test": "a"}) == []
+    assert export_repository(tmp_path, [level], ENGINE_ITEM, fingerprints={"test": "b"}) == ["test"]
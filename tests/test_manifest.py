@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from sonolus.build.collection import Collection
+from sonolus.build.level import build_level_data
+from sonolus.build.project import add_level_to_collection
+
+import pydori.level
+from pydori.convert import manifest as manifest_module
+from pydori.convert.manifest import (
+    FileEntry,
+    GeneratorEntry,
+    ManifestEntry,
+    code_fingerprint,
+    fingerprint_entries,
+    load_manifest_levels,
+    read_manifest,
+)
+from pydori.level import load_levels
+from pydori.play.connector import SimLine
+from pydori.project import project
+
+
+@pytest.fixture
+def manifest(tmp_path, bandori_level_source):
+    (tmp_path / "level.json.gz").write_bytes(bandori_level_source)
+    (tmp_path / "bgm.mp3").write_bytes(b"bgm")
+    path = tmp_path / "levels.json"
+    path.write_text(
+        json.dumps(
+            {
+                "levels": [
+                    {"type": "file", "name": "file", "data": "level.json.gz", "bgm": "bgm.mp3", "title": "File"},
+                    {
+                        "type": "generator",
+                        "name": "stress",
+                        "generator": "pydori.level:stress_level",
+                        "options": {"chords": 10, "holds": 1, "hold_ticks": 10, "flicks": 10, "anchor_chains": 0},
+                    },
+                ]
+            }
+        )
+    )
+    return path
+
+
+def test_load_levels_in_parallel(manifest):
+    levels = load_manifest_levels(manifest, parallel=True, max_workers=2)
+    lazy_levels = load_manifest_levels(manifest)
+
+    assert [level.name for level in levels] == ["pydori-file", "stress"]
+    for level, lazy_level in zip(levels, lazy_levels, strict=True):
+        assert level.title == lazy_level.title
+        assert level.bgm == lazy_level.bgm
+        assert build_level_data(level.data) == build_level_data(lazy_level.data)
+
+
+def test_dev_server_only_converts_selected_levels(manifest, monkeypatch):
+    loaded = []
+
+    def record_loads(entry_type, method_name):
+        method = getattr(entry_type, method_name)
+
+        def record(self, *args):
+            loaded.append(self.level_name)
+            return method(self, *args)
+
+        monkeypatch.setattr(entry_type, method_name, record)
+
+    record_loads(FileEntry, "load_chart")
+    record_loads(GeneratorEntry, "load")
+    monkeypatch.setattr(pydori.level, "MANIFEST_PATH", manifest)
+    monkeypatch.setenv("PYDORI_LEVELS", "pydori-file")
+    # The dev server adds each level of the project to the collection it serves, as done here.
+    collection = Collection()
+    collection.add_item("engines", project.engine.name, {"name": project.engine.name})
+    dev_project = project.with_levels(load_levels)
+
+    for level in dev_project.levels:
+        add_level_to_collection(collection, dev_project, level)
+
+    assert list(collection.categories["levels"]) == ["pydori-file"]
+    assert collection.get_item("levels", "pydori-file")["title"] == "File"
+    assert loaded == ["pydori-file"]
+
+
+def test_selecting_unknown_levels_fails(manifest, monkeypatch):
+    monkeypatch.setattr(pydori.level, "MANIFEST_PATH", manifest)
+
+    with pytest.raises(ValueError, match="Unknown levels missing"):
+        load_levels(names={"pydori-file", "missing"})
+
+
+def test_manifest_entries_are_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        ManifestEntry({}, tmp_path)
+
+
+def test_fingerprints_change_with_the_archetype_layout(manifest, monkeypatch):
+    before = fingerprint_entries(read_manifest(manifest))
+    monkeypatch.setattr(
+        manifest_module,
+        "LEVEL_ARCHETYPES",
+        tuple(archetype for archetype in manifest_module.LEVEL_ARCHETYPES if archetype is not SimLine),
+    )
+    code_fingerprint.cache_clear()
+    try:
+        after = fingerprint_entries(read_manifest(manifest))
+    finally:
+        code_fingerprint.cache_clear()
+
+    assert before.keys() == after.keys() == {"pydori-file", "stress"}
+    assert all(before[name] != after[name] for name in before)
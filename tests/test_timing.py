@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from pydori.convert.timing import DEFAULT_BPM, TimingIndex
+
+
+def runtime_beat_to_time(bpm_changes: list[tuple[float, float]], beat: float) -> float:
+    """Resolve a beat the way the runtime does, by scanning the BPM changes in order.
+
+    The BPM of the first change applies from beat 0, and each change applies until the next one.
+    """
+    changes = sorted(bpm_changes, key=lambda change: change[0]) or [(0, DEFAULT_BPM)]
+    time = changes[0][0] * 60 / changes[0][1]
+    current_beat, current_bpm = changes[0]
+    for change_beat, change_bpm in changes[1:]:
+        if change_beat > beat:
+            break
+        time += (change_beat - current_beat) * 60 / current_bpm
+        current_beat, current_bpm = change_beat, change_bpm
+    return time + (beat - current_beat) * 60 / current_bpm
+
+
+def runtime_time_to_scaled_time(
+    bpm_changes: list[tuple[float, float]], timescale_changes: list[tuple[float, float]], time: float
+) -> float:
+    """Resolve a time the way the runtime does, by scanning the timescale changes in order.
+
+    The timescale is 1 before the first change, and each change applies from its beat until the next one.
+    """
+    scaled_time = 0.0
+    current_time = 0.0
+    current_timescale = 1.0
+    for change_beat, change_timescale in sorted(timescale_changes, key=lambda change: change[0]):
+        change_time = runtime_beat_to_time(bpm_changes, change_beat)
+        if change_time > time:
+            break
+        scaled_time += (change_time - current_time) * current_timescale
+        current_time, current_timescale = change_time, change_timescale
+    return scaled_time + (time - current_time) * current_timescale
+
+
+def test_demo_level_timing():
+    timing = TimingIndex([(0, 60), (6, 120)], [(4.5, 0.5), (6.5, 0.2), (8.5, 1.2)])
+
+    assert timing.beat_to_time(3) == 3
+    assert timing.beat_to_time(7) == 6.5
+    assert timing.time_to_scaled_time(3) == 3
+    assert timing.time_to_scaled_time(6.5) == pytest.approx(4.5 + 1.75 * 0.5 + 0.25 * 0.2)
+
+
+def test_without_changes():
+    timing = TimingIndex([])
+
+    assert timing.beat_to_time(3) == 3 * 60 / DEFAULT_BPM
+    assert timing.time_to_scaled_time(3) == 3
+
+
+def test_first_bpm_applies_before_first_change():
+    timing = TimingIndex([(4, 120), (8, 60)])
+
+    assert timing.beat_to_time(0) == 0
+    assert timing.beat_to_time(2) == 1
+    assert timing.beat_to_time(10) == 6
+
+
+def test_changes_on_the_same_beat_as_a_note():
+    timing = TimingIndex([(0, 60), (2, 120)], [(2, 0.5)])
+
+    assert timing.beat_to_time(2) == 2
+    assert timing.time_to_scaled_time(2) == 2
+    assert timing.time_to_scaled_time(3) == 2.5
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_runtime(seed):
+    rng = random.Random(seed)
+    bpm_changes = [(0, rng.uniform(30, 300))]
+    bpm_changes += [(rng.uniform(0, 100), rng.uniform(30, 300)) for _ in range(rng.randint(0, 20))]
+    timescale_changes = [(rng.uniform(0, 100), rng.uniform(-2, 4)) for _ in range(rng.randint(0, 20))]
+    rng.shuffle(bpm_changes)
+    rng.shuffle(timescale_changes)
+    timing = TimingIndex(bpm_changes, timescale_changes)
+
+    for beat in [rng.uniform(-1, 110) for _ in range(100)] + [beat for beat, _ in bpm_changes + timescale_changes]:
+        time = runtime_beat_to_time(bpm_changes, beat)
+        assert timing.beat_to_time(beat) == pytest.approx(time)
+        assert timing.time_to_scaled_time(time) == pytest.approx(
+            runtime_time_to_scaled_time(bpm_changes, timescale_changes, time)
+        )
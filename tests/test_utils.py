@@ -0,0 +1,147 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pytest
+from sonolus.build.level import build_level_data
+from sonolus.script.level import LevelData
+from sonolus.script.metadata import Tag
+
+from pydori.convert.bestdori import convert_sonolus_bandori_level_data, convert_sonolus_bandori_level_source
+from pydori.convert.utils import (
+    MMAP_THRESHOLD_BYTES,
+    PREFIX,
+    LazyLevel,
+    ServerSource,
+    convert_sonolus_level_item,
+    get_asset,
+    get_bytes,
+    get_json,
+    get_level_items,
+)
+
+
+def add_resource(server, content: bytes) -> dict:
+    digest = hashlib.sha1(content).hexdigest()
+    server.files[f"/sonolus/repository/{digest}"] = content
+    return {"hash": digest, "url": f"/sonolus/repository/{digest}"}
+
+
+def add_level_item(server, name: str, level_source: bytes) -> dict:
+    item = {
+        "name": name,
+        "version": 1,
+        "rating": 25,
+        "title": "Title",
+        "artists": "Artists",
+        "author": "Author",
+        "tags": [{"title": "Expert"}],
+        "cover": add_resource(server, b"cover"),
+        "bgm": add_resource(server, b"bgm"),
+        "preview": add_resource(server, b"preview"),
+        "data": add_resource(server, level_source),
+    }
+    server.files[f"/sonolus/levels/{name}?localization=en"] = json.dumps({"item": item}).encode("utf-8")
+    return item
+
+
+def test_get_bytes_caches_content(server):
+    server.files["/a"] = b"content"
+
+    assert get_bytes(server.url + "a") == b"content"
+    assert get_bytes(server.url + "a") == b"content"
+    assert server.paths() == ["/a"]
+
+
+def test_get_json(server):
+    server.files["/sonolus/info"] = b'{"title": "test"}'
+
+    assert get_json(server.url + "sonolus/info") == {"title": "test"}
+
+
+def test_get_asset_returns_large_assets_as_paths(server):
+    server.files["/small"] = b"small"
+    server.files["/large"] = bytes(MMAP_THRESHOLD_BYTES)
+
+    assert get_asset(server.url + "small") == b"small"
+    large = get_asset(server.url + "large")
+    assert isinstance(large, Path)
+    assert large.read_bytes() == bytes(MMAP_THRESHOLD_BYTES)
+
+
+def test_convert_sonolus_level_item_fetches_resources_concurrently(server, bandori_level_source):
+    add_level_item(server, "test", bandori_level_source)
+    source = ServerSource(server.url)
+    item = source.get_level_item("test")
+    server.delay = 0.2
+
+    level = convert_sonolus_level_item(item, source, "Bandori", convert_sonolus_bandori_level_source)
+
+    assert server.max_in_flight > 1
+    assert level.name == f"{PREFIX}-test"
+    assert level.cover == b"cover"
+    assert level.bgm == b"bgm"
+    assert level.preview == b"preview"
+    assert [tag.title for tag in level.tags] == [{"en": "Expert"}, {"en": "Bandori"}]
+    assert len(level.data.entities) > 0
+
+
+def test_convert_sonolus_level_item_accepts_base_url(server, bandori_level_source, bandori_level_data):
+    item = add_level_item(server, "test", bandori_level_source)
+
+    with pytest.warns(DeprecationWarning):
+        level = convert_sonolus_level_item(item, server.url, None, convert_sonolus_bandori_level_data)
+
+    assert level.bgm == b"bgm"
+    assert build_level_data(level.data) == build_level_data(convert_sonolus_bandori_level_data(bandori_level_data))
+
+
+def test_get_level_items_fetches_pages_concurrently_in_order(server):
+    for page in range(4):
+        items = [{"name": f"{page}-{i}"} for i in range(3)]
+        server.files[f"/sonolus/levels/list?localization=en&page={page}"] = json.dumps(
+            {"pageCount": 4, "items": items}
+        ).encode("utf-8")
+    server.delay = 0.2
+
+    items = get_level_items(server.url)
+
+    assert [item["name"] for item in items] == [f"{page}-{i}" for page in range(4) for i in range(3)]
+    assert server.max_in_flight > 1
+    assert server.paths().count("/sonolus/levels/list?localization=en&page=0") == 1
+    assert len(server.requests) == 4
+
+
+def test_lazy_level_loads_each_group_when_first_used():
+    loads = []
+
+    def load_metadata():
+        loads.append("metadata")
+        return {"rating": 25, "title": "Title", "artists": "Artists", "author": "Author", "tags": [Tag(title="Tag")]}
+
+    def load_resources():
+        loads.append("resources")
+        return {"cover": b"cover", "bgm": b"bgm", "preview": None, "data": LevelData(bgm_offset=0, entities=[])}
+
+    level = LazyLevel("test", load_metadata, load_resources)
+
+    assert level.name == "test"
+    assert loads == []
+    assert level.title == {"en": "Title"}
+    assert level.description is None
+    assert level.rating == 25
+    assert loads == ["metadata"]
+    assert level.bgm == b"bgm"
+    assert level.data.entities == []
+    assert loads == ["metadata", "resources"]
+
+
+def test_lazy_level_attributes_can_be_assigned():
+    level = LazyLevel("test", lambda: pytest.fail("Loaded metadata"), lambda: pytest.fail("Loaded resources"))
+
+    level.title = {"en": "Assigned"}
+    level.bgm = b"assigned"
+
+    assert level.title == {"en": "Assigned"}
+    assert level.bgm == b"assigned"
+    assert level.use_skin is None